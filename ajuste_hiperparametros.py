@@ -0,0 +1,218 @@
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import datos_compartidos
+
+# ==============================
+# ⚙️ Espacio de búsqueda y validación
+# ==============================
+# Valores probados para cada hiperparámetro de Prophet (claves de CONFIGURACION_MODELO)
+ESPACIO = {
+    "changepoint_prior_scale": [0.01, 0.05, 0.1, 0.5],
+    "seasonality_prior_scale": [0.1, 1.0, 10.0],
+    "seasonality_mode": ["additive", "multiplicative"],
+    "modo_regresores": ["additive", "multiplicative"],
+    "daily_seasonality": [False, True],
+}
+HIPERPARAMETROS = tuple(ESPACIO)
+N_CANDIDATOS = 16  # Búsqueda aleatoria por defecto; None recorre toda la grilla
+
+# Validación cruzada temporal: se entrena hasta cada corte y se mide el error de los `HORIZONTE` días siguientes
+HORIZONTE = 14
+PLIEGUES = 3
+MINIMO_ENTRENAMIENTO = 28  # Días mínimos antes del primer corte
+METRICA = "mae"  # Las ventas pueden valer 0: el MAPE no sirve para comparar
+
+CARPETA_HIPERPARAMETROS = os.path.join("datos", "hiperparametros")
+
+def _carpeta(tienda, carpeta=CARPETA_HIPERPARAMETROS):
+    ruta = os.path.join(carpeta, tienda)
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+def _escribir_json(archivo, contenido):
+    temporal = f"{archivo}.tmp{os.getpid()}-{threading.get_ident()}"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(contenido, f, indent=2)
+    os.replace(temporal, archivo)
+
+def _clave(configuracion):
+    return json.dumps({k: configuracion[k] for k in HIPERPARAMETROS}, sort_keys=True)
+
+# ==============================
+# 🎲 Candidatos
+# ==============================
+def candidatos(base, espacio=ESPACIO, n=N_CANDIDATOS, semilla=0):
+    """Configuraciones a evaluar: la actual primero y luego la grilla completa o `n` combinaciones al azar."""
+    combinaciones = [dict(zip(espacio, valores)) for valores in itertools.product(*espacio.values())]
+    if n is not None and n < len(combinaciones):
+        combinaciones = random.Random(semilla).sample(combinaciones, n)
+    vistos, resultado = set(), []
+    for cambios in [{}] + combinaciones:
+        configuracion = {**base, **cambios}
+        if _clave(configuracion) not in vistos:
+            vistos.add(_clave(configuracion))
+            resultado.append(configuracion)
+    return resultado
+
+# ==============================
+# 🔁 Validación cruzada temporal
+# ==============================
+def cortes_validacion(df, horizonte=HORIZONTE, pliegues=PLIEGUES, minimo=MINIMO_ENTRENAMIENTO):
+    """Fechas de corte de los últimos `pliegues` bloques de `horizonte` días con entrenamiento suficiente."""
+    fin = df['ds'].max()
+    cortes = [fin - pd.Timedelta(days=horizonte * k) for k in range(pliegues, 0, -1)]
+    cortes = [c for c in cortes if (df['ds'] <= c).sum() >= minimo]
+    if not cortes:
+        raise ValueError(f"Se necesitan al menos {minimo + horizonte} días de ventas para la validación cruzada "
+                         f"(hay {len(df)}).")
+    return cortes
+
+def _evaluar(tarea):
+    """Error de validación cruzada de una configuración. Corre dentro de un proceso del pool."""
+    configuracion, df, cortes, horizonte, crear_modelo = tarea
+    if isinstance(df, str):
+        df = datos_compartidos.abrir(df)  # Clave de los datos publicados por `buscar` (memory-map, sin copia)
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    inicio = time.perf_counter()
+    try:
+        errores = []
+        for corte in cortes:
+            entrenamiento = df[df['ds'] <= corte]
+            prueba = df[(df['ds'] > corte) & (df['ds'] <= corte + pd.Timedelta(days=horizonte))]
+            modelo = crear_modelo(configuracion)
+            modelo.fit(entrenamiento)
+            yhat = modelo.predict(prueba.drop(columns='y'))['yhat'].to_numpy()
+            errores.append(prueba['y'].to_numpy() - yhat)
+        errores = np.concatenate(errores)
+        resultado = {'mae': float(np.abs(errores).mean()), 'rmse': float(np.sqrt((errores ** 2).mean())),
+                     'sesgo': float(errores.mean()), 'error': None}
+    except Exception as e:  # Una combinación que no converge no debe frenar el resto
+        resultado = {'mae': None, 'rmse': None, 'sesgo': None, 'error': str(e)}
+    resultado['segundos'] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+def huella_datos(df, cortes, horizonte=HORIZONTE):
+    """Huella de los datos de entrenamiento (ventas y regresores) y del esquema de validación."""
+    contenido = pd.util.hash_pandas_object(df.sort_values('ds').reset_index(drop=True), index=False).to_numpy()
+    h = hashlib.sha1(contenido.tobytes())
+    h.update(json.dumps([list(df.columns), [str(c.date()) for c in cortes], horizonte]).encode())
+    return h.hexdigest()[:20]
+
+# ==============================
+# 🔍 Búsqueda
+# ==============================
+def buscar(df, base, crear_modelo, tienda="principal", espacio=ESPACIO, n=N_CANDIDATOS, procesos=None,
+           semilla=0, horizonte=HORIZONTE, pliegues=PLIEGUES, carpeta=CARPETA_HIPERPARAMETROS):
+    """Evalúa candidatos en paralelo y guarda la mejor configuración para `tienda`.
+
+    `df` son los datos de entrenamiento (ds, y y regresores) y `crear_modelo(configuracion)`
+    arma el Prophet sin ajustar. Los errores por candidato se guardan por huella de los
+    datos: repetir la búsqueda con los mismos datos solo evalúa combinaciones nuevas.
+    Devuelve (mejor configuración, tabla de resultados ordenada por METRICA).
+    """
+    cortes = cortes_validacion(df, horizonte, pliegues)
+    huella = huella_datos(df, cortes, horizonte)
+    archivo_cache = os.path.join(_carpeta(tienda, carpeta), f"{huella}.json")
+    cache = {}
+    if os.path.exists(archivo_cache):
+        with open(archivo_cache, encoding="utf-8") as f:
+            cache = json.load(f)
+
+    lista = candidatos(base, espacio, n, semilla)
+    pendientes = [c for c in lista if _clave(c) not in cache]
+    print(f"🔍 {len(lista)} configuraciones, {len(cortes)} pliegue(s) de {horizonte} días; "
+          f"{len(lista) - len(pendientes)} ya evaluadas con estos datos.")
+
+    inicio = time.perf_counter()
+    if pendientes:
+        procesos = max(1, min(len(pendientes), procesos or os.cpu_count() or 1))
+        if procesos == 1:
+            resultados = [_evaluar((c, df, cortes, horizonte, crear_modelo)) for c in pendientes]
+        else:
+            # Los datos se publican una vez en Arrow y cada proceso los abre con memory-map,
+            # en lugar de recibir una copia serializada con cada tarea
+            clave, usuario = f"cv_{huella}", f"busqueda-{threading.get_ident()}"
+            datos_compartidos.adjuntar(clave, usuario, lambda: df)
+            try:
+                tareas = [(c, clave, cortes, horizonte, crear_modelo) for c in pendientes]
+                with ProcessPoolExecutor(max_workers=procesos) as pool:
+                    resultados = list(pool.map(_evaluar, tareas))
+            finally:
+                datos_compartidos.soltar(clave, usuario)
+        for configuracion, resultado in zip(pendientes, resultados):
+            cache[_clave(configuracion)] = resultado
+        _escribir_json(archivo_cache, cache)
+        print(f"⏱ {len(pendientes)} configuraciones evaluadas con {procesos} proceso(s) "
+              f"en {time.perf_counter() - inicio:.1f} s.")
+
+    tabla = pd.DataFrame([{**{k: c[k] for k in HIPERPARAMETROS}, **cache[_clave(c)]} for c in lista])
+    tabla = tabla.sort_values(METRICA, na_position='last').reset_index(drop=True)
+    validas = tabla[tabla['error'].isna()]
+    if validas.empty:
+        raise ValueError("Ninguna configuración pudo evaluarse: " + "; ".join(tabla['error'].dropna().unique()))
+
+    mejor = {**base, **{k: _nativo(validas.iloc[0][k]) for k in HIPERPARAMETROS}}
+    guardar_mejor(tienda, mejor, validas.iloc[0][METRICA], huella, carpeta)
+    actual = cache[_clave(base)][METRICA]
+    print(f"🏆 Mejor {METRICA.upper()}: {validas.iloc[0][METRICA]:,.2f}"
+          + (f" (configuración anterior: {actual:,.2f})" if actual is not None else ""))
+    for k in HIPERPARAMETROS:
+        print(f"   {k}: {mejor[k]}")
+    return mejor, tabla
+
+def _nativo(valor):
+    """Valores de numpy a tipos de Python, para JSON y para Prophet."""
+    return valor.item() if isinstance(valor, np.generic) else valor
+
+# ==============================
+# 💾 Mejor configuración por tienda
+# ==============================
+def guardar_mejor(tienda, configuracion, puntaje, huella, carpeta=CARPETA_HIPERPARAMETROS):
+    _escribir_json(os.path.join(_carpeta(tienda, carpeta), "mejor.json"), {
+        'hiperparametros': {k: configuracion[k] for k in HIPERPARAMETROS},
+        'metrica': METRICA,
+        'puntaje': float(puntaje),
+        'huella_datos': huella,
+        'ajustado': pd.Timestamp.now().isoformat(timespec="seconds"),
+    })
+
+def cargar_mejor(tienda, carpeta=CARPETA_HIPERPARAMETROS):
+    """Hiperparámetros elegidos por la última búsqueda de `tienda` ({} si nunca se ajustaron)."""
+    archivo = os.path.join(carpeta, tienda, "mejor.json")
+    if not os.path.exists(archivo):
+        return {}
+    with open(archivo, encoding="utf-8") as f:
+        return json.load(f)['hiperparametros']
+
+if __name__ == "__main__":
+    import prediccion_ventas_clima
+
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros de Prophet con validación cruzada temporal.")
+    origen = parser.add_mutually_exclusive_group(required=True)
+    origen.add_argument("--excel", help="Archivo, carpeta o patrón *.xlsx con las ventas")
+    origen.add_argument("--historial", action="store_true", help="Usar el historial acumulado")
+    parser.add_argument("--candidatos", type=int, default=N_CANDIDATOS, help="Combinaciones al azar a evaluar")
+    parser.add_argument("--grilla", action="store_true", help="Evaluar la grilla completa")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo (por defecto, uno por CPU)")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.historial:
+        ventas = prediccion_ventas_clima.cargar_datos_historial()
+    else:
+        ventas = prediccion_ventas_clima.cargar_datos_excel(args.excel)
+    clima = prediccion_ventas_clima.obtener_clima_historico(ventas['ds'].min(), ventas['ds'].max())
+    prediccion_ventas_clima.ajustar_hiperparametros(ventas, clima, n=None if args.grilla else args.candidatos,
+                                                    procesos=args.procesos, semilla=args.semilla)
@@ -0,0 +1,237 @@
+import datetime
+import os
+import threading
+from collections import OrderedDict, deque
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+VENTANA = 28  # Días previos de la línea base robusta
+UMBRAL = 3.5  # |z robusto| a partir del cual un día es anómalo
+MINIMO_DIAS = 7  # Días previos necesarios antes de puntuar contra la línea base
+ANCHO_INTERVALO = 0.8  # interval_width de Prophet (80 % por defecto)
+
+ARCHIVO_REGISTRO = os.path.join("reportes", "anomalias.log")
+
+# Detectores ya cargados por conjunto de datos (consola): {(conjunto, ventana, umbral): detector}
+MAX_DETECTORES = 8
+_detectores = OrderedDict()
+_candado = threading.Lock()
+
+COLUMNAS = ['fecha', 'ventas', 'esperado', 'mediana', 'z_robusto', 'z_pronostico', 'limite_inferior',
+            'limite_superior', 'fuera_intervalo', 'anomalia', 'tipo', 'motivo']
+
+# ==============================
+# 🚨 Detector incremental
+# ==============================
+class DetectorAnomalias:
+    """Puntúa cada total diario contra el intervalo del pronóstico y una línea base móvil (mediana/MAD).
+
+    Ambas comparaciones se expresan como un z: la distancia a la mediana en MADs
+    escaladas y la distancia a `yhat` en desviaciones implícitas en el intervalo.
+    Un día es anómalo si alguno supera `umbral` (un intervalo del 80 % deja
+    fuera, por diseño, uno de cada cinco días normales).
+
+    Los días se agregan en orden con `agregar_dia`; cada día nuevo solo usa los
+    últimos `ventana` valores, así que su costo no crece con el historial.
+    Con `registro` (ruta) las anomalías nuevas se anotan en ese archivo bajo
+    `conjunto` (tienda, archivo o historial): cada conjunto lleva su propia
+    última fecha anotada.
+    """
+
+    def __init__(self, forecast=None, ventana=VENTANA, umbral=UMBRAL, minimo_dias=MINIMO_DIAS, registro=None,
+                 ancho_intervalo=ANCHO_INTERVALO, conjunto=""):
+        self.ventana = ventana
+        self.umbral = umbral
+        self.minimo_dias = minimo_dias
+        # Desviaciones estándar que abarca medio intervalo (1.28 para el 80 %)
+        self._z_intervalo = NormalDist().inv_cdf(0.5 + ancho_intervalo / 2)
+        self.conjunto = conjunto
+        self._recientes = deque(maxlen=ventana)
+        self._suma = 0.0  # Suma de los días puntuados: detecta si cambiaron al volver a cargar
+        self.intervalos = {}
+        self.forecast = None
+        self.filas = []
+        self.fin = None
+        if forecast is not None:
+            self.fijar_pronostico(forecast)
+        self.registro = None
+        self.fijar_registro(registro)
+
+    def fijar_pronostico(self, forecast):
+        """Intervalos (yhat, yhat_lower, yhat_upper) por fecha de un `forecast` de Prophet."""
+        fechas = pd.to_datetime(forecast['ds']).dt.normalize()
+        self.intervalos = dict(zip(fechas, forecast[['yhat', 'yhat_lower', 'yhat_upper']].itertuples(index=False, name=None)))
+        self.forecast = forecast
+
+    def fijar_registro(self, registro):
+        """Activa (o apaga con None) el registro de alertas; anota las anomalías ya puntuadas que falten."""
+        if registro == self.registro:
+            return
+        self.registro = registro
+        self._ultima_registrada = self._leer_ultima_registrada()
+        if registro:
+            for fila in self.filas:
+                if fila['anomalia']:
+                    self._registrar(fila)
+
+    # ----- Puntuación -----
+    def _linea_base(self):
+        """(mediana, MAD) de los días previos, o (nan, nan) si aún no hay suficientes."""
+        if len(self._recientes) < self.minimo_dias:
+            return np.nan, np.nan
+        valores = np.fromiter(self._recientes, dtype='float64', count=len(self._recientes))
+        mediana = np.median(valores)
+        return mediana, np.median(np.abs(valores - mediana))
+
+    def agregar_dia(self, fecha, ventas):
+        """Puntúa el total de un día y lo incorpora a la línea base. Devuelve la fila del día."""
+        fecha = pd.Timestamp(fecha).normalize()
+        if self.fin is not None and fecha <= self.fin:
+            raise ValueError(f"La fecha {fecha.date()} no es posterior al último día puntuado ({self.fin.date()}).")
+        ventas = float(ventas)
+
+        mediana, mad = self._linea_base()
+        # 0.6745 escala la MAD para que el z sea comparable con desviaciones estándar
+        z = 0.6745 * (ventas - mediana) / mad if mad > 0 else np.nan
+        motivos = []
+        if abs(z) > self.umbral:
+            motivos.append(f"z robusto {z:+.1f}")
+
+        esperado, inferior, superior = self.intervalos.get(fecha, (mediana, np.nan, np.nan))
+        fuera = bool(ventas < inferior or ventas > superior)
+        sigma = (superior - inferior) / 2 / self._z_intervalo
+        z_pronostico = (ventas - esperado) / sigma if sigma > 0 else np.nan
+        if abs(z_pronostico) > self.umbral:
+            motivos.append(f"pronóstico z {z_pronostico:+.1f}")
+
+        fila = {
+            'fecha': fecha, 'ventas': ventas, 'esperado': esperado, 'mediana': mediana, 'z_robusto': z,
+            'z_pronostico': z_pronostico, 'limite_inferior': inferior, 'limite_superior': superior, 'fuera_intervalo': fuera,
+            'anomalia': bool(motivos), 'tipo': ('alta' if ventas > esperado else 'baja') if motivos else '',
+            'motivo': "; ".join(motivos),
+        }
+        self.filas.append(fila)
+        self._recientes.append(ventas)
+        self._suma += ventas
+        self.fin = fecha
+        if fila['anomalia'] and self.registro:
+            self._registrar(fila)
+        return fila
+
+    def cargar(self, ventas_diarias):
+        """Puntúa una serie diaria (columnas ds, y), agregando solo los días posteriores al último puntuado."""
+        fechas = pd.to_datetime(ventas_diarias['ds']).dt.normalize()
+        orden = np.argsort(fechas.to_numpy(), kind='stable')
+        for fecha, ventas in zip(fechas.to_numpy()[orden], ventas_diarias['y'].to_numpy()[orden]):
+            if self.fin is None or fecha > self.fin:
+                self.agregar_dia(fecha, ventas)
+        return self
+
+    def continua(self, ventas_diarias):
+        """True si `ventas_diarias` repite los días ya puntuados y solo puede traer días nuevos."""
+        if self.fin is None:
+            return True
+        fechas = pd.to_datetime(ventas_diarias['ds']).dt.normalize()
+        previos = ventas_diarias['y'].to_numpy(dtype='float64')[(fechas <= self.fin).to_numpy()]
+        return (len(previos) == len(self.filas) and fechas.min() == self.filas[0]['fecha']
+                and np.isclose(previos.sum(), self._suma, rtol=1e-9, atol=1e-6))
+
+    # ----- Registro para alertas -----
+    def _leer_ultima_registrada(self):
+        """Fecha más reciente ya anotada para este conjunto, para no repetir alertas al volver a puntuar."""
+        if not self.registro or not os.path.exists(self.registro):
+            return None
+        ultima = None
+        with open(self.registro, encoding="utf-8") as f:
+            for linea in f:
+                campos = linea.rstrip("\n").split("\t")
+                if len(campos) < 6:
+                    continue
+                conjunto, fecha = campos[1], campos[2]
+                if conjunto == self.conjunto:
+                    ultima = max(ultima, pd.Timestamp(fecha)) if ultima is not None else pd.Timestamp(fecha)
+        return ultima
+
+    def _registrar(self, fila):
+        if self._ultima_registrada is not None and fila['fecha'] <= self._ultima_registrada:
+            return
+        carpeta = os.path.dirname(self.registro)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        with open(self.registro, "a", encoding="utf-8") as f:
+            f.write(f"{datetime.datetime.now().isoformat(timespec='seconds')}\t{self.conjunto}\t{fila['fecha'].date()}\t"
+                    f"{fila['ventas']:.2f}\t{fila['tipo']}\t{fila['motivo']}\n")
+        self._ultima_registrada = fila['fecha']
+
+    # ----- Consultas -----
+    def tabla(self):
+        """Todos los días puntuados."""
+        return pd.DataFrame(self.filas, columns=COLUMNAS)
+
+    def anomalias(self):
+        """Solo los días marcados como anómalos."""
+        tabla = self.tabla()
+        return tabla[tabla['anomalia']].reset_index(drop=True)
+
+def detectar_anomalias(ventas_diarias, forecast=None, ventana=VENTANA, umbral=UMBRAL, registro=None, conjunto=""):
+    """Detector nuevo cargado con la serie diaria (columnas ds, y)."""
+    return DetectorAnomalias(forecast, ventana=ventana, umbral=umbral, registro=registro,
+                             conjunto=conjunto).cargar(ventas_diarias)
+
+def actualizar_detector(detector, ventas_diarias, forecast=None, ventana=VENTANA, umbral=UMBRAL, registro=None,
+                        conjunto=""):
+    """`detector` con solo los días nuevos de `ventas_diarias` puntuados, o uno nuevo si no sirve.
+
+    Se vuelve a puntuar todo únicamente si cambian los parámetros, el pronóstico
+    o algún día ya puntuado (otro rango de fechas, datos corregidos).
+    """
+    if (detector is None or (detector.ventana, detector.umbral, detector.conjunto) != (ventana, umbral, conjunto)
+            or detector.forecast is not forecast or not detector.continua(ventas_diarias)):
+        return detectar_anomalias(ventas_diarias, forecast, ventana, umbral, registro, conjunto)
+    detector.fijar_registro(registro)
+    return detector.cargar(ventas_diarias)
+
+def detector_para(conjunto, ventas_diarias, forecast=None, ventana=VENTANA, umbral=UMBRAL, registro=None):
+    """Detector persistente del `conjunto` en este proceso, alimentado solo con los días nuevos."""
+    clave = (conjunto, ventana, umbral)
+    with _candado:
+        detector = actualizar_detector(_detectores.get(clave), ventas_diarias, forecast, ventana, umbral, registro, conjunto)
+        _detectores[clave] = detector
+        _detectores.move_to_end(clave)
+        if len(_detectores) > MAX_DETECTORES:
+            _detectores.popitem(last=False)
+    return detector
+
+def serie_diaria(df):
+    """Totales por día (columnas ds, y) de un conjunto de operaciones."""
+    diario = df.groupby(df['fecha'].dt.normalize())['total'].sum()
+    return pd.DataFrame({'ds': diario.index, 'y': diario.to_numpy()})
+
+# ==============================
+# 📄 Sección para los informes PDF
+# ==============================
+def agregar_anomalias_pdf(pdf, anomalias, maximo=25):
+    """Tabla de días anómalos (resultado de `DetectorAnomalias.anomalias`) en una página nueva."""
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 14)
+    pdf.cell(0, 10, 'Días con ventas anómalas', ln=True)
+    pdf.set_font('Arial', '', 10)
+    if anomalias.empty:
+        pdf.multi_cell(0, 6, "No se detectaron días fuera de lo esperado en el periodo.")
+        return
+    pdf.multi_cell(0, 6, f"{len(anomalias)} día(s) muy alejados del pronóstico o de la mediana de los días previos "
+                         f"(z robusto). Se muestran los más recientes.")
+    pdf.ln(3)
+    anchos = (24, 28, 28, 14, 96)
+    pdf.set_font('Arial', 'B', 9)
+    for ancho, titulo in zip(anchos, ('Fecha', 'Ventas (S/)', 'Esperado (S/)', 'Tipo', 'Motivo')):
+        pdf.cell(ancho, 8, titulo, 1, 0, 'C')
+    pdf.ln()
+    pdf.set_font('Arial', '', 9)
+    for _, fila in anomalias.tail(maximo).iloc[::-1].iterrows():
+        valores = (str(fila['fecha'].date()), f"{fila['ventas']:,.2f}", f"{fila['esperado']:,.2f}", fila['tipo'], fila['motivo'])
+        for ancho, valor in zip(anchos, valores):
+            pdf.cell(ancho, 7, valor, 1, 0, 'L')
+        pdf.ln()
@@ -0,0 +1,387 @@
+import argparse
+import contextlib
+import datetime
+import glob
+import json
+import os
+import platform
+import subprocess
+import time
+
+import matplotlib
+matplotlib.use("Agg")  # Sin ventanas: los gráficos solo se guardan a disco
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+import carga_multiple
+import informe_ventas
+import prediccion_ventas_clima
+import registro_modelos
+import reportes_pdf
+from utilidades import timestamp, crear_carpeta_reportes
+
+# Tamaños por defecto: (filas, clientes, días)
+TAMANOS_DEFECTO = [
+    (1_000, 50, 30),
+    (10_000, 300, 180),
+    (50_000, 1_500, 365),
+]
+
+OPCIONES_DASHBOARD = [
+    "Ver métricas rápidas",
+    "Filtrar por fechas",
+    "Ver tendencia diaria",
+    "Ver top clientes y gráficos",
+    "Segmentación RFM de clientes",
+    "Generar PDF informe ventas",
+    "Descargar clima histórico",
+    "Correlación clima-ventas",
+    "Entrenar modelo y predecir",
+    "Ver predicción gráfica",
+    "Exportar predicción a Excel",
+    "Generar PDF informe predicción",
+    "Simular escenarios climáticos",
+    "Detectar días anómalos",
+    "Consultas SQL",
+]
+
+# ==============================
+# 1️⃣ Generador de libros "Compras" sintéticos
+# ==============================
+def generar_excel_sintetico(path, filas=1000, clientes=50, dias=30, inicio="2024-01-01", semilla=42):
+    """Crea un libro con el mismo layout que exporta el sistema de ventas.
+
+    Hoja 'Compras': siete filas de preámbulo, una fila separadora vacía (la que
+    pandas toma como cabecera con skiprows=7), la fila de cabecera real, las
+    operaciones y las filas de "Totales" al pie.
+    """
+    rng = np.random.default_rng(semilla)
+    inicio = pd.Timestamp(inicio)
+
+    nombres = np.array([f"Cliente {i:05d}" for i in range(clientes)])
+    # Distribución sesgada: pocos clientes concentran la mayoría de operaciones
+    pesos = rng.pareto(1.5, clientes) + 1
+    pesos /= pesos.sum()
+    idx_clientes = rng.choice(clientes, size=filas, p=pesos)
+
+    offsets = np.sort(rng.integers(0, dias, size=filas))
+    segundos = rng.integers(8 * 3600, 21 * 3600, size=filas)
+    fechas = inicio + pd.to_timedelta(offsets, unit="D") + pd.to_timedelta(segundos, unit="s")
+
+    cantidades = rng.integers(1, 25, size=filas)
+    precios = rng.uniform(2.5, 80.0, size=filas).round(2)
+    subtotales = (cantidades * precios).round(2)
+    descuentos = np.where(rng.random(filas) < 0.3, (subtotales * rng.uniform(0.01, 0.15, filas)).round(2), 0.0)
+    totales = (subtotales - descuentos).round(2)
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Compras")
+    ws.append(["REPORTE DE COMPRAS"])
+    ws.append(["Empresa: Comercial Sintética S.A.C."])
+    ws.append(["RUC: 20000000001"])
+    ws.append([f"Desde: {inicio.date()}"])
+    ws.append([f"Hasta: {(inicio + pd.Timedelta(days=dias - 1)).date()}"])
+    ws.append(["Moneda: Soles"])
+    ws.append([f"Generado: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}"])
+    ws.append([])
+    ws.append(["Comprobante", "Cliente", "Descuento", "Productos", "Total", "Fecha Emisión"])
+
+    for i in range(filas):
+        ws.append([
+            f"F001-{i + 1:08d}",
+            nombres[idx_clientes[i]],
+            float(descuentos[i]),
+            f"Producto {int(rng.integers(1, 400)):03d} - Cantidad: {int(cantidades[i])}",
+            float(totales[i]),
+            fechas[i].strftime("%Y-%m-%d %H:%M:%S"),
+        ])
+
+    ws.append([None, "Totales", float(descuentos.sum()), None, float(totales.sum()), None])
+    ws.append([None, "Totales generales", float(descuentos.sum()), None, float(totales.sum()), None])
+    wb.save(path)
+    return path
+
+# ==============================
+# 2️⃣ Clima local de reemplazo (sin red)
+# ==============================
+def clima_sintetico(fecha_inicio, fecha_fin, semilla=7):
+    """Serie diaria de temperatura y lluvia con estacionalidad simple."""
+    fechas = pd.date_range(pd.Timestamp(fecha_inicio).normalize(), pd.Timestamp(fecha_fin).normalize(), freq="D")
+    rng = np.random.default_rng(semilla + len(fechas))
+    dia_anio = fechas.dayofyear.to_numpy()
+    temp = 27 + 2.5 * np.sin(2 * np.pi * dia_anio / 365.25) + rng.normal(0, 1.2, len(fechas))
+    lluvia = np.where(rng.random(len(fechas)) < 0.45, rng.gamma(1.5, 8.0, len(fechas)), 0.0)
+    return pd.DataFrame({"ds": fechas, "temp": temp.round(1), "lluvia": lluvia.round(1)})
+
+@contextlib.contextmanager
+def clima_local():
+    """Sustituye las descargas de Meteostat y OpenWeatherMap por clima sintético."""
+    original_historico = prediccion_ventas_clima.obtener_clima_historico
+    original_pronostico = prediccion_ventas_clima.obtener_clima_pronostico
+
+    def historico(fecha_inicio, fecha_fin):
+        return clima_sintetico(fecha_inicio, fecha_fin)
+
+    def pronostico(dias=7):
+        # El pronóstico arranca al día siguiente del último dato de ventas disponible
+        ventas = prediccion_ventas_clima.ventas_diarias
+        base = ventas['ds'].max() if ventas is not None else pd.Timestamp.today().normalize()
+        return clima_sintetico(base + pd.Timedelta(days=1), base + pd.Timedelta(days=5))
+
+    prediccion_ventas_clima.obtener_clima_historico = historico
+    prediccion_ventas_clima.obtener_clima_pronostico = pronostico
+    try:
+        yield
+    finally:
+        prediccion_ventas_clima.obtener_clima_historico = original_historico
+        prediccion_ventas_clima.obtener_clima_pronostico = original_pronostico
+
+def reiniciar_estado():
+    """Deja los módulos como recién importados entre mediciones."""
+    informe_ventas.df_ventas_original = None
+    informe_ventas.df_ventas_filtrado = None
+    informe_ventas.archivo_excel = None
+    for nombre in ("ventas_diarias", "clima_df", "modelo", "forecast", "grafico_correlacion", "grafico_prediccion"):
+        setattr(prediccion_ventas_clima, nombre, None)
+    prediccion_ventas_clima.limpiar_figuras()
+
+# ==============================
+# 3️⃣ Medición
+# ==============================
+def medir(funcion, repeticiones=3):
+    """Ejecuta `funcion` varias veces y devuelve tiempos en segundos y el último resultado."""
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - t0)
+    return {
+        "min_s": min(tiempos),
+        "media_s": sum(tiempos) / len(tiempos),
+        "repeticiones": repeticiones,
+    }, resultado
+
+def medir_funciones(path, repeticiones):
+    """Tiempos de las funciones de los módulos de ventas y predicción."""
+    resultados = {}
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        resultados["cargar_excel"], df = medir(lambda: informe_ventas.cargar_excel(path), repeticiones)
+        resultados["calcular_resumen"], _ = medir(lambda: informe_ventas.calcular_resumen(df), max(repeticiones, 10))
+        # En frío: sin la caché de gráficos de reportes_pdf, comparable con versiones anteriores
+        resultados["generar_pdf"], _ = medir(lambda: (reportes_pdf.podar_cache(0), informe_ventas.generar_pdf(con_graficos=True)), repeticiones)
+
+        ventas = prediccion_ventas_clima.cargar_datos_excel(path)
+        prediccion_ventas_clima.ventas_diarias = ventas
+        clima = clima_sintetico(ventas['ds'].min(), ventas['ds'].max())
+        prediccion_ventas_clima.clima_df = clima
+        resultados["entrenar_modelo"], _ = medir(lambda: prediccion_ventas_clima.entrenar_modelo(ventas, clima), 1)
+    return resultados
+
+def medir_refresco_incremental(path, dias_nuevos=5):
+    """Ciclo diario: compara el ajuste en frío con el arranque en caliente al llegar cada día nuevo."""
+    carpeta_original = registro_modelos.CARPETA_MODELOS
+    tienda_original = prediccion_ventas_clima.TIENDA
+    registro_modelos.CARPETA_MODELOS = os.path.join(carpeta_benchmarks(), "modelos")
+    prediccion_ventas_clima.TIENDA = "benchmark"
+    frio, tibio = [], []
+    try:
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            ventas = prediccion_ventas_clima.cargar_datos_excel(path)
+            clima = clima_sintetico(ventas['ds'].min(), ventas['ds'].max())
+            df = prediccion_ventas_clima.preparar_datos_entrenamiento(ventas, clima)
+            prediccion_ventas_clima.ajustar_modelo(df.iloc[:len(df) - dias_nuevos])
+            for i in range(dias_nuevos - 1, -1, -1):
+                dia = df.iloc[:len(df) - i]
+                _, meta = prediccion_ventas_clima.ajustar_modelo(dia, incremental=True)
+                if meta['modo'] == 'tibio':
+                    tibio.append(meta['segundos_ajuste'])
+                _, meta = prediccion_ventas_clima.ajustar_modelo(dia)
+                frio.append(meta['segundos_ajuste'])
+    finally:
+        registro_modelos.CARPETA_MODELOS = carpeta_original
+        prediccion_ventas_clima.TIENDA = tienda_original
+    resultados = {"ajuste_frio": {"min_s": min(frio), "media_s": sum(frio) / len(frio), "repeticiones": len(frio)}}
+    if tibio:
+        resultados["ajuste_tibio"] = {"min_s": min(tibio), "media_s": sum(tibio) / len(tibio), "repeticiones": len(tibio)}
+    return resultados
+
+def medir_carga_carpeta(carpeta, filas, clientes, dias, archivos=12):
+    """Reparte el volumen en `archivos` libros mensuales y compara su lectura secuencial y en paralelo."""
+    if not os.path.exists(carpeta):
+        os.makedirs(carpeta)
+        dias_archivo = max(dias // archivos, 1)
+        for i in range(archivos):
+            inicio = pd.Timestamp("2024-01-01") + pd.Timedelta(days=i * dias_archivo)
+            generar_excel_sintetico(os.path.join(carpeta, f"compras_{i + 1:02d}.xlsx"), max(filas // archivos, 1),
+                                    clientes, dias_archivo, inicio=str(inicio.date()), semilla=i)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        secuencial, _ = medir(lambda: carga_multiple.cargar_varios(carpeta, procesos=1), 1)
+        paralela, _ = medir(lambda: carga_multiple.cargar_varios(carpeta), 1)
+    return {"carpeta_secuencial": secuencial, "carpeta_paralela": paralela}
+
+def medir_pdf(path):
+    """Tamaño y tiempo del informe de ventas con cada perfil de gráficos, con la caché vacía y llena."""
+    resultados = {}
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        informe_ventas.cargar_excel(path)
+        for perfil in reportes_pdf.PERFILES_PDF:
+            reportes_pdf.podar_cache(0)
+            for paso in (perfil, f"{perfil} (cache)"):
+                archivo = informe_ventas.generar_pdf(con_graficos=True, perfil=perfil)
+                datos = reportes_pdf.INFORMES[archivo]
+                resultados[paso] = {"s": datos['segundos'], "kb": datos['kb']}
+    return resultados
+
+def medir_dashboard(path, timeout=300):
+    """Recorre las opciones del dashboard con AppTest y mide cada recarga, en frío y de vuelta sin cambios."""
+    from streamlit.testing.v1 import AppTest
+
+    with open(path, "rb") as f:
+        contenido = f.read()
+
+    resultados = {}
+    at = AppTest.from_file("dashboard.py", default_timeout=timeout)
+    t0 = time.perf_counter()
+    at.run()
+    resultados["inicio"] = {"s": time.perf_counter() - t0}
+
+    at.sidebar.file_uploader[0].upload(os.path.basename(path), contenido, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    t0 = time.perf_counter()
+    at.run()
+    resultados["subir_excel"] = {"s": time.perf_counter() - t0}
+
+    for opcion in OPCIONES_DASHBOARD:
+        at.sidebar.selectbox[0].set_value(opcion)
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            at.run()
+        resultados[opcion] = {"s": time.perf_counter() - t0, "errores": len(at.exception)}
+
+    # Segunda pasada sin cambios: mide lo que cuesta volver a una vista ya calculada
+    for opcion in OPCIONES_DASHBOARD:
+        at.sidebar.selectbox[0].set_value(opcion)
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            at.run()
+        resultados[f"{opcion} (recarga)"] = {"s": time.perf_counter() - t0, "errores": len(at.exception)}
+    return resultados
+
+# ==============================
+# 4️⃣ Resultados y comparación entre versiones
+# ==============================
+def version_codigo():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocida"
+
+def carpeta_benchmarks():
+    carpeta = os.path.join(crear_carpeta_reportes(), "benchmarks")
+    if not os.path.exists(carpeta):
+        os.makedirs(carpeta)
+    return carpeta
+
+def guardar_resultados(resultados):
+    archivo = os.path.join(carpeta_benchmarks(), f"benchmark_{timestamp()}_{resultados['version']}.json")
+    with open(archivo, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    return archivo
+
+def _aplanar(resultados):
+    """{(tamaño, grupo, paso): segundos} para comparar ejecuciones."""
+    plano = {}
+    for corrida in resultados["tamanos"]:
+        etiqueta = f"{corrida['filas']}x{corrida['clientes']}x{corrida['dias']}"
+        for grupo in ("funciones", "refresco", "carga", "pdf", "dashboard"):
+            for paso, valores in corrida.get(grupo, {}).items():
+                plano[(etiqueta, grupo, paso)] = valores.get("min_s", valores.get("s"))
+    return plano
+
+def comparar_con_anterior(archivo_actual, umbral=0.15):
+    """Compara con la ejecución previa guardada y marca regresiones por encima de `umbral`."""
+    archivos = sorted(glob.glob(os.path.join(carpeta_benchmarks(), "benchmark_*.json")))
+    archivos = [a for a in archivos if os.path.abspath(a) != os.path.abspath(archivo_actual)]
+    if not archivos:
+        print("\nℹ No hay ejecuciones anteriores para comparar.")
+        return
+
+    with open(archivos[-1], encoding="utf-8") as f:
+        anterior = json.load(f)
+    with open(archivo_actual, encoding="utf-8") as f:
+        actual = json.load(f)
+
+    plano_anterior = _aplanar(anterior)
+    plano_actual = _aplanar(actual)
+    print(f"\n📊 Comparación {anterior['version']} → {actual['version']}")
+    for clave, segundos in plano_actual.items():
+        previo = plano_anterior.get(clave)
+        if not previo:
+            continue
+        cambio = (segundos - previo) / previo
+        marca = "⚠ REGRESIÓN" if cambio > umbral else ("✅" if cambio < -umbral else "")
+        print(f"   - {clave[0]:>18} | {clave[1]:<9} | {clave[2]:<32} {previo:8.3f}s → {segundos:8.3f}s ({cambio:+.0%}) {marca}")
+
+def ejecutar(tamanos=TAMANOS_DEFECTO, repeticiones=3, con_dashboard=True):
+    carpeta_datos = os.path.join(carpeta_benchmarks(), "datos")
+    if not os.path.exists(carpeta_datos):
+        os.makedirs(carpeta_datos)
+
+    resultados = {
+        "version": version_codigo(),
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "tamanos": [],
+    }
+
+    with clima_local():
+        for filas, clientes, dias in tamanos:
+            path = os.path.join(carpeta_datos, f"compras_{filas}_{clientes}_{dias}.xlsx")
+            if not os.path.exists(path):
+                print(f"⏳ Generando libro sintético: {filas} filas, {clientes} clientes, {dias} días...")
+                generar_excel_sintetico(path, filas, clientes, dias)
+
+            print(f"⏱ Midiendo {os.path.basename(path)}...")
+            corrida = {"filas": filas, "clientes": clientes, "dias": dias}
+            reiniciar_estado()
+            corrida["funciones"] = medir_funciones(path, repeticiones)
+            corrida["refresco"] = medir_refresco_incremental(path)
+            corrida["carga"] = medir_carga_carpeta(os.path.join(carpeta_datos, f"meses_{filas}_{clientes}_{dias}"), filas, clientes, dias)
+            reiniciar_estado()
+            corrida["pdf"] = medir_pdf(path)
+            if con_dashboard:
+                reiniciar_estado()
+                corrida["dashboard"] = medir_dashboard(path)
+            resultados["tamanos"].append(corrida)
+
+            for paso, valores in corrida["funciones"].items():
+                print(f"   - {paso:<20} {valores['min_s']:.3f}s")
+            for paso, valores in corrida["refresco"].items():
+                print(f"   - {paso:<20} {valores['media_s']:.3f}s (media de {valores['repeticiones']} días)")
+            for paso, valores in corrida["carga"].items():
+                print(f"   - {paso:<20} {valores['min_s']:.3f}s (12 libros mensuales)")
+            for paso, valores in corrida["pdf"].items():
+                print(f"   - [pdf] {paso:<22} {valores['s']:.3f}s, {valores['kb']:.1f} KB")
+            for paso, valores in corrida.get("dashboard", {}).items():
+                print(f"   - [dashboard] {paso:<32} {valores['s']:.3f}s")
+
+    archivo = guardar_resultados(resultados)
+    print(f"\n✅ Resultados guardados: {archivo}")
+    comparar_con_anterior(archivo)
+    return archivo
+
+def _parsear_tamano(texto):
+    filas, clientes, dias = (int(x) for x in texto.split("x"))
+    return filas, clientes, dias
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de carga, informes y predicción con libros sintéticos.")
+    parser.add_argument("--tamano", action="append", type=_parsear_tamano,
+                        help="Tamaño como FILASxCLIENTESxDIAS (repetible). Ej: --tamano 5000x200x90")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--sin-dashboard", action="store_true", help="No medir los flujos del dashboard")
+    args = parser.parse_args()
+    ejecutar(args.tamano or TAMANOS_DEFECTO, args.repeticiones, not args.sin_dashboard)
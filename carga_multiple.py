@@ -0,0 +1,152 @@
+import glob
+import io
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from informe_ventas import leer_excel_ventas
+from historial_ventas import claves_factura, CAMPOS_CLAVE
+from utilidades import COLUMNAS_COMPROBANTE
+
+MESES = ('enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio', 'agosto',
+         'septiembre', 'setiembre', 'octubre', 'noviembre', 'diciembre')
+
+# ==============================
+# 📂 Archivos a combinar
+# ==============================
+def es_multiple(origen):
+    """True si `origen` es una lista de archivos, una carpeta o un patrón glob en lugar de un único archivo."""
+    if isinstance(origen, list):
+        return True
+    return isinstance(origen, str) and (os.path.isdir(origen) or any(c in origen for c in "*?["))
+
+def leer_ventas(origen):
+    """Operaciones de un archivo, o de todos los de una carpeta/patrón combinados en paralelo."""
+    if es_multiple(origen):
+        return cargar_varios(origen)[0]
+    return leer_excel_ventas(origen)
+
+def listar_archivos(origen):
+    """Libros .xlsx de una carpeta o que coinciden con un patrón, ordenados por nombre."""
+    patron = os.path.join(origen, "*.xlsx") if os.path.isdir(origen) else origen
+    # Excel deja archivos "~$..." mientras un libro está abierto
+    return sorted(a for a in glob.glob(patron) if not os.path.basename(a).startswith("~$"))
+
+# ==============================
+# ⚙️ Lectura en paralelo
+# ==============================
+def _leer(fuente):
+    """Lee un libro dentro de un proceso del pool. `fuente` es una ruta o (nombre, bytes)."""
+    inicio = time.perf_counter()
+    if isinstance(fuente, tuple):
+        nombre, contenido = fuente[0], io.BytesIO(fuente[1])
+    else:
+        nombre, contenido = os.path.basename(fuente), fuente
+    try:
+        df = leer_excel_ventas(contenido)
+        error = None
+    except Exception as e:  # Un mes dañado no debe impedir cargar el resto
+        df, error = None, str(e)
+    return nombre, df, error, time.perf_counter() - inicio
+
+def origen_archivo(nombre):
+    """Tienda u origen de un libro según su nombre: lo que va antes de la fecha o el mes.
+
+    "norte_2024-03.xlsx" y "norte_2024-04-15.xlsx" son del origen "norte";
+    "sur marzo.xlsx" es de "sur"; los libros nombrados solo por fecha comparten el
+    origen "". Solo se comparan operaciones del mismo origen.
+    """
+    base = os.path.splitext(os.path.basename(nombre))[0].lower()
+    corte = re.search(r"\d|(?<![a-záéíóúñ])(" + "|".join(MESES) + r")(?![a-záéíóúñ])", base)
+    return re.sub(r"[\s_\-.]+", " ", base[:corte.start()] if corte else base).strip()
+
+def _solapes(informe):
+    """Pares de archivos del mismo origen cuyos rangos de fechas se cruzan."""
+    rangos = informe.dropna(subset=['desde']).sort_values('desde')
+    pares = []
+    for _, grupo in rangos.groupby('origen', sort=False):
+        filas = list(grupo.itertuples(index=False))
+        for i, a in enumerate(filas):
+            for b in filas[i + 1:]:
+                if b.desde > a.hasta:
+                    break
+                pares.append((a.archivo, b.archivo))
+    return pares
+
+def _comprobantes(df):
+    """Número de comprobante de cada operación ('' si el libro no lo trae)."""
+    columnas = {str(c).strip().lower(): c for c in df.columns}
+    columna = next((columnas[c] for c in COLUMNAS_COMPROBANTE if c in columnas), None)
+    if columna is None:
+        return pd.Series("", index=df.index)
+    return df[columna].astype(str).str.strip().where(df[columna].notna(), "")
+
+def cargar_varios(fuentes, procesos=None):
+    """Lee varios libros "Compras" en paralelo y los une con la columna `archivo` de origen.
+
+    `fuentes` es una carpeta, un patrón glob o una lista de rutas o (nombre, bytes).
+    Las operaciones con un comprobante ya visto en otro archivo del mismo origen se
+    descartan. Devuelve (operaciones, informe por archivo).
+    """
+    if isinstance(fuentes, str):
+        origen, fuentes = fuentes, listar_archivos(fuentes)
+        if not fuentes:
+            raise ValueError(f"No se encontraron archivos .xlsx en '{origen}'.")
+    fuentes = list(fuentes)
+
+    inicio = time.perf_counter()
+    procesos = max(1, min(len(fuentes), procesos or os.cpu_count() or 1))
+    if procesos == 1:
+        resultados = [_leer(f) for f in fuentes]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            resultados = list(pool.map(_leer, fuentes))
+
+    frames, contenidos, filas_informe = [], [], []
+    for nombre, df, error, segundos in resultados:
+        fila = {'archivo': nombre, 'origen': origen_archivo(nombre), 'filas': 0, 'desde': pd.NaT, 'hasta': pd.NaT,
+                'duplicadas': 0, 'sospechosas': 0, 'segundos': round(segundos, 3), 'error': error}
+        if df is not None:
+            fila.update(filas=len(df), desde=df['fecha'].min(), hasta=df['fecha'].max())
+            frames.append(df.assign(archivo=nombre, _origen=fila['origen'], _comprobante=_comprobantes(df)))
+            # Misma combinación cliente, fecha, importes y productos (numerada dentro del archivo)
+            contenidos.append(claves_factura(df[[c for c in CAMPOS_CLAVE if c in df.columns]]))
+        filas_informe.append(fila)
+    informe = pd.DataFrame(filas_informe)
+
+    errores = informe[informe['error'].notna()]
+    if not frames:
+        raise ValueError("Ningún archivo pudo leerse: " + "; ".join(f"{a}: {e}" for a, e in zip(errores['archivo'], errores['error'])))
+
+    operaciones = pd.concat(frames, ignore_index=True)
+    # Solo se descarta una operación si su comprobante apareció antes en otro libro del mismo origen
+    # (exports que se solapan). Un comprobante repetido dentro del mismo libro, una venta sin
+    # comprobante o la misma venta en tiendas distintas se informan como sospechosas pero se conservan.
+    clave = ['_origen', '_comprobante', 'cliente']
+    con_numero = operaciones['_comprobante'] != ""
+    repetido = con_numero & operaciones.duplicated(clave)
+    primer_archivo = operaciones.groupby(clave, sort=False)['archivo'].transform('first')
+    repetidas = repetido & (primer_archivo != operaciones['archivo'])
+    contenido = pd.Series(np.concatenate(contenidos), index=operaciones.index)
+    sospechosas = ~repetidas & (repetido | contenido.duplicated())
+    for columna, marca in (('duplicadas', repetidas), ('sospechosas', sospechosas)):
+        conteo = operaciones.loc[marca, 'archivo'].value_counts()
+        informe[columna] = informe['archivo'].map(conteo).fillna(0).astype(int)
+    operaciones = operaciones[~repetidas].drop(columns=['_origen', '_comprobante']).reset_index(drop=True)
+
+    print(f"\n📚 {len(frames)} de {len(fuentes)} archivos leídos con {procesos} proceso(s) "
+          f"en {time.perf_counter() - inicio:.2f} s ({len(operaciones)} operaciones).")
+    for _, fila in errores.iterrows():
+        print(f"   ❌ {fila['archivo']}: {fila['error']}")
+    for a, b in _solapes(informe):
+        print(f"   ⚠ Fechas superpuestas entre {a} y {b}.")
+    if repetidas.any():
+        print(f"   ⚠ Se descartaron {int(repetidas.sum())} operaciones con comprobante repetido entre archivos del mismo origen.")
+    if sospechosas.any():
+        print(f"   ℹ {int(sospechosas.sum())} operaciones repiten el comprobante dentro de su archivo o coinciden con otras "
+              f"de otro archivo (cliente, fecha, importes y productos); se conservan. Revisa el informe por archivo.")
+    return operaciones, informe
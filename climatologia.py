@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# ==============================
+# ⚙️ Configuración
+# ==============================
+# Tablas por ubicación guardadas como CSV: una fila por día del año (1–365)
+CARPETA_CLIMATOLOGIA = os.path.join("datos", "climatologia")
+ANIOS_HISTORIA = 10  # Años de Meteostat con los que se arma la tabla
+MEDIA_VENTANA = 7  # Días a cada lado que se juntan con cada día del año (suaviza años con huecos)
+VIGENCIA_DIAS = 180  # Antigüedad a partir de la cual la tabla se vuelve a construir
+REINTENTO_FALLO = 30 * 60  # Segundos que se espera antes de reintentar una descarga fallida
+CUANTILES = (0.1, 0.5, 0.9)
+VARIABLES = ('temp', 'lluvia')
+
+COLUMNAS = ['dia'] + [f"{v}_{e}" for v in VARIABLES for e in ['media'] + [f"p{int(q * 100)}" for q in CUANTILES]] + ['dias']
+
+# Tablas ya abiertas en este proceso: {(lat, lon): (DataFrame indexado por día del año, fecha de la tabla)}
+_tablas = {}
+_construyendo = {}  # {(lat, lon): hilo que está descargando}
+_fallos = {}  # {(lat, lon): momento de la última descarga fallida}
+_candado = threading.Lock()  # Protege los diccionarios; nunca se tiene durante una descarga
+
+def dia_del_anio(fechas):
+    """Día del año de 1 a 365; el 29 de febrero cuenta como 28 de febrero."""
+    fechas = pd.DatetimeIndex(pd.to_datetime(fechas))
+    dia = fechas.dayofyear.to_numpy()
+    return dia - (fechas.is_leap_year & (dia > 59))
+
+def _ruta(lat, lon):
+    return os.path.join(CARPETA_CLIMATOLOGIA, f"{lat:.3f}_{lon:.3f}.csv")
+
+# ==============================
+# 🧮 Construcción
+# ==============================
+def construir(clima):
+    """Media, cuantiles y días con dato por día del año a partir de un histórico diario (ds, temp, lluvia).
+
+    Cada día del año junta los valores de ±MEDIA_VENTANA días de todos los años,
+    así un año con huecos o atípico no decide solo la fila.
+    """
+    clima = clima[['ds', *VARIABLES]].copy()
+    clima['ds'] = pd.to_datetime(clima['ds']).dt.normalize()
+    clima = clima.drop_duplicates('ds', keep='last')
+    anios = clima['ds'].dt.year.to_numpy()
+    fila = anios - anios.min()
+    columna = dia_del_anio(clima['ds']) - 1
+
+    tabla = {'dia': np.arange(1, 366)}
+    desplazamientos = np.arange(-MEDIA_VENTANA, MEDIA_VENTANA + 1)
+    for variable in VARIABLES:
+        # Matriz años × 365 (NaN si falta el día) y sus copias desplazadas: (ventana·años) × 365
+        matriz = np.full((fila.max() + 1, 365), np.nan)
+        matriz[fila, columna] = pd.to_numeric(clima[variable], errors='coerce').to_numpy(dtype='float64')
+        muestras = np.concatenate([np.roll(matriz, -d, axis=1) for d in desplazamientos])
+        with warnings.catch_warnings():
+            # Días del año sin ninguna muestra: quedan en NaN y se rellenan abajo
+            warnings.simplefilter('ignore', RuntimeWarning)
+            tabla[f"{variable}_media"] = np.nanmean(muestras, axis=0)
+            for q, valores in zip(CUANTILES, np.nanquantile(muestras, CUANTILES, axis=0)):
+                tabla[f"{variable}_p{int(q * 100)}"] = valores
+        dias = (~np.isnan(muestras)).sum(axis=0)
+        tabla['dias'] = np.minimum(tabla['dias'], dias) if 'dias' in tabla else dias
+
+    tabla = pd.DataFrame(tabla, columns=COLUMNAS).set_index('dia')
+    # Días sin ninguna muestra (histórico muy corto): se toma el promedio de la tabla
+    return tabla.fillna(tabla.mean()).fillna(0.0)
+
+# ==============================
+# 📂 Tabla por ubicación
+# ==============================
+def _clave(lat, lon):
+    return (round(float(lat), 3), round(float(lon), 3))
+
+def _abrir(clave):
+    """(tabla, fecha de la tabla) desde memoria o disco; (None, None) si nunca se construyó."""
+    with _candado:
+        if clave not in _tablas:
+            ruta = _ruta(*clave)
+            if not os.path.exists(ruta):
+                return None, None
+            _tablas[clave] = (pd.read_csv(ruta, index_col='dia'), os.path.getmtime(ruta))
+        return _tablas[clave]
+
+def _construir_y_guardar(clave, descargar):
+    fin = pd.Timestamp.today().normalize() - pd.Timedelta(days=1)
+    inicio = fin - pd.DateOffset(years=ANIOS_HISTORIA)
+    print(f"📚 Construyendo la climatología de la ubicación con {ANIOS_HISTORIA} años de historia...")
+    try:
+        historico = descargar(inicio, fin)
+        if historico is None or historico.empty:
+            raise ValueError("el histórico llegó vacío")
+        tabla = construir(historico)
+        ruta = _ruta(*clave)
+        os.makedirs(CARPETA_CLIMATOLOGIA, exist_ok=True)
+        temporal = f"{ruta}.tmp{os.getpid()}-{threading.get_ident()}"
+        tabla.to_csv(temporal)
+        os.replace(temporal, ruta)
+    except Exception as e:
+        print(f"⚠ No se pudo construir la climatología (se reintenta en {REINTENTO_FALLO // 60} min): {e}")
+        with _candado:
+            _fallos[clave] = time.time()
+            del _construyendo[clave]
+        return
+    with _candado:
+        _tablas[clave] = (tabla, time.time())
+        _fallos.pop(clave, None)
+        del _construyendo[clave]
+    print(f"✅ Climatología guardada en {ruta}.")
+
+def preparar(lat, lon, descargar):
+    """Construye o renueva en un hilo la tabla de la ubicación si falta o está vencida.
+
+    `descargar` es la función que trae el histórico diario (obtener_clima_historico).
+    Vuelve enseguida con el hilo lanzado (o el que ya está descargando), o None si
+    la tabla está vigente o la última descarga falló hace menos de REINTENTO_FALLO.
+    """
+    clave = _clave(lat, lon)
+    tabla, fecha = _abrir(clave)
+    with _candado:
+        if tabla is not None and time.time() - fecha < VIGENCIA_DIAS * 86400:
+            return None
+        if clave in _construyendo:
+            return _construyendo[clave]
+        if time.time() - _fallos.get(clave, -REINTENTO_FALLO) < REINTENTO_FALLO:
+            return None
+        hilo = threading.Thread(target=_construir_y_guardar, args=(clave, descargar),
+                                name=f"climatologia-{clave[0]}_{clave[1]}", daemon=True)
+        _construyendo[clave] = hilo
+        hilo.start()
+    return hilo
+
+def disponible(lat, lon):
+    """Tabla ya construida de la ubicación (aunque esté vencida), sin descargar nada; None si no hay."""
+    return _abrir(_clave(lat, lon))[0]
+
+def obtener(lat, lon, descargar):
+    """Climatología de la ubicación, esperando a construirla si falta o está vencida.
+
+    Devuelve None si nunca se pudo obtener histórico. El entrenamiento no la usa:
+    toma `disponible` y deja la construcción a `preparar`.
+    """
+    hilo = preparar(lat, lon, descargar)
+    if hilo is not None:
+        hilo.join()
+    return disponible(lat, lon)
+
+# ==============================
+# 🔎 Consulta
+# ==============================
+def consultar(tabla, fechas, estadistico='media'):
+    """DataFrame (ds, temp, lluvia) con el valor típico de cada fecha según la tabla (media o p10/p50/p90)."""
+    fechas = pd.DatetimeIndex(pd.to_datetime(fechas)).normalize()
+    posicion = dia_del_anio(fechas) - 1  # La tabla tiene una fila por día del año, en orden
+    return pd.DataFrame({'ds': fechas, **{v: tabla[f"{v}_{estadistico}"].to_numpy()[posicion] for v in VARIABLES}})
+
+def completar(clima, fechas, tabla, estadistico='media'):
+    """Clima diario que cubre `fechas`: los días sin dato (o con NaN) se toman de la climatología.
+
+    Devuelve (clima completado y ordenado, número de días completados).
+    """
+    clima = clima[['ds', *VARIABLES]].copy()
+    clima['ds'] = pd.to_datetime(clima['ds']).dt.normalize()
+    for variable in VARIABLES:
+        clima[variable] = pd.to_numeric(clima[variable], errors='coerce').astype('float64')
+    clima = clima.drop_duplicates('ds', keep='last').set_index('ds')
+
+    fechas = pd.DatetimeIndex(pd.to_datetime(fechas)).normalize()
+    fechas = pd.date_range(fechas.min(), fechas.max(), freq='D')
+    clima = clima.reindex(clima.index.union(fechas)).sort_index()
+    faltantes = clima.index[clima[list(VARIABLES)].isna().any(axis=1) & clima.index.isin(fechas)]
+    if len(faltantes):
+        tipicos = consultar(tabla, faltantes, estadistico).set_index('ds')
+        clima.loc[faltantes, list(VARIABLES)] = clima.loc[faltantes, list(VARIABLES)].fillna(tipicos)
+    return clima.rename_axis('ds').reset_index(), len(faltantes)
@@ -0,0 +1,125 @@
+import time
+
+import pandas as pd
+
+# DuckDB es opcional: sin él el dashboard sigue calculando todo con pandas
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+DISPONIBLE = duckdb is not None
+MENSAJE_INSTALAR = "Las consultas SQL necesitan DuckDB: pip install duckdb"
+MAX_FILAS = 10_000  # Filas que se devuelven como máximo por consulta
+
+# Tablas que ve cada consulta (las que no estén calculadas aún simplemente no existen)
+DESCRIPCION_TABLAS = {
+    'ventas': "operaciones del periodo (fecha, cliente, total, descuento, cantidad, ...)",
+    'ventas_diarias': "total por día (ds, y)",
+    'clima': "clima histórico (ds, temp, lluvia)",
+    'pronostico': "pronóstico del modelo (ds, yhat, yhat_lower, yhat_upper, ...)",
+}
+
+# ==============================
+# 📝 Consultas de las métricas existentes
+# ==============================
+# SUM de cero filas es NULL: COALESCE deja 0 como el .sum() de pandas con un filtro vacío
+SQL_RESUMEN = """
+SELECT COALESCE(SUM(total), 0) AS "Total ventas (S/.)",
+       COALESCE(SUM(descuento), 0) AS "Total descuentos (S/.)",
+       CAST(COALESCE(SUM(cantidad), 0) AS BIGINT) AS "Total unidades vendidas",
+       COUNT(*) AS "Total operaciones"
+FROM ventas
+"""
+
+SQL_VENTAS_DIARIAS = """
+SELECT CAST(fecha AS DATE) AS ds, SUM(total) AS y
+FROM ventas
+GROUP BY ds
+ORDER BY ds
+"""
+
+SQL_TOP_CLIENTES = """
+SELECT cliente, SUM({columna}) AS {columna}
+FROM ventas
+GROUP BY cliente
+ORDER BY {columna} DESC, cliente
+LIMIT {k}
+"""
+
+CONSULTAS_EJEMPLO = {
+    "Resumen del periodo": SQL_RESUMEN.strip(),
+    "Total por día": SQL_VENTAS_DIARIAS.strip(),
+    "Top 10 clientes por ventas": SQL_TOP_CLIENTES.format(columna='total', k=10).strip(),
+    "Ventas por día de la semana": """
+SELECT dayname(fecha) AS dia, COUNT(*) AS operaciones, SUM(total) AS ventas, AVG(total) AS ticket_medio
+FROM ventas
+GROUP BY dia, isodow(fecha)
+ORDER BY isodow(fecha)
+""".strip(),
+    "Ventas con el clima del día": """
+SELECT v.ds, v.y AS ventas, c.temp, c.lluvia
+FROM ventas_diarias v LEFT JOIN clima c ON CAST(c.ds AS DATE) = CAST(v.ds AS DATE)
+ORDER BY v.ds
+""".strip(),
+    "Ventas reales contra el pronóstico": """
+SELECT CAST(p.ds AS DATE) AS ds, v.y AS ventas, p.yhat, p.yhat_lower, p.yhat_upper, v.y - p.yhat AS diferencia
+FROM pronostico p LEFT JOIN ventas_diarias v ON CAST(v.ds AS DATE) = CAST(p.ds AS DATE)
+ORDER BY ds
+""".strip(),
+}
+
+# ==============================
+# 🦆 Motor
+# ==============================
+def conectar(tablas):
+    """Conexión DuckDB en memoria con `tablas` ({nombre: DataFrame o tabla Arrow}) registradas.
+
+    DuckDB lee los DataFrames y las tablas Arrow donde están, sin copiarlos. La
+    conexión no puede leer ni escribir archivos: solo ve las tablas registradas.
+    """
+    if duckdb is None:
+        raise ImportError(MENSAJE_INSTALAR)
+    conexion = duckdb.connect(config={'enable_external_access': False})
+    for nombre, datos in tablas.items():
+        if datos is not None:
+            conexion.register(nombre, datos)
+    return conexion
+
+def consultar(tablas, sql, limite=MAX_FILAS):
+    """Ejecuta `sql` sobre `tablas` y devuelve (DataFrame con hasta `limite` filas, segundos).
+
+    Una consulta inválida levanta ValueError con el mensaje de DuckDB.
+    """
+    inicio = time.perf_counter()
+    conexion = conectar(tablas)
+    try:
+        relacion = conexion.sql(sql)
+        if relacion is None:
+            raise ValueError("La consulta no devuelve filas: usa SELECT (o WITH ... SELECT).")
+        resultado = (relacion.limit(limite) if limite else relacion).df()
+    except duckdb.Error as e:
+        # Errores de sintaxis, tablas o columnas inexistentes, permisos: mensaje de DuckDB tal cual
+        raise ValueError(str(e)) from e
+    finally:
+        conexion.close()
+    return resultado, time.perf_counter() - inicio
+
+def resumen(ventas):
+    """Mismas métricas que informe_ventas.calcular_resumen, calculadas con SQL."""
+    return consultar({'ventas': ventas}, SQL_RESUMEN)[0].to_dict('records')[0]
+
+def ventas_diarias(ventas):
+    """Total por día (ds, y) con SQL, como la serie diaria del dashboard."""
+    diarias = consultar({'ventas': ventas}, SQL_VENTAS_DIARIAS, limite=None)[0]
+    diarias['ds'] = pd.to_datetime(diarias['ds'])
+    return diarias
+
+def top_clientes(ventas, columnas=('total', 'descuento', 'cantidad'), k=10):
+    """Top-k clientes por columna con SQL, en el formato de ranking_clientes.top_clientes."""
+    conexion = conectar({'ventas': ventas})
+    try:
+        return {columna: conexion.sql(SQL_TOP_CLIENTES.format(columna=columna, k=k)).df().set_index('cliente')
+                for columna in columnas}
+    finally:
+        conexion.close()
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+VARIABLES = ('temp', 'lluvia')
+
+# ==============================
+# 🧮 Núcleo vectorizado
+# ==============================
+def _pearson(A, B, minimo=3):
+    """Correlación de Pearson entre cada fila de A (a×n) y cada fila de B (b×n).
+
+    Los NaN se excluyen por pares. Todas las sumas salen de productos
+    matriciales sobre los datos y sus máscaras, en una sola pasada.
+    """
+    MA = (~np.isnan(A)).astype('float64')
+    MB = (~np.isnan(B)).astype('float64')
+    A0 = np.where(MA > 0, A, 0.0)
+    B0 = np.where(MB > 0, B, 0.0)
+
+    n = MA @ MB.T
+    sa = A0 @ MB.T
+    sb = MA @ B0.T
+    saa = (A0 * A0) @ MB.T
+    sbb = MA @ (B0 * B0).T
+    sab = A0 @ B0.T
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sab - sa * sb / n
+        var_a = saa - sa * sa / n
+        var_b = sbb - sb * sb / n
+        r = cov / np.sqrt(var_a * var_b)
+    r[(n < minimo) | (var_a <= 0) | (var_b <= 0)] = np.nan
+    return np.clip(r, -1.0, 1.0)
+
+def _desfasar(x, desfases):
+    """Matriz (len(desfases)×n) con x desplazada: fila L contiene x[t - L]."""
+    n = len(x)
+    salida = np.full((len(desfases), n), np.nan)
+    for i, L in enumerate(desfases):
+        if abs(L) >= n:
+            continue
+        if L >= 0:
+            salida[i, L:] = x[:n - L]
+        else:
+            salida[i, :n + L] = x[-L:]
+    return salida
+
+def alinear(ventas, clima):
+    """Ventas y clima sobre un calendario diario continuo (los desfases se miden en días)."""
+    ventas = ventas.copy()
+    clima = clima.copy()
+    ventas['ds'] = pd.to_datetime(ventas['ds'])
+    clima['ds'] = pd.to_datetime(clima['ds'])
+    calendario = pd.date_range(ventas['ds'].min(), ventas['ds'].max(), freq='D')
+    df = ventas.groupby('ds')['y'].sum().reindex(calendario).to_frame()
+    for variable in VARIABLES:
+        serie = pd.to_numeric(clima.groupby('ds')[variable].mean(), errors='coerce')
+        df[variable] = serie.reindex(calendario).to_numpy(dtype='float64')
+    df.index.name = 'ds'
+    return df
+
+# ==============================
+# 📊 Tablas de correlación
+# ==============================
+def correlaciones_desfasadas(alineado, desfase_min=0, desfase_max=7):
+    """Correlación de las ventas del día t con el clima del día t - desfase."""
+    desfases = list(range(desfase_min, desfase_max + 1))
+    B = np.vstack([_desfasar(alineado[v].to_numpy(dtype='float64'), desfases) for v in VARIABLES])
+    r = _pearson(alineado['y'].to_numpy(dtype='float64')[None, :], B)[0]
+    tabla = pd.DataFrame(r.reshape(len(VARIABLES), len(desfases)).T, index=desfases, columns=list(VARIABLES))
+    tabla.index.name = 'desfase'
+    return tabla
+
+def correlaciones_moviles(alineado, ventana=30, desfase=0):
+    """Correlación en ventana móvil de `ventana` días, calculada con sumas acumuladas."""
+    y = alineado['y'].to_numpy(dtype='float64')
+    minimo = max(3, ventana // 2)
+    resultado = {}
+    for variable in VARIABLES:
+        x = _desfasar(alineado[variable].to_numpy(dtype='float64'), [desfase])[0]
+        valido = ~np.isnan(x) & ~np.isnan(y)
+        x0 = np.where(valido, x, 0.0)
+        y0 = np.where(valido, y, 0.0)
+        terminos = np.vstack([valido, x0, y0, x0 * x0, y0 * y0, x0 * y0]).astype('float64')
+        acumulado = np.concatenate([np.zeros((6, 1)), np.cumsum(terminos, axis=1)], axis=1)
+        fin = np.arange(1, len(y) + 1)
+        inicio = np.maximum(fin - ventana, 0)
+        n, sx, sy, sxx, syy, sxy = acumulado[:, fin] - acumulado[:, inicio]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = sxy - sx * sy / n
+            vx = sxx - sx * sx / n
+            vy = syy - sy * sy / n
+            r = cov / np.sqrt(vx * vy)
+        r[(n < minimo) | (fin < ventana) | (vx <= 0) | (vy <= 0)] = np.nan
+        resultado[variable] = np.clip(r, -1.0, 1.0)
+    return pd.DataFrame(resultado, index=alineado.index)
+
+def correlaciones_por_cliente(operaciones, alineado, desfase_min=0, desfase_max=7, min_dias=5, max_clientes=None):
+    """Correlación desfasada de las compras diarias de cada cliente con el clima.
+
+    Devuelve {variable: DataFrame clientes×desfases}. Los días sin compras de un
+    cliente cuentan como 0; los días sin ninguna venta quedan fuera.
+    """
+    dias = operaciones['fecha'].dt.normalize()
+    matriz = operaciones.groupby([operaciones['cliente'], dias])['total'].sum().unstack(fill_value=0.0)
+    matriz = matriz.reindex(columns=alineado.index, fill_value=0.0)
+    matriz = matriz[(matriz > 0).sum(axis=1) >= min_dias]
+    if max_clientes:
+        matriz = matriz.loc[matriz.sum(axis=1).nlargest(max_clientes).index]
+
+    A = matriz.to_numpy(dtype='float64', copy=True)
+    A[:, np.isnan(alineado['y'].to_numpy(dtype='float64'))] = np.nan
+
+    desfases = list(range(desfase_min, desfase_max + 1))
+    B = np.vstack([_desfasar(alineado[v].to_numpy(dtype='float64'), desfases) for v in VARIABLES])
+    r = _pearson(A, B)
+    tablas = {}
+    for i, variable in enumerate(VARIABLES):
+        tabla = pd.DataFrame(r[:, i * len(desfases):(i + 1) * len(desfases)], index=matriz.index, columns=desfases)
+        tabla.columns.name = 'desfase'
+        tablas[variable] = tabla
+    return tablas
+
+def calcular_correlaciones(ventas, clima, desfase_min=0, desfase_max=7, ventana=30, operaciones=None, max_clientes=20):
+    """Todas las tablas del motor: desfases, ventana móvil y (opcional) por cliente."""
+    alineado = alinear(ventas, clima)
+    tablas = {
+        'desfases': correlaciones_desfasadas(alineado, desfase_min, desfase_max),
+        'moviles': correlaciones_moviles(alineado, ventana),
+    }
+    if operaciones is not None:
+        tablas['por_cliente'] = correlaciones_por_cliente(operaciones, alineado, desfase_min, desfase_max,
+                                                         max_clientes=max_clientes)
+    return tablas
+
+def mejor_desfase(tabla_desfases):
+    """Por variable, el desfase con mayor correlación absoluta y su valor."""
+    filas = []
+    for variable in tabla_desfases.columns:
+        serie = tabla_desfases[variable].dropna()
+        if serie.empty:
+            continue
+        desfase = serie.abs().idxmax()
+        filas.append({'variable': variable, 'desfase': desfase, 'correlacion': serie[desfase]})
+    return pd.DataFrame(filas)
+
+# ==============================
+# 🗺️ Mapas de calor
+# ==============================
+def graficar_mapa_calor(tabla, titulo, archivo, etiqueta_x="Desfase (días)", dpi=150):
+    """Guarda un mapa de calor de correlaciones (filas × columnas de `tabla`) en `archivo`."""
+    alto = max(2.5, 0.35 * len(tabla.index) + 1.5)
+    fig = Figure(figsize=(10, alto))
+    ax = fig.subplots()
+    imagen = ax.imshow(tabla.to_numpy(dtype='float64'), cmap='RdBu_r', vmin=-1, vmax=1, aspect='auto')
+    ax.set_xticks(range(len(tabla.columns)))
+    ax.set_xticklabels([str(c) for c in tabla.columns])
+    ax.set_yticks(range(len(tabla.index)))
+    ax.set_yticklabels([str(i) for i in tabla.index], fontsize=8)
+    ax.set_xlabel(etiqueta_x)
+    ax.set_title(titulo)
+    fig.colorbar(imagen, ax=ax, label="Correlación")
+    fig.tight_layout()
+    fig.savefig(archivo, dpi=dpi, bbox_inches='tight')
+    return archivo
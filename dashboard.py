@@ -2,10 +2,25 @@ import streamlit as st
 import pandas as pd
 import os
 import json
+import contextlib
 
 # IMPORTA TUS MODULOS COMO ESTÁN
 import informe_ventas
 import prediccion_ventas_clima
+import historial_ventas
+import ranking_clientes
+import correlacion_clima
+from grafo_dashboard import GrafoDependencias
+import graficos_interactivos
+import carga_multiple
+import segmentacion_rfm
+import anomalias_ventas
+import datos_compartidos
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import reportes_pdf
+import perfilado
+import consultas_sql
+import climatologia
 
 # =========== CONFIGURACIÓN ===========
 try:
@@ -107,7 +122,14 @@ def mostrar_archivos_recientes():
 
 # =========== SIDEBAR ===========
 st.sidebar.title("Opciones")
-uploaded_file = st.sidebar.file_uploader("Cargar archivo Excel", type=["xlsx"])
+uploaded_files = st.sidebar.file_uploader(
+    "Cargar archivos Excel", type=["xlsx"], accept_multiple_files=True,
+    help="Puedes subir varios meses o tiendas a la vez: se leen en paralelo y se combinan sin operaciones repetidas."
+)
+modo_historial = st.sidebar.checkbox(
+    "Acumular en historial (sin duplicados)",
+    help="Agrega el archivo al historial persistido descartando operaciones ya registradas y trabaja sobre todo el historial."
+)
 
 # =========== FUNCIONES DE NAVEGACIÓN ===========
 opciones = [
@@ -115,114 +137,387 @@ opciones = [
     "Filtrar por fechas",
     "Ver tendencia diaria",
     "Ver top clientes y gráficos",
+    "Segmentación RFM de clientes",
     "Generar PDF informe ventas",
     "Descargar clima histórico",
     "Correlación clima-ventas",
     "Entrenar modelo y predecir",
     "Ver predicción gráfica",
     "Exportar predicción a Excel",
-    "Generar PDF informe predicción"
+    "Generar PDF informe predicción",
+    "Simular escenarios climáticos",
+    "Detectar días anómalos",
+    "Consultas SQL"
 ]
 opcion = st.sidebar.selectbox("¿Qué deseas hacer?", opciones)
 
+# Perfilado a pedido: se activa por sesión y mide la acción elegida en cada recarga
+with st.sidebar.expander("🩺 Perfilado"):
+    perfilar_accion = st.checkbox("Perfilar esta acción", key="perfilar_accion",
+                                  help="Guarda en reportes/perfiles/ el flamegraph y las funciones más costosas de la vista. "
+                                       "Solo se mide lo que se calcula en esa recarga: lo ya guardado en el grafo no cuesta nada.")
+    modo_perfil = st.radio("Perfilador", perfilado.MODOS, key="modo_perfil", horizontal=True,
+                           help="muestreo: casi sin sobrecosto y con pilas completas · deterministico: cProfile, cuenta cada llamada.")
+
 # Mostrar archivos recientes en el sidebar (después de las opciones)
 mostrar_archivos_recientes()
 
-if uploaded_file:
+# =========== GRAFO DE CÁLCULOS ===========
+# archivo → ventas → filtradas → serie diaria → clima → modelo → gráficos.
+# Cada vista pide solo los nodos que usa y un nodo se recalcula únicamente si
+# cambiaron sus entradas; sin cambios, una recarga no repite ningún cálculo.
+grafo = GrafoDependencias(st.session_state.setdefault("grafo_dashboard", {}))
+
+def leer_archivos_subidos():
+    if len(uploaded_files) == 1:
+        return informe_ventas.leer_excel_ventas(uploaded_files[0])
+    operaciones, _ = carga_multiple.cargar_varios([(f.name, f.getvalue()) for f in uploaded_files])
+    return operaciones
+
+@grafo.nodo("ventas", entradas=("fuente", "historial"))
+def calcular_ventas():
+    if modo_historial:
+        return historial_ventas.cargar_historial()
+    # Los mismos archivos abiertos en varias sesiones se leen una vez y se comparten
+    # (Arrow con memory-map, solo lectura) hasta que la última sesión los suelta
+    clave = datos_compartidos.clave_contenido(*(f.getvalue() for f in uploaded_files))
+    referencia = st.session_state.get("datos_compartidos")
+    if referencia is None or referencia.clave != clave:
+        if referencia is not None:
+            referencia.soltar()
+        ctx = get_script_run_ctx()
+        referencia = datos_compartidos.Referencia(clave, ctx.session_id if ctx else "local", leer_archivos_subidos)
+        st.session_state["datos_compartidos"] = referencia
+    return referencia.df
+
+@grafo.nodo("ventas_filtradas", depende=("ventas",), entradas=("rango",))
+def calcular_ventas_filtradas(df):
+    if grafo.entradas.get("rango") is None:
+        return df
+    fecha_inicio, fecha_fin = grafo.entradas["rango"]
+    return df[(df['fecha'] >= pd.to_datetime(fecha_inicio)) & (df['fecha'] <= pd.to_datetime(fecha_fin))]
+
+@grafo.nodo("ventas_diarias", depende=("ventas_filtradas",))
+def calcular_ventas_diarias(df_filtro):
+    ventas_diarias = df_filtro.groupby(df_filtro['fecha'].dt.date)['total'].sum().reset_index()
+    ventas_diarias.columns = ['ds','y']
+    ventas_diarias['ds'] = pd.to_datetime(ventas_diarias['ds'])  # Convertir a datetime
+    return ventas_diarias
+
+# El clima solo se vuelve a descargar si cambia el periodo, no con cualquier cambio de ventas
+@grafo.nodo("periodo", depende=("ventas_diarias",), comparar=True)
+def calcular_periodo(ventas_diarias):
+    return ventas_diarias['ds'].min(), ventas_diarias['ds'].max()
+
+@grafo.nodo("clima", depende=("periodo",))
+def calcular_clima(periodo):
+    # La climatología (10 años de Meteostat) se descarga aparte, sin frenar el entrenamiento
+    climatologia.preparar(prediccion_ventas_clima.LAT, prediccion_ventas_clima.LON,
+                          prediccion_ventas_clima.obtener_clima_historico)
+    return prediccion_ventas_clima.obtener_clima_historico(*periodo)
+
+@grafo.nodo("modelo", depende=("ventas_diarias", "clima"), entradas=("incremental",))
+def calcular_modelo(ventas_diarias, clima_df):
+    with estado_prediccion():
+        prediccion_ventas_clima.entrenar_modelo(ventas_diarias, clima_df, incremental=grafo.entradas["incremental"])
+        return {
+            'modelo': prediccion_ventas_clima.modelo,
+            'forecast': prediccion_ventas_clima.forecast,
+            'futuro_regresores': prediccion_ventas_clima.futuro_regresores,
+            'meta': prediccion_ventas_clima.registro_modelos.cargar_meta(prediccion_ventas_clima.TIENDA),
+        }
+
+@grafo.nodo("correlaciones", depende=("ventas_diarias", "clima", "ventas_filtradas"),
+            entradas=("desfase_max", "ventana_corr", "por_cliente"))
+def calcular_correlaciones(ventas_diarias, clima_df, df_filtro):
+    with estado_prediccion():
+        return prediccion_ventas_clima.analizar_correlacion(
+            ventas_diarias, clima_df, desfase_max=grafo.entradas["desfase_max"],
+            ventana=grafo.entradas["ventana_corr"], operaciones=df_filtro if grafo.entradas["por_cliente"] else None,
+            con_graficos=False)
+
+# Payload compacto para los gráficos del navegador: predicción con su banda y componentes agregados
+@grafo.nodo("datos_prediccion", depende=("modelo", "ventas_diarias"))
+def calcular_datos_prediccion(entrenado, ventas_diarias):
+    return {
+        'pronostico': graficos_interactivos.datos_pronostico(entrenado['forecast'], ventas_diarias),
+        'componentes': graficos_interactivos.datos_componentes(entrenado['forecast']),
+    }
+
+@grafo.nodo("escenarios", depende=("modelo",), entradas=("modo_escenarios", "n_muestras"))
+def calcular_escenarios(entrenado):
+    with estado_prediccion():
+        return prediccion_ventas_clima.simular_escenarios(grafo.entradas["modo_escenarios"], grafo.entradas["n_muestras"])
+
+@grafo.nodo("excel_prediccion", depende=("modelo", "ventas_diarias", "clima"))
+def calcular_excel_prediccion(entrenado, ventas_diarias, clima_df):
+    with estado_prediccion():
+        return prediccion_ventas_clima.exportar_predicciones_excel()
+
+# El PDF usa el modelo y las correlaciones si existen: sus versiones entran como entradas
+@grafo.nodo("pdf_prediccion", depende=("ventas_diarias", "clima"), entradas=("version_modelo", "version_correlaciones", "perfil_pdf"))
+def calcular_pdf_prediccion(ventas_diarias, clima_df):
+    with estado_prediccion():
+        return prediccion_ventas_clima.generar_pdf(perfil=grafo.entradas.get("perfil_pdf"))
+
+# Con un modelo vigente los días también se comparan con el intervalo de su pronóstico.
+# El detector anterior se reutiliza: con días nuevos en el historial solo se puntúan esos días.
+@grafo.nodo("anomalias", depende=("ventas_diarias",),
+            entradas=("version_modelo", "ventana_anomalias", "umbral_anomalias", "registrar_anomalias", "conjunto"))
+def calcular_anomalias(ventas_diarias):
+    entrenado = grafo.vigente("modelo") if grafo.entradas.get("version_modelo") is not None else None
+    return anomalias_ventas.actualizar_detector(
+        grafo.anterior("anomalias"), ventas_diarias, forecast=entrenado['forecast'] if entrenado else None,
+        ventana=grafo.entradas["ventana_anomalias"], umbral=grafo.entradas["umbral_anomalias"],
+        registro=anomalias_ventas.ARCHIVO_REGISTRO if grafo.entradas["registrar_anomalias"] else None,
+        conjunto=grafo.entradas["conjunto"])
+
+# Las métricas pueden calcularse con pandas o con SQL (DuckDB) según la entrada `motor_metricas`
+@grafo.nodo("resumen", depende=("ventas_filtradas",), entradas=("motor_metricas",))
+def calcular_resumen(df_filtro):
+    if grafo.entradas.get("motor_metricas") == "duckdb":
+        return consultas_sql.resumen(df_filtro)
+    return informe_ventas.calcular_resumen(df_filtro)
+
+@grafo.nodo("ventas_diarias_sql", depende=("ventas_filtradas",))
+def calcular_ventas_diarias_sql(df_filtro):
+    return consultas_sql.ventas_diarias(df_filtro)
+
+@grafo.nodo("tops", depende=("ventas_filtradas",), entradas=("motor_metricas",))
+def calcular_tops(df_filtro):
+    if grafo.entradas.get("motor_metricas") == "duckdb":
+        return consultas_sql.top_clientes(df_filtro, k=10)
+    return ranking_clientes.top_clientes(df_filtro, k=10)
+
+# Tablas de la consulta: ventas del periodo y, si ya están calculados, clima y pronóstico
+@grafo.nodo("consulta_sql", depende=("ventas_filtradas", "ventas_diarias"),
+            entradas=("sql", "version_clima", "version_modelo"))
+def calcular_consulta_sql(df_filtro, ventas_diarias):
+    entrenado = grafo.vigente("modelo") if grafo.entradas.get("version_modelo") is not None else None
+    tablas = {
+        'ventas': df_filtro,
+        'ventas_diarias': ventas_diarias,
+        'clima': grafo.vigente("clima") if grafo.entradas.get("version_clima") is not None else None,
+        'pronostico': entrenado['forecast'] if entrenado else None,
+    }
+    try:
+        return consultas_sql.consultar(tablas, grafo.entradas["sql"]) + (None,)
+    except ValueError as e:
+        return None, None, str(e)
+
+@grafo.nodo("ranking", depende=("ventas_filtradas",))
+def calcular_ranking(df_filtro):
+    return ranking_clientes.RankingClientes().cargar(df_filtro)
+
+@grafo.nodo("rfm", depende=("ventas_filtradas",))
+def calcular_rfm(df_filtro):
+    return segmentacion_rfm.calcular_rfm(df_filtro)
+
+@grafo.nodo("excel_segmentos", depende=("rfm",))
+def calcular_excel_segmentos(rfm):
+    return informe_ventas.exportar_segmentos_excel(rfm)
+
+@grafo.nodo("pdf_ventas", depende=("ventas_filtradas",), entradas=("perfil_pdf",))
+def calcular_pdf_ventas(df_filtro):
+    with informe_ventas.candado_estado:
+        informe_ventas.archivo_excel = grafo.entradas.get("conjunto")
+        informe_ventas.df_ventas_original = grafo.vigente("ventas")
+        informe_ventas.df_ventas_filtrado = df_filtro
+        return informe_ventas.generar_pdf(con_graficos=True, perfil=grafo.entradas.get("perfil_pdf"))
+
+def obtener_archivos(nombre):
+    """Como grafo.obtener, pero regenera el nodo si alguno de sus archivos ya no está en reportes."""
+    valor = grafo.obtener(nombre)
+    rutas = valor if isinstance(valor, tuple) else (valor,)
+    if not all(ruta and os.path.exists(ruta) for ruta in rutas):
+        grafo.invalidar(nombre)
+        valor = grafo.obtener(nombre)
+    return valor
+
+def elegir_perfil_pdf():
+    """Selector de la salida de los gráficos del PDF; el valor entra al grafo como `perfil_pdf`."""
+    perfiles = list(reportes_pdf.PERFILES_PDF)
+    perfil = st.selectbox("Gráficos del PDF", perfiles, index=perfiles.index(reportes_pdf.ajustes_pdf()['perfil']),
+                          help="compacto: PNG reducido con paleta (archivo más liviano) · alta: PNG a 200 dpi · "
+                               "fotografico: JPEG · vectorial: SVG nítido a cualquier zoom.")
+    grafo.fijar(perfil_pdf=perfil)
+
+def mostrar_tamano_pdf(pdf_path):
+    datos = reportes_pdf.INFORMES.get(pdf_path)
+    if datos:
+        st.caption(f"📏 {datos['kb']:.1f} KB, generado en {datos['segundos']:.2f} s (perfil {datos['perfil']}).")
+
+def mostrar_perfil(perfil):
+    """Resumen del perfil de la acción con sus artefactos para descargar."""
+    with st.expander(f"🩺 Perfil de la acción: {perfil.segundos:.2f} s ({perfil.modo})", expanded=True):
+        st.dataframe(perfil.top, hide_index=True)
+        if 'svg' in perfil.archivos:
+            with open(perfil.archivos['svg'], encoding="utf-8") as f:
+                st.image(f.read(), caption="Flamegraph: el ancho de cada caja es el tiempo que pasó en esa llamada.")
+        columnas = st.columns(len(perfil.archivos))
+        for columna, (tipo, ruta) in zip(columnas, perfil.archivos.items()):
+            with open(ruta, "rb") as f:
+                columna.download_button(f"⬇️ .{tipo}", f.read(), file_name=os.path.basename(ruta), key=f"perfil_{tipo}")
+
+@contextlib.contextmanager
+def estado_prediccion():
+    """Expone en prediccion_ventas_clima los resultados vigentes del grafo de esta sesión (los usan sus
+    entrenamientos, PDF, Excel y escenarios) y las demás sesiones esperan hasta que termine el bloque."""
+    with prediccion_ventas_clima.candado_estado:
+        entrenado = grafo.vigente("modelo") or {}
+        prediccion_ventas_clima.ventas_diarias = grafo.vigente("ventas_diarias")
+        prediccion_ventas_clima.clima_df = grafo.vigente("clima")
+        prediccion_ventas_clima.modelo = entrenado.get('modelo')
+        prediccion_ventas_clima.forecast = entrenado.get('forecast')
+        prediccion_ventas_clima.futuro_regresores = entrenado.get('futuro_regresores')
+        prediccion_ventas_clima.correlaciones = grafo.vigente("correlaciones")
+        # El dashboard no genera PNG: el PDF dibuja (y cachea) los suyos con matplotlib
+        prediccion_ventas_clima.grafico_correlacion = None
+        prediccion_ventas_clima.grafico_desfases = None
+        prediccion_ventas_clima.grafico_prediccion = None
+        prediccion_ventas_clima.escenarios = grafo.vigente("escenarios")
+        yield
+
+if uploaded_files or (modo_historial and historial_ventas.existe_historial()):
     # ----- Cargar y exponer ventas -----
-    df = informe_ventas.cargar_excel(uploaded_file)
-    informe_ventas.df_ventas_original = df
-    informe_ventas.df_ventas_filtrado = df
+    if modo_historial:
+        # Solo se procesa cada archivo subido una vez por sesión
+        procesados = st.session_state.setdefault("historial_archivos", set())
+        nuevos = [f for f in uploaded_files if f.file_id not in procesados]
+        if nuevos:
+            procesados.update(f.file_id for f in nuevos)
+            try:
+                resumen_historial = historial_ventas.agregar_excel(
+                    nuevos[0] if len(nuevos) == 1 else [(f.name, f.getvalue()) for f in nuevos])
+                st.sidebar.success(f"Historial: {resumen_historial['nuevas']} operaciones nuevas, "
+                                   f"{resumen_historial['duplicadas']} duplicadas.")
+            except ValueError as e:
+                st.sidebar.error(f"❌ Formato de archivo no reconocido: {e}")
+        if not historial_ventas.existe_historial():
+            st.info("Carga un archivo Excel de ventas válido para comenzar el historial.")
+            st.stop()
+        fuente = ("historial",)
+    else:
+        fuente = ("archivos",) + tuple(f.file_id for f in uploaded_files)
+    # Otro archivo u origen: el rango de fechas anterior deja de aplicar
+    if grafo.entradas.get("fuente") != fuente:
+        grafo.fijar(fuente=fuente, rango=None,
+                    conjunto="historial" if modo_historial else ", ".join(sorted(f.name for f in uploaded_files)))
+    grafo.fijar(historial=historial_ventas.version_historial() if modo_historial else None)
+    try:
+        df = grafo.obtener("ventas")
+    except ValueError as e:
+        st.error(f"❌ Formato de archivo no reconocido: {e}")
+        st.stop()
 
     # --------- Filtrado por fechas ---------
+    # El rango elegido se conserva al cambiar de vista: todas trabajan sobre el frame filtrado
     if opcion == "Filtrar por fechas":
         st.subheader("Filtrar por rango de fechas")
-        fecha_min = df['fecha'].min()
-        fecha_max = df['fecha'].max()
-        fecha_inicio, fecha_fin = st.date_input("Rango de fechas:",
-                                                [fecha_min, fecha_max],
-                                                min_value=fecha_min,
-                                                max_value=fecha_max)
-        df_filtro = df[(df['fecha'] >= pd.to_datetime(fecha_inicio)) & (df['fecha'] <= pd.to_datetime(fecha_fin))]
-        informe_ventas.df_ventas_filtrado = df_filtro
+        fecha_min = df['fecha'].min().date()
+        fecha_max = df['fecha'].max().date()
+        rango = grafo.entradas.get("rango") or (fecha_min, fecha_max)
+        seleccion = st.date_input("Rango de fechas:",
+                                  list(rango),
+                                  min_value=fecha_min,
+                                  max_value=fecha_max)
+        # Mientras se elige el rango el widget devuelve solo la fecha de inicio
+        if len(seleccion) == 2:
+            grafo.fijar(rango=None if tuple(seleccion) == (fecha_min, fecha_max) else tuple(seleccion))
+        df_filtro = grafo.obtener("ventas_filtradas")
         st.write(f"Mostrando {len(df_filtro)} operaciones.")
         st.dataframe(df_filtro)
     else:
-        df_filtro = informe_ventas.df_ventas_filtrado
+        df_filtro = grafo.obtener("ventas_filtradas")
+
+    # Un perfil que quedó abierto porque la recarga anterior falló se cierra aquí
+    pendiente = st.session_state.pop("perfil_activo", None)
+    if pendiente is not None:
+        pendiente.detener()
+    perfil_accion = None
+    if perfilar_accion:
+        perfil_accion = st.session_state["perfil_activo"] = perfilado.Perfil(opcion, modo_perfil).iniciar()
 
     # --------- Métricas rápidas ---------
     if opcion == "Ver métricas rápidas":
         st.subheader("Métricas rápidas de ventas")
-        resumen = informe_ventas.calcular_resumen(df_filtro)
-        st.json(resumen)
+        if consultas_sql.DISPONIBLE:
+            motor = st.radio("Calcular con", ("pandas", "duckdb"), key="motor_metricas", horizontal=True,
+                             format_func=lambda m: "SQL (DuckDB)" if m == "duckdb" else m,
+                             help="Las métricas y los top clientes se calculan con el motor elegido; el resultado es el mismo.")
+            grafo.fijar(motor_metricas=motor)
+        st.json(grafo.obtener("resumen"))
         st.write("Total por día:")
-        st.dataframe(df_filtro.groupby(df_filtro['fecha'].dt.date)['total'].sum())
+        diarias = grafo.obtener("ventas_diarias_sql" if grafo.entradas.get("motor_metricas") == "duckdb" else "ventas_diarias")
+        st.dataframe(diarias.set_index('ds')['y'].rename('total'))
 
     # --------- Tendencia diaria ---------
     elif opcion == "Ver tendencia diaria":
         st.subheader("Tendencia diaria de ventas")
-        ventas_diarias = df_filtro.groupby(df_filtro['fecha'].dt.date)['total'].sum()
-        st.line_chart(ventas_diarias)
-        informe_ventas.generar_tendencia_diaria(para_pdf=False)
+        st.line_chart(grafo.obtener("ventas_diarias").set_index('ds')['y'].rename('total'))
 
     # --------- Top clientes ---------
     elif opcion == "Ver top clientes y gráficos":
         st.subheader("Top clientes por ventas, descuentos y cantidades")
-        top_clientes = df_filtro.groupby('cliente').agg({'total':'sum','descuento':'sum','cantidad':'sum'})
-        top_ventas = top_clientes[['total']].sort_values(by='total', ascending=False).head(10)
-        top_desc = top_clientes[['descuento']].sort_values(by='descuento', ascending=False).head(10)
-        top_cant = top_clientes[['cantidad']].sort_values(by='cantidad', ascending=False).head(10)
+        tops = grafo.obtener("tops")
+        top_ventas, top_desc, top_cant = tops['total'], tops['descuento'], tops['cantidad']
         st.write("Top 10 Ventas:")
         st.dataframe(top_ventas)
         st.write("Top 10 Descuentos:")
         st.dataframe(top_desc)
         st.write("Top 10 Cantidades:")
         st.dataframe(top_cant)
-        ventas_img, desc_img, cant_img = informe_ventas.generar_graficos(top_ventas, top_desc, top_cant)
-        
-        # Mostrar gráficos con botones de descarga
+
+        # Gráficos vectoriales en el navegador (se descargan como PNG/SVG desde su menú)
         col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.image(ventas_img, caption="Top 10 por ventas")
-            if os.path.exists(ventas_img):
-                with open(ventas_img, "rb") as img_file:
-                    st.download_button(
-                        label="📥 Descargar",
-                        data=img_file.read(),
-                        file_name=os.path.basename(ventas_img),
-                        mime="image/png",
-                        key="download_ventas_graph"
-                    )
-        
-        with col2:
-            st.image(desc_img, caption="Top 10 por descuentos")
-            if os.path.exists(desc_img):
-                with open(desc_img, "rb") as img_file:
-                    st.download_button(
-                        label="📥 Descargar",
-                        data=img_file.read(),
-                        file_name=os.path.basename(desc_img),
-                        mime="image/png",
-                        key="download_desc_graph"
-                    )
-        
-        with col3:
-            st.image(cant_img, caption="Top 10 por cantidades")
-            if os.path.exists(cant_img):
-                with open(cant_img, "rb") as img_file:
+        col1.altair_chart(graficos_interactivos.barras_top(top_ventas, 'total', "Top 10 por ventas"))
+        col2.altair_chart(graficos_interactivos.barras_top(top_desc, 'descuento', "Top 10 por descuentos"))
+        col3.altair_chart(graficos_interactivos.barras_top(top_cant, 'cantidad', "Top 10 por cantidades"))
+
+        # Ranking en ventanas móviles con movimientos respecto al periodo anterior
+        st.subheader("📅 Ranking en ventanas móviles")
+        col_v, col_m = st.columns(2)
+        ventana = col_v.selectbox("Ventana", ranking_clientes.VENTANAS,
+                                  format_func=lambda v: f"Últimos {v} días")
+        metrica = col_m.selectbox("Métrica", ranking_clientes.METRICAS)
+        ranking = grafo.obtener("ranking")
+        st.caption(f"Periodo hasta {ranking.fin.date()} comparado con los {ventana} días previos.")
+        st.dataframe(ranking.movimientos(ventana, metrica, k=10), hide_index=True)
+
+    # --------- Segmentación RFM ---------
+    elif opcion == "Segmentación RFM de clientes":
+        st.subheader("🎯 Segmentación RFM de clientes")
+        st.caption("Recencia (días desde la última compra), frecuencia (operaciones) y monto (S/) "
+                   "puntuados por quintiles del 1 al 5 sobre todos los clientes del periodo filtrado.")
+        rfm = grafo.obtener("rfm")
+        resumen = segmentacion_rfm.resumen_segmentos(rfm)
+        st.altair_chart(graficos_interactivos.barras_segmentos(resumen))
+        st.dataframe(resumen.style.format({
+            'pct_clientes': '{:.1f}%', 'ventas': 'S/. {:,.2f}', 'pct_ventas': '{:.1f}%', 'descuento': 'S/. {:,.2f}',
+            'recencia_media': '{:.0f} días', 'frecuencia_media': '{:.1f}', 'monto_medio': 'S/. {:,.2f}'}))
+
+        segmentos = st.multiselect("Clientes de los segmentos", list(resumen.index), default=list(resumen.index[:1]))
+        st.dataframe(rfm[rfm['segmento'].isin(segmentos)])
+
+        # El Excel con miles de clientes tarda más que la vista: se genera a pedido
+        if st.button("📤 Exportar segmentos a Excel"):
+            with st.spinner("Exportando segmentos a Excel..."):
+                excel_path = obtener_archivos("excel_segmentos")
+            if excel_path and os.path.exists(excel_path):
+                with open(excel_path, "rb") as excel_file:
                     st.download_button(
-                        label="📥 Descargar",
-                        data=img_file.read(),
-                        file_name=os.path.basename(cant_img),
-                        mime="image/png",
-                        key="download_cant_graph"
+                        label="📥 Descargar Segmentos RFM",
+                        data=excel_file.read(),
+                        file_name=os.path.basename(excel_path),
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        key="download_excel_segmentos"
                     )
 
     # --------- PDF informe ventas ---------
     elif opcion == "Generar PDF informe ventas":
+        elegir_perfil_pdf()
         with st.spinner("Generando informe PDF de ventas..."):
-            pdf_path = informe_ventas.generar_pdf(con_graficos=True)
+            pdf_path = obtener_archivos("pdf_ventas")
         st.success("PDF generado en la carpeta reportes.")
         
         # Botón de descarga del PDF de ventas
@@ -237,125 +532,92 @@ if uploaded_file:
                 mime="application/pdf",
                 key="download_pdf_ventas"
             )
+            mostrar_tamano_pdf(pdf_path)
             
             st.info("""
             📄 **El informe de ventas incluye:**
             - 📊 Resumen de métricas principales
             - 🏆 Top 10 clientes por ventas, descuentos y cantidades
             - 📈 Gráficos y tendencias de ventas
+            - 🎯 Segmentación RFM de clientes
             """)
 
     # ========= CLIMA Y PREDICCIONES =========
 
     # ----- Descargar clima histórico -----
     elif opcion == "Descargar clima histórico":
-        ventas_diarias = df_filtro.groupby(df_filtro['fecha'].dt.date)['total'].sum().reset_index()
-        ventas_diarias.columns = ['ds','y']
-        ventas_diarias['ds'] = pd.to_datetime(ventas_diarias['ds'])  # Convertir a datetime
-        clima_df = prediccion_ventas_clima.obtener_clima_historico(ventas_diarias['ds'].min(), ventas_diarias['ds'].max())
+        clima_df = grafo.obtener("clima")
         st.write(clima_df)
-        prediccion_ventas_clima.clima_df = clima_df
 
     # ----- Correlación clima-ventas -----
     elif opcion == "Correlación clima-ventas":
-        ventas_diarias = df_filtro.groupby(df_filtro['fecha'].dt.date)['total'].sum().reset_index()
-        ventas_diarias.columns = ['ds','y']
-        ventas_diarias['ds'] = pd.to_datetime(ventas_diarias['ds'])  # Convertir a datetime
-        if prediccion_ventas_clima.clima_df is None:
+        if not grafo.disponible("clima"):
             st.warning("Primero descarga el clima histórico.")
         else:
             st.subheader("🌡️ Análisis de Correlación Clima-Ventas")
+            col_d, col_v, col_c = st.columns(3)
+            desfase_max = col_d.slider("Desfase máximo (días)", 0, 30, 7)
+            ventana_corr = col_v.slider("Ventana móvil (días)", 7, 120, 30)
+            por_cliente = col_c.checkbox("Correlación por cliente (top 20)")
+            grafo.fijar(desfase_max=desfase_max, ventana_corr=ventana_corr, por_cliente=por_cliente)
             with st.spinner("Analizando correlación..."):
-                prediccion_ventas_clima.analizar_correlacion(ventas_diarias, prediccion_ventas_clima.clima_df)
-            if prediccion_ventas_clima.grafico_correlacion:
-                st.image(prediccion_ventas_clima.grafico_correlacion, caption="Correlación entre clima y ventas")
-                
-                # Botón de descarga del gráfico de correlación
-                if os.path.exists(prediccion_ventas_clima.grafico_correlacion):
-                    with open(prediccion_ventas_clima.grafico_correlacion, "rb") as img_file:
-                        img_bytes = img_file.read()
-                    
-                    st.download_button(
-                        label="📥 Descargar Gráfico de Correlación",
-                        data=img_bytes,
-                        file_name=os.path.basename(prediccion_ventas_clima.grafico_correlacion),
-                        mime="image/png",
-                        key="download_correlacion"
-                    )
-            else:
-                st.error("Error al generar el gráfico de correlación.")
+                correlaciones = grafo.obtener("correlaciones")
+            st.altair_chart(graficos_interactivos.dispersion_clima(grafo.obtener("ventas_diarias"), grafo.obtener("clima")))
+
+            st.subheader("⏱ Correlación por desfase")
+            st.caption("Ventas del día t frente al clima del día t - desfase.")
+            st.dataframe(correlaciones['desfases'].T.style.background_gradient(cmap='RdBu_r', vmin=-1, vmax=1).format("{:.3f}"))
+            st.dataframe(correlacion_clima.mejor_desfase(correlaciones['desfases']), hide_index=True)
+
+            st.subheader(f"📉 Correlación en ventana móvil de {ventana_corr} días")
+            st.line_chart(correlaciones['moviles'])
+
+            if 'por_cliente' in correlaciones:
+                st.subheader("👥 Correlación por cliente")
+                variable = st.radio("Variable", list(correlacion_clima.VARIABLES), horizontal=True)
+                st.dataframe(correlaciones['por_cliente'][variable].style.background_gradient(cmap='RdBu_r', vmin=-1, vmax=1).format("{:.3f}"))
 
     # ----- Entrenar modelo y predecir -----
     elif opcion == "Entrenar modelo y predecir":
-        ventas_diarias = df_filtro.groupby(df_filtro['fecha'].dt.date)['total'].sum().reset_index()
-        ventas_diarias.columns = ['ds','y']
-        ventas_diarias['ds'] = pd.to_datetime(ventas_diarias['ds'])  # Convertir a datetime
-        if prediccion_ventas_clima.clima_df is None:
+        if not grafo.disponible("clima"):
             st.warning("Primero descarga el clima histórico.")
         else:
-            prediccion_ventas_clima.ventas_diarias = ventas_diarias
-            prediccion_ventas_clima.entrenar_modelo(ventas_diarias, prediccion_ventas_clima.clima_df)
-            st.success("Modelo entrenado y predicciones generadas.")
+            incremental = st.checkbox(
+                "Actualización incremental (arranque en caliente)", value=True,
+                help="Parte de los parámetros del último modelo si solo llegaron días nuevos; si los datos cambiaron mucho reentrena desde cero."
+            )
+            grafo.fijar(incremental=incremental)
+            meta_modelo = grafo.obtener("modelo")['meta']
+            if "modelo" in grafo.recalculados:
+                st.success("Modelo entrenado y predicciones generadas.")
+            else:
+                st.success("El modelo ya está entrenado con estos datos; se reutilizan sus predicciones.")
+            if meta_modelo:
+                st.caption(f"Ajuste {'incremental' if meta_modelo['modo'] == 'tibio' else 'completo'} en "
+                           f"{meta_modelo['segundos_ajuste']:.2f} s · datos {meta_modelo['version_datos']} "
+                           f"({meta_modelo['desde']} a {meta_modelo['hasta']})")
 
     # ----- Ver predicción gráfica -----
     elif opcion == "Ver predicción gráfica":
-        if prediccion_ventas_clima.forecast is None:
+        if not grafo.disponible("modelo"):
             st.warning("Primero entrena el modelo y genera la predicción.")
         else:
             st.subheader("📈 Pronóstico de Ventas")
-            with st.spinner("Generando gráficos de predicción..."):
-                # Limpiar figuras anteriores
-                prediccion_ventas_clima.limpiar_figuras()
-                fig1, fig2 = prediccion_ventas_clima.graficar_prediccion_streamlit()
-            
-            if fig1 is not None:
-                st.pyplot(fig1)
-                
-                # Botón de descarga del gráfico principal
-                if prediccion_ventas_clima.grafico_prediccion and os.path.exists(prediccion_ventas_clima.grafico_prediccion):
-                    with open(prediccion_ventas_clima.grafico_prediccion, "rb") as img_file:
-                        img_bytes = img_file.read()
-                    
-                    st.download_button(
-                        label="📥 Descargar Gráfico de Predicción",
-                        data=img_bytes,
-                        file_name=os.path.basename(prediccion_ventas_clima.grafico_prediccion),
-                        mime="image/png",
-                        key="download_prediccion_main"
-                    )
-                
-                st.subheader("🔍 Componentes del Modelo")
-                st.pyplot(fig2)
-                
-                # Botón de descarga del gráfico de componentes (necesitamos la ruta)
-                # Vamos a obtener la ruta del gráfico de componentes
-                carpeta = prediccion_ventas_clima.crear_carpeta_reportes()
-                archivos_componentes = [f for f in os.listdir(carpeta) if f.startswith("componentes_prediccion_") and f.endswith(".png")]
-                if archivos_componentes:
-                    archivo_componentes = os.path.join(carpeta, max(archivos_componentes))  # El más reciente
-                    with open(archivo_componentes, "rb") as img_file:
-                        img_bytes = img_file.read()
-                    
-                    st.download_button(
-                        label="📥 Descargar Gráfico de Componentes",
-                        data=img_bytes,
-                        file_name=os.path.basename(archivo_componentes),
-                        mime="image/png",
-                        key="download_componentes"
-                    )
-                
-                # Limpiar figuras después de mostrarlas
-                prediccion_ventas_clima.limpiar_figuras()
-            else:
-                st.error("Error al generar los gráficos de predicción.")
+            datos = grafo.obtener("datos_prediccion")
+            st.altair_chart(graficos_interactivos.grafico_pronostico(datos['pronostico']))
+            st.caption("Banda: intervalo de predicción (yhat_lower - yhat_upper). Puntos: ventas reales.")
+
+            st.subheader("🔍 Componentes del Modelo")
+            for grafico in graficos_interactivos.graficos_componentes(datos['componentes']):
+                st.altair_chart(grafico)
 
     # ----- Exportar predicción a Excel -----
     elif opcion == "Exportar predicción a Excel":
-        if prediccion_ventas_clima.forecast is None:
+        if not grafo.disponible("modelo"):
             st.warning("Primero entrena el modelo y genera la predicción.")
         else:
             with st.spinner("Exportando predicciones a Excel..."):
-                excel_path = prediccion_ventas_clima.exportar_predicciones_excel()
+                excel_path = obtener_archivos("excel_prediccion")
             st.success("Predicciones exportadas a Excel.")
             
             # Botón de descarga del Excel
@@ -381,11 +643,14 @@ if uploaded_file:
 
     # ----- Generar PDF informe predicción -----
     elif opcion == "Generar PDF informe predicción":
-        if prediccion_ventas_clima.ventas_diarias is None or prediccion_ventas_clima.clima_df is None:
+        if not grafo.disponible("clima"):
             st.warning("Primero carga datos de ventas y descarga el clima histórico.")
         else:
+            elegir_perfil_pdf()
+            grafo.fijar(version_modelo=grafo.version("modelo") if grafo.disponible("modelo") else None,
+                        version_correlaciones=grafo.version("correlaciones") if grafo.disponible("correlaciones") else None)
             with st.spinner("Generando informe PDF completo..."):
-                pdf_path = prediccion_ventas_clima.generar_pdf()
+                pdf_path = obtener_archivos("pdf_prediccion")
             st.success("✅ PDF generado en la carpeta reportes.")
             
             # Botón de descarga del PDF
@@ -400,6 +665,7 @@ if uploaded_file:
                     mime="application/pdf",
                     key="download_pdf_prediccion"
                 )
+                mostrar_tamano_pdf(pdf_path)
             
             # Mostrar información detallada sobre el contenido del PDF
             st.info("""
@@ -413,5 +679,93 @@ if uploaded_file:
             
             st.markdown("🎯 **Tip:** Usa este informe para tomar decisiones de inventario basadas en el clima pronosticado.")
 
+    # ----- Escenarios climáticos (what-if) -----
+    elif opcion == "Simular escenarios climáticos":
+        if not grafo.disponible("modelo"):
+            st.warning("Primero entrena el modelo y genera la predicción.")
+        else:
+            st.subheader("🌦️ Ventas bajo distintos escenarios de clima")
+            modos = {
+                "predefinidos": "Predefinidos (caluroso/seco, lluvioso, pronóstico ± error)",
+                "rejilla": "Rejilla de temperatura × lluvia",
+                "muestras": "Trayectorias aleatorias",
+            }
+            modo = st.radio("Tipo de escenarios", list(modos), format_func=modos.get, horizontal=True)
+            n_muestras = st.slider("Número de trayectorias", 50, 2000, 500, step=50) if modo == "muestras" else 500
+
+            grafo.fijar(modo_escenarios=modo, n_muestras=n_muestras)
+            resultado = grafo.obtener("escenarios")
+            st.caption(f"{resultado['tabla'].shape[1]} escenarios evaluados con una sola operación sobre el modelo entrenado.")
+
+            historico = grafo.obtener("ventas_diarias").tail(30)
+            st.altair_chart(graficos_interactivos.grafico_abanico(resultado['abanico'], historico))
+            if modo != "muestras":
+                st.write("Ventas previstas por escenario (S/.):")
+                st.dataframe(resultado['tabla'].style.format("{:.2f}"))
+            else:
+                st.write("Abanico de escenarios (cuantiles por fecha):")
+                st.dataframe(resultado['abanico'].style.format("{:.2f}"))
+
+            st.download_button(
+                label="📥 Descargar tabla de escenarios (CSV)",
+                data=resultado['tabla'].to_csv().encode("utf-8"),
+                file_name=f"escenarios_clima_{prediccion_ventas_clima.timestamp()}.csv",
+                mime="text/csv",
+                key="download_escenarios_csv"
+            )
+
+    # ----- Días con ventas anómalas -----
+    elif opcion == "Detectar días anómalos":
+        st.subheader("🚨 Días con ventas anómalas")
+        col_v, col_u, col_r = st.columns(3)
+        ventana = col_v.slider("Días de la línea base", 7, 90, anomalias_ventas.VENTANA)
+        umbral = col_u.slider("Umbral (z robusto)", 2.0, 6.0, anomalias_ventas.UMBRAL, step=0.5)
+        registrar = col_r.checkbox("Anotar en el registro de alertas",
+                                   help=f"Agrega las anomalías nuevas a {anomalias_ventas.ARCHIVO_REGISTRO}.")
+        grafo.fijar(ventana_anomalias=ventana, umbral_anomalias=umbral, registrar_anomalias=registrar,
+                    version_modelo=grafo.version("modelo") if grafo.disponible("modelo") else None)
+        detector = grafo.obtener("anomalias")
+        st.caption("Cada día se compara con la mediana y la MAD de los días previos"
+                   + (" y con el pronóstico del modelo entrenado (su intervalo indica la dispersión esperada)." if detector.intervalos
+                      else ". Entrena el modelo para comparar también con el intervalo del pronóstico."))
+        st.altair_chart(graficos_interactivos.grafico_anomalias(detector.tabla()))
+        anomalias = detector.anomalias()
+        st.write(f"{len(anomalias)} día(s) marcados:")
+        st.dataframe(anomalias[['fecha', 'ventas', 'esperado', 'z_robusto', 'z_pronostico', 'limite_inferior', 'limite_superior', 'tipo', 'motivo']]
+                     .iloc[::-1], hide_index=True)
+
+    # --------- Consultas SQL ---------
+    elif opcion == "Consultas SQL":
+        st.subheader("🦆 Consultas SQL sobre las ventas")
+        if not consultas_sql.DISPONIBLE:
+            st.warning(f"{consultas_sql.MENSAJE_INSTALAR}. El resto del dashboard funciona sin él.")
+        else:
+            grafo.fijar(version_clima=grafo.version("clima") if grafo.disponible("clima") else None,
+                        version_modelo=grafo.version("modelo") if grafo.disponible("modelo") else None)
+            disponibles = {'ventas': True, 'ventas_diarias': True, 'clima': grafo.entradas["version_clima"] is not None,
+                           'pronostico': grafo.entradas["version_modelo"] is not None}
+            st.caption("Tablas: " + " · ".join(
+                f"`{nombre}`: {descripcion}" + ("" if disponibles[nombre] else " (aún no calculada)")
+                for nombre, descripcion in consultas_sql.DESCRIPCION_TABLAS.items()))
+            ejemplo = st.selectbox("Consulta de ejemplo", list(consultas_sql.CONSULTAS_EJEMPLO))
+            sql = st.text_area("Consulta", consultas_sql.CONSULTAS_EJEMPLO[ejemplo], height=160, key=f"sql_{ejemplo}")
+            grafo.fijar(sql=sql)
+            resultado, segundos, error = grafo.obtener("consulta_sql")
+            if error:
+                st.error(f"❌ {error}")
+            else:
+                st.caption(f"{len(resultado)} fila(s) en {segundos * 1000:.0f} ms"
+                           + (f" (se muestran las primeras {consultas_sql.MAX_FILAS})" if len(resultado) == consultas_sql.MAX_FILAS else ""))
+                st.dataframe(resultado, hide_index=True)
+                st.download_button("📥 Descargar CSV", resultado.to_csv(index=False).encode("utf-8"),
+                                   file_name="consulta.csv", mime="text/csv", key="download_consulta_sql")
+
+    if perfil_accion is not None:
+        st.session_state.pop("perfil_activo", None)
+        mostrar_perfil(perfil_accion.detener())
+
+    if grafo.recalculados:
+        st.sidebar.caption("🔄 Recalculado: " + ", ".join(grafo.recalculados))
+
 else:
     st.info("Carga primero el archivo Excel de ventas para comenzar.")
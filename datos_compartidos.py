@@ -0,0 +1,148 @@
+import glob
+import hashlib
+import os
+import threading
+import weakref
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+# Conjuntos de datos publicados una sola vez como archivos Arrow sin comprimir.
+# Cada sesión o proceso que los usa los abre con memory-map: las columnas
+# numéricas, de fecha y de texto apuntan al mismo archivo, sin copias ni pickle.
+CARPETA_COMPARTIDOS = os.path.join("datos", "compartidos")
+
+# Cambiar si cambia la forma en que se leen los libros: invalida lo ya publicado
+VERSION_FORMATO = 1
+
+# Conjuntos abiertos en este proceso: {ruta: {'df': DataFrame, 'usuarios': set()}}
+_abiertos = {}
+# Las sesiones de Streamlit adjuntan y sueltan desde sus propios hilos: el candado protege
+# `_abiertos` y la secuencia marcas → borrado del archivo dentro de este proceso
+_candado = threading.RLock()
+
+def clave_contenido(*contenidos):
+    """Clave de un conjunto a partir del contenido (bytes) de los archivos de origen."""
+    h = hashlib.sha1(f"v{VERSION_FORMATO}".encode())
+    for contenido in contenidos:
+        h.update(hashlib.sha1(contenido).digest())
+    return h.hexdigest()[:20]
+
+def _ruta(clave, carpeta):
+    return os.path.join(carpeta, f"{clave}.arrow")
+
+def _marca(ruta, usuario):
+    return f"{ruta}.{os.getpid()}-{str(usuario).replace('.', '_')}.ref"
+
+# ==============================
+# 📤 Publicación y lectura
+# ==============================
+def publicar(clave, df, carpeta=CARPETA_COMPARTIDOS):
+    """Escribe `df` como archivo Arrow si aún no existe. Devuelve la ruta."""
+    ruta = _ruta(clave, carpeta)
+    if not os.path.exists(ruta):
+        os.makedirs(carpeta, exist_ok=True)
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+        # Se escribe aparte y se renombra: otro proceso puede estar publicando la misma clave
+        temporal = f"{ruta}.tmp{os.getpid()}-{threading.get_ident()}"
+        with pa.OSFile(temporal, "wb") as archivo, ipc.new_file(archivo, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+        os.replace(temporal, ruta)
+    return ruta
+
+def abrir(clave, carpeta=CARPETA_COMPARTIDOS):
+    """DataFrame sobre el archivo publicado (memory-map, sin copiar los datos).
+
+    Dentro de un proceso las sesiones comparten las columnas, pero cada llamada
+    devuelve su propio DataFrame (copia superficial): agregar, quitar o renombrar
+    columnas no afecta a las demás, y con copy-on-write modificar valores copia
+    solo la columna tocada.
+    """
+    ruta = _ruta(clave, carpeta)
+    with _candado:
+        abierto = _abiertos.get(ruta)
+        if abierto is None:
+            tabla = ipc.open_file(pa.memory_map(ruta)).read_all()
+            abierto = _abiertos[ruta] = {'df': tabla.to_pandas(split_blocks=True), 'usuarios': set()}
+        return abierto['df'].copy(deep=False)
+
+# ==============================
+# 🔢 Referencias por sesión o proceso
+# ==============================
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def referencias(clave, carpeta=CARPETA_COMPARTIDOS):
+    """Usuarios (sesiones o procesos) que tienen abierto el conjunto; descarta los de procesos terminados."""
+    vigentes = []
+    for marca in glob.glob(glob.escape(_ruta(clave, carpeta)) + ".*.ref"):
+        pid = int(os.path.basename(marca).rsplit(".", 2)[-2].split("-", 1)[0])
+        if _vivo(pid):
+            vigentes.append(marca)
+        else:
+            os.remove(marca)
+    return vigentes
+
+def adjuntar(clave, usuario, cargar=None, carpeta=CARPETA_COMPARTIDOS):
+    """Abre el conjunto `clave` para `usuario`, publicándolo antes con `cargar()` si nadie lo hizo."""
+    ruta = _ruta(clave, carpeta)
+    os.makedirs(carpeta, exist_ok=True)
+    # La marca va antes de abrir: así nadie borra el archivo entre la comprobación y la lectura.
+    # La publicación (leer los libros) corre fuera del candado para no frenar a otras sesiones.
+    with _candado:
+        open(_marca(ruta, usuario), "w").close()
+    try:
+        if not os.path.exists(ruta):
+            if cargar is None:
+                raise KeyError(f"El conjunto '{clave}' no está publicado.")
+            publicar(clave, cargar(), carpeta)
+        with _candado:
+            df = abrir(clave, carpeta)
+            _abiertos[ruta]['usuarios'].add(usuario)
+    except BaseException:
+        with _candado:
+            os.remove(_marca(ruta, usuario))
+        raise
+    return df
+
+def soltar(clave, usuario, carpeta=CARPETA_COMPARTIDOS):
+    """Libera la referencia de `usuario`; cuando nadie más lo usa, el archivo se borra."""
+    ruta = _ruta(clave, carpeta)
+    with _candado:
+        try:
+            os.remove(_marca(ruta, usuario))
+        except FileNotFoundError:
+            pass
+        abierto = _abiertos.get(ruta)
+        if abierto is not None:
+            abierto['usuarios'].discard(usuario)
+            if not abierto['usuarios']:
+                del _abiertos[ruta]
+        if not referencias(clave, carpeta):
+            try:
+                # En Linux/macOS las vistas ya abiertas siguen siendo válidas tras borrar el archivo
+                os.remove(ruta)
+            except OSError:
+                pass  # Ya borrado, o en Windows aún mapeado: lo limpia el próximo `soltar`
+
+class Referencia:
+    """Conjunto adjuntado a un usuario que se suelta al llamar `soltar` o al ser recolectado.
+
+    Guardada en st.session_state, la referencia se libera sola cuando Streamlit
+    descarta la sesión.
+    """
+
+    def __init__(self, clave, usuario, cargar=None, carpeta=CARPETA_COMPARTIDOS):
+        self.clave = clave
+        self.df = adjuntar(clave, usuario, cargar, carpeta)
+        self._finalizador = weakref.finalize(self, soltar, clave, usuario, carpeta)
+
+    def soltar(self):
+        self.df = None
+        self._finalizador()
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from prophet.utilities import regressor_coefficients
+
+import variables_clima
+
+REGRESORES = ['temp', 'lluvia']
+CUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+# ==============================
+# 🌦️ Construcción de escenarios
+# ==============================
+def escenarios_predefinidos(clima_base, clima_historico=None, error_temp=1.5):
+    """Escenarios con nombre sobre el clima previsto: {nombre: DataFrame ds, temp, lluvia}."""
+    base = clima_base[['ds'] + REGRESORES].reset_index(drop=True)
+    lluvia_alta = 20.0
+    if clima_historico is not None and not clima_historico.empty:
+        lluviosos = pd.to_numeric(clima_historico['lluvia'], errors='coerce')
+        lluviosos = lluviosos[lluviosos > 0]
+        if not lluviosos.empty:
+            lluvia_alta = float(lluviosos.quantile(0.9))
+    return {
+        'Pronóstico': base,
+        'Caluroso y seco': base.assign(temp=base['temp'] + 2.0, lluvia=0.0),
+        'Semana lluviosa': base.assign(temp=base['temp'] - 1.0, lluvia=lluvia_alta),
+        f'Pronóstico +{error_temp}°C': base.assign(temp=base['temp'] + error_temp, lluvia=base['lluvia'] * 0.5),
+        f'Pronóstico -{error_temp}°C': base.assign(temp=base['temp'] - error_temp, lluvia=base['lluvia'] * 1.5),
+    }
+
+def rejilla_escenarios(clima_base, deltas_temp=(-2, -1, 0, 1, 2), factores_lluvia=(0, 0.5, 1, 1.5, 2)):
+    """Tensor (escenarios × días × regresores) con todas las combinaciones de ajuste de temperatura y lluvia."""
+    base = clima_base[REGRESORES].to_numpy(dtype='float64')
+    dt, fl = np.meshgrid(np.asarray(deltas_temp, dtype='float64'), np.asarray(factores_lluvia, dtype='float64'), indexing='ij')
+    X = np.empty((dt.size, len(base), 2))
+    X[:, :, 0] = base[None, :, 0] + dt.reshape(-1, 1)
+    X[:, :, 1] = base[None, :, 1] * fl.reshape(-1, 1)
+    nombres = [f"temp {d:+g}°C, lluvia x{f:g}" for d, f in zip(dt.ravel(), fl.ravel())]
+    return nombres, X
+
+def muestrear_escenarios(clima_base, clima_historico, n=500, semilla=0):
+    """Tensor (n × días × regresores) con trayectorias muestreadas alrededor del pronóstico.
+
+    La temperatura suma anomalías con la dispersión histórica; la lluvia de cada
+    día se remuestrea de los días históricos (con su proporción de días secos).
+    """
+    rng = np.random.default_rng(semilla)
+    base = clima_base[REGRESORES].to_numpy(dtype='float64')
+    temp_hist = pd.to_numeric(clima_historico['temp'], errors='coerce').dropna().to_numpy()
+    lluvia_hist = pd.to_numeric(clima_historico['lluvia'], errors='coerce').dropna().to_numpy()
+    sigma = temp_hist.std() if len(temp_hist) > 1 else 1.0
+
+    X = np.empty((n, len(base), 2))
+    X[:, :, 0] = base[None, :, 0] + rng.normal(0.0, sigma, size=(n, len(base)))
+    if len(lluvia_hist):
+        X[:, :, 1] = rng.choice(lluvia_hist, size=(n, len(base)))
+    else:
+        X[:, :, 1] = base[None, :, 1]
+    return [f"muestra {i + 1}" for i in range(n)], X
+
+def apilar(escenarios):
+    """Convierte {nombre: DataFrame} en (nombres, tensor escenarios × días × regresores)."""
+    nombres = list(escenarios)
+    X = np.stack([escenarios[n][REGRESORES].to_numpy(dtype='float64') for n in nombres])
+    return nombres, X
+
+# ==============================
+# 📈 Evaluación por lotes contra un modelo ajustado
+# ==============================
+def evaluar_escenarios(modelo, forecast_base, nombres, X, contexto=None):
+    """Pronóstico de cada escenario sin volver a llamar a `predict`.
+
+    `forecast_base` son las filas de `modelo.predict` para las fechas a simular
+    (con cualquier clima). Se le quita el efecto de su clima y se suma el de cada
+    escenario con los coeficientes del modelo, todo con operaciones matriciales.
+    Los intervalos conservan su ancho: en Prophet no dependen de los regresores.
+
+    Si el modelo usa variables derivadas del clima, se recalculan para cada
+    escenario a partir de su temperatura y lluvia; `contexto` son los días
+    reales previos (ds, temp, lluvia) de los que parten rezagos y rachas.
+    """
+    regresores = list(modelo.extra_regressors)
+    if regresores != REGRESORES:
+        X = variables_clima.tensor_variables(X, contexto, regresores)
+    coefs = regressor_coefficients(modelo).set_index('regressor').loc[regresores]
+    centro = coefs['center'].to_numpy(dtype='float64')
+    coef = coefs['coef'].to_numpy(dtype='float64')
+    aditivo = (coefs['regressor_mode'] == 'additive').to_numpy()
+
+    base = forecast_base.reset_index(drop=True)
+    trend = base['trend'].to_numpy(dtype='float64')
+    efecto_base = base[regresores].to_numpy(dtype='float64')  # efecto del clima usado en el predict
+    efecto_base = np.where(aditivo[None, :], efecto_base, efecto_base * trend[:, None])
+    sin_clima = base['yhat'].to_numpy(dtype='float64') - efecto_base.sum(axis=1)
+
+    # Efecto de cada escenario: (x - centro) * coef, multiplicado por la tendencia si es multiplicativo
+    efecto = (X - centro) * coef
+    efecto = np.where(aditivo[None, None, :], efecto, efecto * trend[None, :, None]).sum(axis=2)
+    yhat = sin_clima[None, :] + efecto
+
+    fechas = pd.to_datetime(base['ds'])
+    tabla = pd.DataFrame(yhat.T, index=fechas, columns=nombres)
+    tabla.index.name = 'ds'
+    inferior = base['yhat_lower'].to_numpy(dtype='float64') - base['yhat'].to_numpy(dtype='float64')
+    superior = base['yhat_upper'].to_numpy(dtype='float64') - base['yhat'].to_numpy(dtype='float64')
+    return {
+        'tabla': tabla,
+        'inferior': tabla.add(inferior, axis=0),
+        'superior': tabla.add(superior, axis=0),
+        'abanico': abanico(tabla),
+    }
+
+def abanico(tabla, cuantiles=CUANTILES):
+    """Cuantiles por fecha entre escenarios (para el gráfico de abanico)."""
+    valores = np.quantile(tabla.to_numpy(dtype='float64'), cuantiles, axis=1).T
+    return pd.DataFrame(valores, index=tabla.index, columns=[f"p{int(q * 100)}" for q in cuantiles])
+
+def graficar_abanico(resultado, archivo, historico=None, titulo="Ventas por escenario climático"):
+    """Gráfico de abanico (bandas de cuantiles) y la mediana, opcionalmente con el histórico reciente."""
+    fan = resultado['abanico']
+    fig = Figure(figsize=(12, 5))
+    ax = fig.subplots()
+    if historico is not None:
+        ax.plot(historico['ds'], historico['y'], color='black', marker='.', linewidth=1, label='Histórico')
+    ax.fill_between(fan.index, fan['p5'], fan['p95'], color='tab:blue', alpha=0.2, label='p5 - p95')
+    ax.fill_between(fan.index, fan['p25'], fan['p75'], color='tab:blue', alpha=0.4, label='p25 - p75')
+    ax.plot(fan.index, fan['p50'], color='tab:blue', linewidth=2, label='Mediana')
+    ax.set_title(titulo)
+    ax.set_xlabel("Fecha")
+    ax.set_ylabel("Ventas (S/.)")
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    fig.savefig(archivo, dpi=150, bbox_inches='tight')
+    return archivo
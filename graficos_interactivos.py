@@ -0,0 +1,160 @@
+import altair as alt
+import pandas as pd
+
+# Gráficos vectoriales para el dashboard: se dibujan en el navegador (Vega-Lite) a
+# partir de tablas pequeñas ya agregadas. matplotlib queda solo para los PDF.
+
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+def _compactar(df):
+    """Reduce a la mitad los números enviados al navegador (float64 → float32)."""
+    df = df.copy()
+    for columna in df.select_dtypes('float64').columns:
+        df[columna] = df[columna].astype('float32')
+    return df
+
+# ==============================
+# 🏆 Top clientes
+# ==============================
+def barras_top(tabla, columna, titulo):
+    """Barras horizontales de un top de clientes (DataFrame indexado por cliente)."""
+    datos = _compactar(tabla[[columna]].reset_index())
+    return alt.Chart(datos, title=titulo).mark_bar(color='skyblue').encode(
+        x=alt.X(f'{columna}:Q', title=columna),
+        y=alt.Y('cliente:N', sort='-x', title=None),
+        tooltip=['cliente', alt.Tooltip(f'{columna}:Q', format=',.2f')],
+    )
+
+def barras_segmentos(resumen):
+    """% de clientes y % de ventas de cada segmento RFM (resultado de `resumen_segmentos`)."""
+    datos = _compactar(resumen[['pct_clientes', 'pct_ventas', 'clientes', 'ventas']].reset_index())
+    datos['segmento'] = datos['segmento'].astype(str)
+    largo = datos.melt(id_vars=['segmento', 'clientes', 'ventas'], value_vars=['pct_clientes', 'pct_ventas'],
+                       var_name='medida', value_name='porcentaje')
+    largo['medida'] = largo['medida'].map({'pct_clientes': '% clientes', 'pct_ventas': '% ventas'})
+    return alt.Chart(largo, title="Segmentos RFM").mark_bar().encode(
+        x=alt.X('porcentaje:Q', title='%'),
+        y=alt.Y('segmento:N', sort=list(datos['segmento']), title=None),
+        yOffset='medida:N',
+        color=alt.Color('medida:N', title=None),
+        tooltip=['segmento', 'medida', alt.Tooltip('porcentaje:Q', format='.1f'),
+                 alt.Tooltip('clientes:Q', format=',.0f'), alt.Tooltip('ventas:Q', format=',.2f')],
+    )
+
+# ==============================
+# 🌡️ Clima vs ventas
+# ==============================
+def dispersion_clima(ventas_diarias, clima_df):
+    """Ventas diarias frente a temperatura y lluvia, con recta de tendencia."""
+    ventas = ventas_diarias[['ds', 'y']].assign(ds=pd.to_datetime(ventas_diarias['ds']))
+    clima = clima_df[['ds', 'temp', 'lluvia']].assign(ds=pd.to_datetime(clima_df['ds']))
+    datos = _compactar(ventas.merge(clima, on='ds', how='left').dropna())
+
+    def panel(variable, titulo, color):
+        puntos = alt.Chart(datos, title=f"Ventas vs {titulo}").mark_circle(color=color, opacity=0.6).encode(
+            x=alt.X(f'{variable}:Q', title=titulo),
+            y=alt.Y('y:Q', title='Ventas (S/.)'),
+            tooltip=[alt.Tooltip('ds:T', title='Fecha'), alt.Tooltip(f'{variable}:Q', format='.1f'),
+                     alt.Tooltip('y:Q', title='Ventas', format=',.2f')],
+        )
+        return puntos + puntos.transform_regression(variable, 'y').mark_line(color='gray')
+
+    return panel('temp', 'Temperatura (°C)', 'orange') | panel('lluvia', 'Lluvia (mm)', 'blue')
+
+# ==============================
+# 📈 Pronóstico
+# ==============================
+def datos_pronostico(forecast, historico=None):
+    """Payload del gráfico de pronóstico: ds, yhat, banda e histórico (y)."""
+    datos = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+    if historico is not None:
+        datos = datos.merge(historico[['ds', 'y']].assign(ds=pd.to_datetime(historico['ds'])), on='ds', how='left')
+    return _compactar(datos)
+
+def grafico_pronostico(datos, titulo="Pronóstico de ventas ajustado al clima"):
+    """Predicción con su intervalo (yhat_lower - yhat_upper) y las ventas reales."""
+    base = alt.Chart(datos, title=titulo).encode(x=alt.X('ds:T', title='Fecha'))
+    banda = base.mark_area(opacity=0.25, color='#0072B2').encode(
+        y=alt.Y('yhat_lower:Q', title='Ventas (S/.)'), y2='yhat_upper:Q')
+    linea = base.mark_line(color='#0072B2').encode(
+        y='yhat:Q',
+        tooltip=[alt.Tooltip('ds:T', title='Fecha'), alt.Tooltip('yhat:Q', title='Predicción', format=',.2f'),
+                 alt.Tooltip('yhat_lower:Q', title='Inferior', format=',.2f'),
+                 alt.Tooltip('yhat_upper:Q', title='Superior', format=',.2f')])
+    capas = [banda, linea]
+    if 'y' in datos.columns:
+        capas.append(base.mark_circle(color='black', size=18).encode(
+            y='y:Q', tooltip=[alt.Tooltip('ds:T', title='Fecha'), alt.Tooltip('y:Q', title='Ventas', format=',.2f')]))
+    return alt.layer(*capas).interactive(bind_y=False)
+
+def datos_componentes(forecast):
+    """Componentes del modelo ya agregados: tendencia y clima por fecha, semana por día y año por día del año."""
+    fechas = pd.to_datetime(forecast['ds'])
+    componentes = {'tendencia': _compactar(forecast[['ds', 'trend']])}
+    if 'extra_regressors_additive' in forecast.columns:
+        componentes['clima'] = _compactar(forecast[['ds', 'extra_regressors_additive']].rename(
+            columns={'extra_regressors_additive': 'efecto'}))
+    if 'weekly' in forecast.columns:
+        semana = forecast['weekly'].groupby(fechas.dt.dayofweek).mean()
+        componentes['semanal'] = _compactar(pd.DataFrame({'dia': [DIAS_SEMANA[d] for d in semana.index],
+                                                          'efecto': semana.to_numpy()}))
+    if 'yearly' in forecast.columns:
+        anio = forecast['yearly'].groupby(fechas.dt.dayofyear).mean()
+        componentes['anual'] = _compactar(pd.DataFrame({'dia_anio': anio.index, 'efecto': anio.to_numpy()}))
+    return componentes
+
+def graficos_componentes(componentes):
+    """Un gráfico por componente, equivalentes a `plot_components` de Prophet."""
+    graficos = [alt.Chart(componentes['tendencia'], title="Tendencia").mark_line().encode(
+        x=alt.X('ds:T', title='Fecha'), y=alt.Y('trend:Q', title='Tendencia'))]
+    if 'semanal' in componentes:
+        graficos.append(alt.Chart(componentes['semanal'], title="Estacionalidad semanal").mark_bar().encode(
+            x=alt.X('dia:N', sort=DIAS_SEMANA, title=None), y=alt.Y('efecto:Q', title='Efecto'),
+            tooltip=['dia', alt.Tooltip('efecto:Q', format=',.2f')]))
+    if 'anual' in componentes:
+        graficos.append(alt.Chart(componentes['anual'], title="Estacionalidad anual").mark_line().encode(
+            x=alt.X('dia_anio:Q', title='Día del año'), y=alt.Y('efecto:Q', title='Efecto')))
+    if 'clima' in componentes:
+        graficos.append(alt.Chart(componentes['clima'], title="Efecto del clima (temperatura y lluvia)").mark_line(color='orange').encode(
+            x=alt.X('ds:T', title='Fecha'), y=alt.Y('efecto:Q', title='Efecto'),
+            tooltip=[alt.Tooltip('ds:T', title='Fecha'), alt.Tooltip('efecto:Q', format=',.2f')]))
+    return graficos
+
+# ==============================
+# 🚨 Días anómalos
+# ==============================
+def grafico_anomalias(tabla, titulo="Ventas diarias y días anómalos"):
+    """Ventas diarias con el valor esperado, el intervalo del pronóstico (si hay) y los días marcados."""
+    datos = _compactar(tabla[['fecha', 'ventas', 'esperado', 'limite_inferior', 'limite_superior', 'anomalia', 'motivo']])
+    base = alt.Chart(datos, title=titulo).encode(x=alt.X('fecha:T', title='Fecha'))
+    capas = []
+    if datos['limite_inferior'].notna().any():
+        capas.append(base.mark_area(opacity=0.2, color='#0072B2').encode(
+            y=alt.Y('limite_inferior:Q', title='Ventas (S/.)'), y2='limite_superior:Q'))
+    capas += [
+        base.mark_line(color='gray', strokeDash=[4, 3]).encode(y=alt.Y('esperado:Q', title='Ventas (S/.)')),
+        base.mark_line(color='#0072B2').encode(y='ventas:Q'),
+        base.transform_filter(alt.datum.anomalia).mark_circle(color='red', size=70).encode(
+            y='ventas:Q', tooltip=[alt.Tooltip('fecha:T', title='Fecha'), alt.Tooltip('ventas:Q', format=',.2f'),
+                                   alt.Tooltip('esperado:Q', format=',.2f'), 'motivo']),
+    ]
+    return alt.layer(*capas).interactive(bind_y=False)
+
+# ==============================
+# 🌦️ Escenarios climáticos
+# ==============================
+def grafico_abanico(fan, historico=None, titulo="Ventas por escenario climático"):
+    """Bandas p5-p95 y p25-p75 entre escenarios, la mediana y opcionalmente el histórico reciente."""
+    datos = _compactar(fan.reset_index())
+    base = alt.Chart(datos, title=titulo).encode(x=alt.X('ds:T', title='Fecha'))
+    capas = [
+        base.mark_area(opacity=0.2, color='#1f77b4').encode(y=alt.Y('p5:Q', title='Ventas (S/.)'), y2='p95:Q'),
+        base.mark_area(opacity=0.4, color='#1f77b4').encode(y='p25:Q', y2='p75:Q'),
+        base.mark_line(color='#1f77b4', strokeWidth=2).encode(
+            y='p50:Q', tooltip=[alt.Tooltip('ds:T', title='Fecha')] + [
+                alt.Tooltip(f'{c}:Q', format=',.2f') for c in ('p5', 'p25', 'p50', 'p75', 'p95')]),
+    ]
+    if historico is not None:
+        capas.insert(0, alt.Chart(_compactar(historico[['ds', 'y']])).mark_line(color='black', point=True).encode(
+            x='ds:T', y='y:Q'))
+    return alt.layer(*capas)
@@ -0,0 +1,100 @@
+ENTRADAS = "__entradas__"
+
+class GrafoDependencias:
+    """Grafo de cálculos con nodos memoizados según sus entradas.
+
+    Cada nodo declara de qué nodos depende y qué entradas externas usa (archivo
+    subido, rango de fechas, parámetros de la vista...). `obtener` resuelve solo
+    lo que el nodo pedido necesita y recalcula un nodo únicamente si cambió
+    alguna de sus entradas o la versión de alguna dependencia.
+
+    `memoria` es un dict que persiste entre recargas (p. ej. guardado en
+    st.session_state); las entradas fijadas también se conservan en él, así una
+    vista solo fija las que controla y el resto mantiene su último valor.
+    """
+
+    def __init__(self, memoria):
+        self.memoria = memoria
+        self.entradas = memoria.setdefault(ENTRADAS, {})
+        self.nodos = {}
+        self.recalculados = []
+
+    def nodo(self, nombre, depende=(), entradas=(), comparar=False):
+        """Decorador que registra `funcion(*valores_de_dependencias)` como nodo del grafo.
+
+        Con `comparar=True` un recálculo que da el mismo valor conserva la versión,
+        y los nodos que dependen de él no se recalculan.
+        """
+        def registrar(funcion):
+            self.nodos[nombre] = (funcion, tuple(depende), tuple(entradas), comparar)
+            return funcion
+        return registrar
+
+    def fijar(self, **valores):
+        """Actualiza entradas externas."""
+        self.entradas.update(valores)
+
+    def _clave(self, nombre):
+        _, depende, entradas, _ = self.nodos[nombre]
+        return (tuple(self.entradas.get(e) for e in entradas),
+                tuple(self.memoria[d]['version'] for d in depende))
+
+    def _resolver(self, nombre, calcular):
+        """Devuelve (disponible, valor) resolviendo primero las dependencias."""
+        funcion, depende, _, comparar = self.nodos[nombre]
+        valores = []
+        for dependencia in depende:
+            disponible, valor = self._resolver(dependencia, calcular)
+            if not disponible:
+                return False, None
+            valores.append(valor)
+
+        clave = self._clave(nombre)
+        guardado = self.memoria.get(nombre)
+        if guardado is not None and guardado['clave'] == clave:
+            return True, guardado['valor']
+        if not calcular:
+            return False, None
+
+        valor = funcion(*valores)
+        if guardado is None:
+            version = 1
+        elif comparar and guardado['valor'] == valor:
+            version = guardado['version']
+        else:
+            version = guardado['version'] + 1
+        self.memoria[nombre] = {'clave': clave, 'version': version, 'valor': valor}
+        self.recalculados.append(nombre)
+        return True, valor
+
+    def obtener(self, nombre):
+        """Valor del nodo, recalculando solo lo que cambió."""
+        return self._resolver(nombre, True)[1]
+
+    def disponible(self, nombre):
+        """True si el nodo ya está calculado para las entradas actuales (sin calcular nada)."""
+        return self._resolver(nombre, False)[0]
+
+    def vigente(self, nombre):
+        """Valor ya calculado para las entradas actuales, o None si habría que calcularlo."""
+        return self._resolver(nombre, False)[1]
+
+    def anterior(self, nombre):
+        """Último valor calculado del nodo aunque sus entradas hayan cambiado (None si nunca se calculó).
+
+        Sirve a los nodos incrementales: parten de su valor previo en lugar de empezar de cero.
+        """
+        guardado = self.memoria.get(nombre)
+        return guardado['valor'] if guardado is not None else None
+
+    def version(self, nombre):
+        """Versión del último valor calculado del nodo (None si nunca se calculó)."""
+        guardado = self.memoria.get(nombre)
+        return guardado['version'] if guardado is not None else None
+
+    def invalidar(self, nombre):
+        """Descarta el valor guardado: el próximo `obtener` lo recalcula."""
+        guardado = self.memoria.get(nombre)
+        if guardado is not None:
+            # Se conserva la versión para que el recálculo la incremente
+            guardado['clave'] = None
@@ -0,0 +1,257 @@
+import os
+import glob
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from utilidades import timestamp, COLUMNAS_COMPROBANTE
+
+CARPETA_HISTORIAL = "historial"
+
+# Campos con los que se arma la clave cuando no hay número de comprobante
+CAMPOS_CLAVE = ['cliente', 'fecha', 'total', 'descuento', 'productos']
+
+AGREGADOS = ['total', 'descuento', 'cantidad', 'operaciones']
+
+# Caché en memoria del historial ya leído de disco: {carpeta: {...}}
+_cache = {}
+
+def _crear_carpeta(carpeta):
+    if not os.path.exists(carpeta):
+        os.makedirs(carpeta)
+    return carpeta
+
+# ==============================
+# 🔑 Clave estable por comprobante
+# ==============================
+def claves_factura(df):
+    """Devuelve un hash uint64 por operación, estable entre exports que se solapan.
+
+    Si el export trae número de comprobante se usa junto con el cliente. Si no,
+    se combina cliente, fecha, total, descuento y productos, más el número de
+    aparición de esa combinación dentro del archivo para no perder operaciones
+    idénticas legítimas.
+    """
+    columnas = {str(c).strip().lower(): c for c in df.columns}
+    col_comprobante = next((columnas[c] for c in COLUMNAS_COMPROBANTE if c in columnas), None)
+
+    base = pd.DataFrame({campo: df[campo].astype(str) if campo in df.columns else "" for campo in CAMPOS_CLAVE},
+                        index=df.index)
+    clave = base[CAMPOS_CLAVE[0]]
+    for campo in CAMPOS_CLAVE[1:]:
+        clave = clave + "|" + base[campo]
+    clave = clave + "|" + base.groupby(CAMPOS_CLAVE, sort=False).cumcount().astype(str)
+
+    if col_comprobante is not None:
+        comprobante = df[col_comprobante]
+        con_numero = comprobante.notna() & (comprobante.astype(str).str.strip() != "")
+        clave = clave.where(~con_numero, "C|" + comprobante.astype(str).str.strip() + "|" + base['cliente'])
+
+    return pd.util.hash_pandas_object(clave, index=False).to_numpy()
+
+# ==============================
+# 📅 Agregados diarios
+# ==============================
+def agregar_por_dia(df):
+    """Totales por fecha (día) de un conjunto de operaciones."""
+    dias = df['fecha'].dt.normalize()
+    diario = df.groupby(dias).agg(total=('total', 'sum'), descuento=('descuento', 'sum'),
+                                  cantidad=('cantidad', 'sum'), operaciones=('total', 'size'))
+    diario.index.name = 'fecha'
+    return diario
+
+def agregar_por_dia_cliente(df):
+    """Totales por (fecha, cliente) de un conjunto de operaciones."""
+    dias = df['fecha'].dt.normalize().rename('fecha')
+    return df.groupby([dias, df['cliente']]).agg(total=('total', 'sum'), descuento=('descuento', 'sum'),
+                                                 cantidad=('cantidad', 'sum'), operaciones=('total', 'size'))
+
+def _sumar(agregado, nuevo):
+    """Suma `nuevo` sobre `agregado` tocando solo las filas (fechas) de `nuevo`."""
+    if agregado is None or agregado.empty:
+        return nuevo.sort_index()
+    existentes = nuevo.index.intersection(agregado.index)
+    agregado.loc[existentes, AGREGADOS] += nuevo.loc[existentes, AGREGADOS]
+    faltantes = nuevo.index.difference(agregado.index)
+    if len(faltantes):
+        agregado = pd.concat([agregado, nuevo.loc[faltantes]]).sort_index()
+    return agregado
+
+# ==============================
+# 💾 Persistencia
+# ==============================
+# Claves y agregados diarios en SQLite, indexados: cada export consulta e inserta solo sus
+# propias filas en lugar de reescribir el historial completo. Las operaciones siguen en
+# bloques ventas_*.pkl, uno por export. PRAGMA user_version cuenta las escrituras.
+ARCHIVO_BASE = "historial.sqlite"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS claves (clave INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS diario (
+    fecha TEXT PRIMARY KEY, total REAL, descuento REAL, cantidad NUMERIC, operaciones INTEGER);
+CREATE TABLE IF NOT EXISTS diario_clientes (
+    fecha TEXT, cliente TEXT, total REAL, descuento REAL, cantidad NUMERIC, operaciones INTEGER,
+    PRIMARY KEY (fecha, cliente));
+"""
+
+def _sumar_sql(tabla, indice):
+    columnas = indice + AGREGADOS
+    return (f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))}) "
+            f"ON CONFLICT ({', '.join(indice)}) DO UPDATE SET "
+            + ", ".join(f"{c} = {c} + excluded.{c}" for c in AGREGADOS))
+
+def _filas(agregado):
+    """Filas (fecha ISO, [cliente], agregados...) de un agregado diario para SQLite."""
+    tabla = agregado.reset_index()
+    tabla['fecha'] = tabla['fecha'].dt.strftime("%Y-%m-%d")
+    return [tuple(v.item() if hasattr(v, 'item') else v for v in fila) for fila in tabla.itertuples(index=False)]
+
+def _conectar(carpeta):
+    conexion = sqlite3.connect(os.path.join(carpeta, ARCHIVO_BASE), timeout=30, isolation_level=None)
+    conexion.executescript(ESQUEMA)
+    return conexion
+
+def _leer_agregado(conexion, tabla, indice):
+    agregado = pd.read_sql_query(f"SELECT * FROM {tabla} ORDER BY {', '.join(indice)}", conexion)
+    agregado['fecha'] = pd.to_datetime(agregado['fecha'])
+    return agregado.set_index(indice if len(indice) > 1 else indice[0])
+
+def _leer_estado(carpeta):
+    version = version_historial(carpeta)
+    # Reutilizar lo ya leído salvo que otro proceso haya escrito el historial
+    if carpeta in _cache and _cache[carpeta]['version'] == version:
+        return _cache[carpeta]
+
+    anterior = _cache.get(carpeta, {})
+    estado = {'version': version, 'diario': None, 'diario_clientes': None}
+    if version is not None:
+        conexion = _conectar(carpeta)
+        try:
+            estado['diario'] = _leer_agregado(conexion, 'diario', ['fecha'])
+            estado['diario_clientes'] = _leer_agregado(conexion, 'diario_clientes', ['fecha', 'cliente'])
+        finally:
+            conexion.close()
+    # Las operaciones ya leídas siguen valiendo: los bloques nunca se reescriben
+    if 'ventas' in anterior:
+        estado['ventas'], estado['bloques'] = anterior['ventas'], anterior['bloques']
+    _cache[carpeta] = estado
+    return estado
+
+def agregar_excel(path, carpeta=CARPETA_HISTORIAL):
+    """Incorpora un export al historial persistido, descartando operaciones ya registradas.
+
+    Solo se escriben las operaciones nuevas (un bloque por export); las claves se
+    consultan e insertan por índice y los agregados diarios se suman únicamente en
+    las fechas afectadas, sin leer ni reescribir el resto del historial.
+    """
+    import carga_multiple
+    _crear_carpeta(carpeta)
+
+    df = carga_multiple.leer_ventas(path)
+    df = df.assign(clave=claves_factura(df))
+    df = df.drop_duplicates('clave')
+
+    conexion = _conectar(carpeta)
+    try:
+        # BEGIN IMMEDIATE: dos exports agregados a la vez no pueden registrar la misma clave
+        conexion.execute("BEGIN IMMEDIATE")
+        conexion.execute("CREATE TEMP TABLE IF NOT EXISTS entrantes (clave INTEGER PRIMARY KEY)")
+        conexion.execute("DELETE FROM entrantes")
+        conexion.executemany("INSERT INTO entrantes VALUES (?)",
+                             ((c,) for c in df['clave'].to_numpy(dtype='uint64').view('int64').tolist()))
+        registradas = [c for (c,) in conexion.execute("SELECT clave FROM entrantes JOIN claves USING (clave)")]
+        registradas = np.array(registradas, dtype='int64').view('uint64')
+        nuevas = df[~df['clave'].isin(registradas)]
+
+        resumen = {
+            'leidas': len(df),
+            'nuevas': len(nuevas),
+            'duplicadas': len(df) - len(nuevas),
+            'fechas_afectadas': sorted(nuevas['fecha'].dt.date.unique()),
+        }
+        if nuevas.empty:
+            conexion.execute("ROLLBACK")
+            print(f"\nℹ Sin operaciones nuevas ({resumen['duplicadas']} ya estaban en el historial).")
+            return resumen
+
+        diario, diario_clientes = agregar_por_dia(nuevas), agregar_por_dia_cliente(nuevas)
+        conexion.execute("INSERT INTO claves SELECT clave FROM entrantes WHERE clave NOT IN (SELECT clave FROM claves)")
+        conexion.executemany(_sumar_sql('diario', ['fecha']), _filas(diario))
+        conexion.executemany(_sumar_sql('diario_clientes', ['fecha', 'cliente']), _filas(diario_clientes))
+        version = conexion.execute("PRAGMA user_version").fetchone()[0] + 1
+        conexion.execute(f"PRAGMA user_version = {version}")
+
+        # El bloque se escribe antes del COMMIT y aparece (rename) recién después: ningún lector
+        # ve operaciones cuyas claves no quedaron registradas
+        bloque = nuevas.loc[:, [c for c in nuevas.columns if isinstance(c, str)]]
+        archivo_bloque = os.path.join(carpeta, f"ventas_{timestamp()}_{version:05d}.pkl")
+        temporal = f"{archivo_bloque}.tmp{os.getpid()}-{threading.get_ident()}"
+        bloque.to_pickle(temporal)
+        try:
+            conexion.execute("COMMIT")
+        except sqlite3.Error:
+            os.remove(temporal)
+            raise
+        os.replace(temporal, archivo_bloque)
+    except BaseException:
+        if conexion.in_transaction:
+            conexion.execute("ROLLBACK")
+        raise
+    finally:
+        conexion.close()
+
+    # Si este proceso tenía el historial en memoria y nadie más escribió, se suma solo lo nuevo
+    estado = _cache.get(carpeta)
+    if estado is not None and estado['version'] == version - 1:
+        estado['diario'] = _sumar(estado['diario'], diario)
+        estado['diario_clientes'] = _sumar(estado['diario_clientes'], diario_clientes)
+        if 'ventas' in estado:
+            estado['ventas'] = pd.concat([estado['ventas'], bloque], ignore_index=True)
+            estado['bloques'].add(os.path.basename(archivo_bloque))
+        estado['version'] = version
+
+    print(f"\n✅ Historial actualizado: {resumen['nuevas']} operaciones nuevas, "
+          f"{resumen['duplicadas']} duplicadas, {len(resumen['fechas_afectadas'])} días afectados.")
+    return resumen
+
+# ==============================
+# 📂 Lectura del historial
+# ==============================
+def existe_historial(carpeta=CARPETA_HISTORIAL):
+    return version_historial(carpeta) is not None
+
+def version_historial(carpeta=CARPETA_HISTORIAL):
+    """Número de escrituras del historial: cambia con cada export agregado (None si no existe)."""
+    if not os.path.exists(os.path.join(carpeta, ARCHIVO_BASE)):
+        return None
+    conexion = sqlite3.connect(os.path.join(carpeta, ARCHIVO_BASE), timeout=30)
+    try:
+        return conexion.execute("PRAGMA user_version").fetchone()[0] or None
+    finally:
+        conexion.close()
+
+def cargar_historial(carpeta=CARPETA_HISTORIAL):
+    """Todas las operaciones acumuladas, con el mismo formato que `cargar_excel`.
+
+    Los bloques ya leídos se conservan en memoria: solo se leen los exports nuevos.
+    """
+    estado = _leer_estado(carpeta)
+    vistos = estado.setdefault('bloques', set())
+    nuevos = [f for f in sorted(glob.glob(os.path.join(carpeta, "ventas_*.pkl"))) if os.path.basename(f) not in vistos]
+    if nuevos or 'ventas' not in estado:
+        bloques = ([estado['ventas']] if 'ventas' in estado else []) + [pd.read_pickle(f) for f in nuevos]
+        estado['ventas'] = pd.concat(bloques, ignore_index=True) if bloques else pd.DataFrame(
+            columns=['cliente', 'descuento', 'productos', 'total', 'fecha', 'cantidad', 'clave'])
+        vistos.update(os.path.basename(f) for f in nuevos)
+    return estado['ventas']
+
+def ventas_diarias(carpeta=CARPETA_HISTORIAL):
+    """Serie diaria acumulada en formato Prophet (columnas ds, y)."""
+    diario = _leer_estado(carpeta)['diario']
+    if diario is None:
+        return pd.DataFrame(columns=['ds', 'y'])
+    return pd.DataFrame({'ds': diario.index, 'y': diario['total'].to_numpy()})
+
+def agregados_diarios(carpeta=CARPETA_HISTORIAL, por_cliente=False):
+    """Agregados diarios persistidos (por día o por día y cliente)."""
+    return _leer_estado(carpeta)['diario_clientes' if por_cliente else 'diario']
@@ -3,28 +3,28 @@ import re
 from fpdf import FPDF
 import datetime
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import os
-from utilidades import timestamp, crear_carpeta_reportes
+import threading
+import time
+from utilidades import timestamp, crear_carpeta_reportes, leer_hoja_ventas, COLUMNAS_VENTAS, COLUMNAS_COMPROBANTE
+from ranking_clientes import top_clientes
+import segmentacion_rfm
+import anomalias_ventas
+import reportes_pdf
+import perfilado
 
 df_ventas_original = None
 df_ventas_filtrado = None
 archivo_excel = None
+# Las sesiones del dashboard comparten estas variables: se fijan y se usan con el candado tomado
+candado_estado = threading.RLock()
 
-def cargar_excel(path):
-    global df_ventas_original, df_ventas_filtrado, archivo_excel
-    archivo_excel = path
-    excel_data = pd.ExcelFile(path)
-    df_ventas = pd.read_excel(path, sheet_name='Compras', skiprows=7)
-    df_ventas.columns = df_ventas.iloc[0]
-    df_ventas = df_ventas[1:]
-
-    df_ventas = df_ventas.rename(columns={
-        'Cliente': 'cliente',
-        'Descuento': 'descuento',
-        'Productos': 'productos',
-        'Total': 'total',
-        'Fecha Emisión': 'fecha',
-    })
+def leer_excel_ventas(path):
+    """Lee y limpia la hoja 'Compras' sin modificar el estado del módulo."""
+    # La cabecera se ubica leyendo solo las primeras filas; luego se leen únicamente las columnas usadas
+    df_ventas = leer_hoja_ventas(path, list(COLUMNAS_VENTAS), COLUMNAS_COMPROBANTE)
+    df_ventas = df_ventas.rename(columns=COLUMNAS_VENTAS)
 
     df_ventas['descuento'] = pd.to_numeric(df_ventas['descuento'], errors='coerce')
     df_ventas['total'] = pd.to_numeric(df_ventas['total'], errors='coerce')
@@ -39,12 +39,35 @@ def cargar_excel(path):
 
     df_ventas = df_ventas[df_ventas['cliente'].notna() & ~df_ventas['cliente'].astype(str).str.contains("Totales", case=False, na=False)]
     df_ventas['fecha'] = pd.to_datetime(df_ventas['fecha'])
+    return df_ventas
+
+def cargar_excel(path):
+    global df_ventas_original, df_ventas_filtrado, archivo_excel
+    archivo_excel = path
+    import carga_multiple
+    try:
+        df_ventas = carga_multiple.leer_ventas(path)
+    except ValueError as e:
+        print(f"\n❌ Formato de archivo no reconocido: {e}")
+        return None
 
     df_ventas_original = df_ventas
     df_ventas_filtrado = df_ventas
     print("\n✅ Archivo cargado correctamente.")
     return df_ventas_filtrado
 
+def cargar_historial_acumulado():
+    global df_ventas_original, df_ventas_filtrado, archivo_excel
+    import historial_ventas
+    if not historial_ventas.existe_historial():
+        print("\n⚠ Aún no hay historial. Agrega primero un archivo Excel.")
+        return None
+    archivo_excel = historial_ventas.CARPETA_HISTORIAL
+    df_ventas_original = historial_ventas.cargar_historial()
+    df_ventas_filtrado = df_ventas_original
+    print(f"\n✅ Historial cargado: {len(df_ventas_original)} operaciones.")
+    return df_ventas_filtrado
+
 def filtrar_por_rango_fechas():
     global df_ventas_original, df_ventas_filtrado
     if df_ventas_original is None:
@@ -86,14 +109,13 @@ def mostrar_metricas_rapidas():
     if resumen['Total operaciones'] > 0:
         print(f"- Promedio por operación: S/. {(resumen['Total ventas (S/.)']/resumen['Total operaciones']):.2f}")
 
-    top_ventas = df_ventas_filtrado.groupby('cliente')['total'].sum().sort_values(ascending=False).head(5)
+    tops = top_clientes(df_ventas_filtrado, ['total', 'cantidad'], k=5)
     print("\n🏆 Top 5 Clientes por Ventas:")
-    for cliente, total in top_ventas.items():
+    for cliente, total in tops['total']['total'].items():
         print(f"   - {cliente}: S/. {total:.2f}")
 
-    top_cantidades = df_ventas_filtrado.groupby('cliente')['cantidad'].sum().sort_values(ascending=False).head(5)
     print("\n📦 Top 5 Clientes por Cantidades:")
-    for cliente, cantidad in top_cantidades.items():
+    for cliente, cantidad in tops['cantidad']['cantidad'].items():
         print(f"   - {cliente}: {cantidad} unidades")
 
     ventas_diarias = df_ventas_filtrado.groupby(df_ventas_filtrado['fecha'].dt.date)['total'].sum()
@@ -106,25 +128,51 @@ def mostrar_metricas_rapidas():
     for fecha, monto in ventas_diarias.items():
         print(f"   - {fecha}: S/. {monto:.2f}")
 
+def _grafico_barras(archivo, df, columna, titulo, dpi=None):
+    fig = Figure(figsize=(8, 4))
+    ax = fig.subplots()
+    ax.barh(df.index, df[columna], color='skyblue')
+    ax.set_xlabel(columna)
+    ax.set_title(titulo)
+    ax.invert_yaxis()
+    fig.tight_layout()
+    fig.savefig(archivo, dpi=dpi)
+    return archivo
+
+def _grafico_tendencia(ventas_diarias, archivo, dpi=None, mostrar=False):
+    # Solo la ventana interactiva necesita pyplot; para archivos basta una Figure propia
+    fig = plt.figure(figsize=(12, 6)) if mostrar else Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    ax.plot(ventas_diarias.index, ventas_diarias.values, marker='o', linestyle='-', color='b')
+    ax.set_title("Tendencia diaria de ventas")
+    ax.set_xlabel("Fecha")
+    ax.set_ylabel("Ventas (S/)")
+    ax.grid(True)
+    ax.tick_params(axis='x', labelrotation=45)
+
+    for fecha, monto in zip(ventas_diarias.index, ventas_diarias.values):
+        ax.annotate(f"S/. {monto:.2f}\n{fecha}", (fecha, monto), textcoords="offset points", xytext=(0, 10), ha='center', fontsize=8, color='black')
+
+    fig.tight_layout()
+    fig.savefig(archivo, dpi=dpi)
+    if mostrar:
+        plt.show()
+        plt.close(fig)
+    return archivo
+
+TITULOS_TOP = {
+    'total': 'Top 10 Clientes por Ventas (S/)',
+    'descuento': 'Top 10 Clientes por Descuentos (S/)',
+    'cantidad': 'Top 10 Clientes por Cantidades',
+}
+
 def generar_graficos(top_ventas, top_descuentos, top_cantidades):
     carpeta = crear_carpeta_reportes()
     ts = timestamp()
 
-    def grafico(nombre, df, columna, titulo):
-        archivo = os.path.join(carpeta, nombre)
-        plt.figure(figsize=(8, 4))
-        plt.barh(df.index, df[columna], color='skyblue')
-        plt.xlabel(columna)
-        plt.title(titulo)
-        plt.gca().invert_yaxis()
-        plt.tight_layout()
-        plt.savefig(archivo)
-        plt.close()
-        return archivo
-
-    ventas_img = grafico(f"ventas_{ts}.png", top_ventas, 'total', 'Top 10 Clientes por Ventas (S/)')
-    descuentos_img = grafico(f"descuentos_{ts}.png", top_descuentos, 'descuento', 'Top 10 Clientes por Descuentos (S/)')
-    cantidades_img = grafico(f"cantidades_{ts}.png", top_cantidades, 'cantidad', 'Top 10 Clientes por Cantidades')
+    ventas_img = _grafico_barras(os.path.join(carpeta, f"ventas_{ts}.png"), top_ventas, 'total', TITULOS_TOP['total'])
+    descuentos_img = _grafico_barras(os.path.join(carpeta, f"descuentos_{ts}.png"), top_descuentos, 'descuento', TITULOS_TOP['descuento'])
+    cantidades_img = _grafico_barras(os.path.join(carpeta, f"cantidades_{ts}.png"), top_cantidades, 'cantidad', TITULOS_TOP['cantidad'])
 
     return ventas_img, descuentos_img, cantidades_img
 
@@ -137,42 +185,34 @@ def generar_tendencia_diaria(para_pdf=False):
     ts = timestamp()
     ventas_diarias = df_ventas_filtrado.groupby(df_ventas_filtrado['fecha'].dt.date)['total'].sum()
     carpeta = crear_carpeta_reportes()
+    return _grafico_tendencia(ventas_diarias, os.path.join(carpeta, f"tendencia_diaria_{ts}.png"), mostrar=not para_pdf)
 
-    plt.figure(figsize=(12, 6))
-    plt.plot(ventas_diarias.index, ventas_diarias.values, marker='o', linestyle='-', color='b')
-    plt.title("Tendencia diaria de ventas")
-    plt.xlabel("Fecha")
-    plt.ylabel("Ventas (S/)")
-    plt.grid(True)
-    plt.xticks(rotation=45)
-
-    for fecha, monto in zip(ventas_diarias.index, ventas_diarias.values):
-        plt.annotate(f"S/. {monto:.2f}\n{fecha}", (fecha, monto), textcoords="offset points", xytext=(0, 10), ha='center', fontsize=8, color='black')
-
-    plt.tight_layout()
-    file_name = os.path.join(carpeta, f"tendencia_diaria_{ts}.png")
-    plt.savefig(file_name)
-    if not para_pdf:
-        plt.show()
-    plt.close()
-    return file_name
-
-def generar_pdf(con_graficos=True):
+def generar_pdf(con_graficos=True, perfil=None):
+    """Informe mensual en PDF. `perfil` elige la salida de los gráficos (ver reportes_pdf.PERFILES_PDF)."""
     global df_ventas_filtrado
     if df_ventas_filtrado is None or df_ventas_filtrado.empty:
         print("\n⚠ No hay datos cargados.")
         return
     
+    inicio = time.perf_counter()
+    ajustes = reportes_pdf.ajustes_pdf(perfil)
     ts = timestamp()
     resumen = calcular_resumen(df_ventas_filtrado)
-    top_clientes = df_ventas_filtrado.groupby('cliente').agg({'total':'sum','descuento':'sum','cantidad':'sum'})
-    top_ventas = top_clientes[['total']].sort_values(by='total', ascending=False).head(10)
-    top_descuentos = top_clientes[['descuento']].sort_values(by='descuento', ascending=False).head(10)
-    top_cantidades = top_clientes[['cantidad']].sort_values(by='cantidad', ascending=False).head(10)
+    tops = top_clientes(df_ventas_filtrado, k=10)
 
+    imagenes = []
     if con_graficos:
-        ventas_img, descuentos_img, cantidades_img = generar_graficos(top_ventas, top_descuentos, top_cantidades)
-        tendencia_img = generar_tendencia_diaria(para_pdf=True)
+        # Con los mismos datos se reutilizan los gráficos ya dibujados para un informe anterior
+        for columna, titulo in TITULOS_TOP.items():
+            top = tops[columna]
+            imagenes.append(reportes_pdf.grafico_cacheado(
+                f"top_{columna}", top[columna],
+                lambda archivo, dpi, top=top, columna=columna, titulo=titulo: _grafico_barras(archivo, top, columna, titulo, dpi),
+                ajustes))
+        ventas_diarias = df_ventas_filtrado.groupby(df_ventas_filtrado['fecha'].dt.date)['total'].sum()
+        imagenes.append(reportes_pdf.grafico_cacheado(
+            "tendencia_diaria", ventas_diarias,
+            lambda archivo, dpi: _grafico_tendencia(ventas_diarias, archivo, dpi), ajustes))
 
     pdf = FPDF()
     pdf.set_auto_page_break(auto=True, margin=15)
@@ -188,21 +228,99 @@ RESUMEN GENERAL:
 - Total operaciones: {resumen['Total operaciones']}
 """)
 
-    if con_graficos:
-        pdf.image(ventas_img, x=10, w=180)
-        pdf.ln(5)
-        pdf.image(descuentos_img, x=10, w=180)
-        pdf.ln(5)
-        pdf.image(cantidades_img, x=10, w=180)
-        pdf.ln(5)
-        pdf.image(tendencia_img, x=10, w=180)
+    for i, imagen in enumerate(imagenes):
+        if i:
+            pdf.ln(5)
+        reportes_pdf.insertar_imagen(pdf, imagen, ajustes)
+
+    agregar_segmentos_pdf(pdf, segmentacion_rfm.resumen_segmentos(segmentacion_rfm.calcular_rfm(df_ventas_filtrado)))
+    anomalias_ventas.agregar_anomalias_pdf(pdf, anomalias_ventas.detector_para(
+        str(archivo_excel), anomalias_ventas.serie_diaria(df_ventas_filtrado)).anomalias())
 
     carpeta = crear_carpeta_reportes()
     pdf_name = os.path.join(carpeta, f"Informe_Mensual_Ventas_{ts}.pdf")
     pdf.output(pdf_name)
     print(f"\n✅ PDF generado: {pdf_name}")
+    reportes_pdf.registrar_informe(pdf_name, inicio, ajustes)
     return pdf_name  # Retornar la ruta del archivo generado
 
+# ==============================
+# 🎯 Segmentación RFM de clientes
+# ==============================
+def agregar_segmentos_pdf(pdf, resumen):
+    """Página con la tabla de segmentos RFM (resultado de `segmentacion_rfm.resumen_segmentos`)."""
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 14)
+    pdf.cell(0, 10, 'Segmentación RFM de clientes', ln=True)
+    pdf.set_font('Arial', '', 10)
+    pdf.multi_cell(0, 6, "Recencia (días desde la última compra), frecuencia (operaciones) y monto (S/) "
+                         "puntuados por quintiles del 1 al 5 sobre todos los clientes del periodo.")
+    pdf.ln(3)
+    pdf.set_font('Arial', 'B', 9)
+    anchos = (48, 22, 22, 36, 22, 20, 20)
+    for ancho, titulo in zip(anchos, ('Segmento', 'Clientes', '% clientes', 'Ventas (S/)', '% ventas', 'Recencia', 'Frecuencia')):
+        pdf.cell(ancho, 8, titulo, 1, 0, 'C')
+    pdf.ln()
+    pdf.set_font('Arial', '', 9)
+    for segmento, fila in resumen.iterrows():
+        valores = (str(segmento), f"{fila['clientes']:.0f}", f"{fila['pct_clientes']:.1f}%", f"{fila['ventas']:,.2f}",
+                   f"{fila['pct_ventas']:.1f}%", f"{fila['recencia_media']:.0f} d", f"{fila['frecuencia_media']:.1f}")
+        for i, (ancho, valor) in enumerate(zip(anchos, valores)):
+            pdf.cell(ancho, 7, valor, 1, 0, 'R' if i else 'L')
+        pdf.ln()
+
+def tabla_segmentos_excel(rfm):
+    """Resumen y detalle por cliente con nombres de columna para el Excel."""
+    resumen = segmentacion_rfm.resumen_segmentos(rfm).rename(columns={
+        'clientes': 'Clientes', 'pct_clientes': '% Clientes', 'ventas': 'Ventas (S/)', 'pct_ventas': '% Ventas',
+        'descuento': 'Descuentos (S/)', 'recencia_media': 'Recencia media (días)',
+        'frecuencia_media': 'Frecuencia media', 'monto_medio': 'Monto medio (S/)'}).rename_axis('Segmento')
+    detalle = rfm.reset_index().rename(columns={
+        'cliente': 'Cliente', 'segmento': 'Segmento', 'ultima_compra': 'Última compra', 'recencia': 'Recencia (días)',
+        'frecuencia': 'Operaciones', 'monto': 'Ventas (S/)', 'descuento': 'Descuentos (S/)', 'rfm': 'RFM'})
+    return resumen, detalle[['Cliente', 'Segmento', 'RFM', 'R', 'F', 'M', 'Última compra', 'Recencia (días)',
+                             'Operaciones', 'Ventas (S/)', 'Descuentos (S/)']]
+
+def exportar_segmentos_excel(rfm=None):
+    global df_ventas_filtrado
+    if df_ventas_filtrado is None or df_ventas_filtrado.empty:
+        print("\n⚠ No hay datos cargados.")
+        return
+    if rfm is None:
+        rfm = segmentacion_rfm.calcular_rfm(df_ventas_filtrado)
+
+    resumen, detalle = tabla_segmentos_excel(rfm)
+    print("\n🎯 SEGMENTOS RFM")
+    for segmento, fila in resumen.iterrows():
+        print(f"   - {segmento}: {fila['Clientes']:.0f} clientes ({fila['% Clientes']:.1f}%), "
+              f"S/. {fila['Ventas (S/)']:.2f} ({fila['% Ventas']:.1f}% de las ventas)")
+
+    archivo = os.path.join(crear_carpeta_reportes(), f"Segmentos_RFM_{timestamp()}.xlsx")
+    with pd.ExcelWriter(archivo) as writer:
+        resumen.to_excel(writer, sheet_name="Resumen segmentos")
+        detalle.to_excel(writer, sheet_name="Clientes", index=False)
+    print(f"\n✅ Segmentos exportados: {archivo}")
+    return archivo
+
+# ==============================
+# 🚨 Días con ventas anómalas
+# ==============================
+def detectar_dias_anomalos(registrar=False):
+    global df_ventas_filtrado
+    if df_ventas_filtrado is None or df_ventas_filtrado.empty:
+        print("\n⚠ No hay datos cargados.")
+        return None
+    detector = anomalias_ventas.detector_para(
+        str(archivo_excel), anomalias_ventas.serie_diaria(df_ventas_filtrado),
+        registro=anomalias_ventas.ARCHIVO_REGISTRO if registrar else None)
+    anomalias = detector.anomalias()
+    print(f"\n🚨 {len(anomalias)} día(s) con ventas anómalas:")
+    for _, fila in anomalias.iterrows():
+        print(f"   - {fila['fecha'].date()}: S/. {fila['ventas']:.2f} (esperado S/. {fila['esperado']:.2f}) → {fila['motivo']}")
+    if registrar:
+        print(f"📝 Registro de alertas: {anomalias_ventas.ARCHIVO_REGISTRO}")
+    return anomalias
+
 def menu():
     while True:
         print("\n====== MENÚ DE INFORMES ======")
@@ -212,17 +330,31 @@ def menu():
         print("4. Generar informe PDF con gráficos")
         print("5. Generar informe PDF sin gráficos")
         print("6. Mostrar gráfico de tendencia diaria")
-        print("7. Salir")
+        print("7. Agregar Excel al historial acumulado")
+        print("8. Cargar historial acumulado")
+        print("9. Segmentación RFM de clientes (Excel)")
+        print("10. Detectar días con ventas anómalas")
+        print("11. Salir")
         opcion = input("Selecciona una opción: ")
 
-        if opcion == "1": path = input("\nRuta Excel: "); cargar_excel(path)
-        elif opcion == "2": filtrar_por_rango_fechas()
-        elif opcion == "3": mostrar_metricas_rapidas()
-        elif opcion == "4": generar_pdf(con_graficos=True)
-        elif opcion == "5": generar_pdf(con_graficos=False)
-        elif opcion == "6": generar_tendencia_diaria()
-        elif opcion == "7": print("\n👋 Saliendo..."); break
-        else: print("\n⚠ Opción inválida.")
+        with perfilado.perfilar_opcion("informes", opcion, omitir=("11",)):
+            if opcion == "1": path = input("\nRuta Excel (archivo, carpeta o patrón *.xlsx): "); cargar_excel(path)
+            elif opcion == "2": filtrar_por_rango_fechas()
+            elif opcion == "3": mostrar_metricas_rapidas()
+            elif opcion == "4": generar_pdf(con_graficos=True)
+            elif opcion == "5": generar_pdf(con_graficos=False)
+            elif opcion == "6": generar_tendencia_diaria()
+            elif opcion == "7":
+                import historial_ventas
+                path = input("\nRuta Excel (archivo, carpeta o patrón *.xlsx): ")
+                try: historial_ventas.agregar_excel(path)
+                except ValueError as e: print(f"\n❌ Formato de archivo no reconocido: {e}")
+            elif opcion == "8": cargar_historial_acumulado()
+            elif opcion == "9": exportar_segmentos_excel()
+            elif opcion == "10": detectar_dias_anomalos(input("¿Anotar las anomalías en el registro de alertas? (s/n): ").strip().lower() == "s")
+            elif opcion == "11": print("\n👋 Saliendo..."); break
+            else: print("\n⚠ Opción inválida.")
 
 if __name__ == "__main__":
+    perfilado.activar_desde_argumentos()
     menu()
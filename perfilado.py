@@ -0,0 +1,254 @@
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from html import escape
+
+import pandas as pd
+
+from utilidades import crear_carpeta_reportes, timestamp
+
+# ==============================
+# ⚙️ Configuración
+# ==============================
+# "muestreo" toma la pila del hilo cada INTERVALO_MUESTREO segundos (casi sin
+# sobrecosto, con pilas completas para el flamegraph); "deterministico" usa
+# cProfile, que cuenta cada llamada pero hace más lento el código medido.
+MODOS = ("muestreo", "deterministico")
+MODO = "muestreo"
+INTERVALO_MUESTREO = 0.005
+TOP_FUNCIONES = 15
+
+# Modo activado para los menús de consola (None = sin perfilado)
+ACTIVO = os.environ.get("PERFILAR") or None
+
+def _carpeta_perfiles():
+    carpeta = os.path.join(crear_carpeta_reportes(), "perfiles")
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+def _base_archivo(nombre):
+    """Ruta sin extensión para los artefactos; no pisa los de otra acción medida en el mismo segundo."""
+    limpio = "".join(c if c.isalnum() else "_" for c in nombre).strip("_") or "accion"
+    base = os.path.join(_carpeta_perfiles(), f"{limpio}_{timestamp()}")
+    candidata, n = base, 1
+    while os.path.exists(f"{candidata}.txt"):
+        n += 1
+        candidata = f"{base}_{n}"
+    return candidata
+
+def _etiqueta(codigo):
+    return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})"
+
+# ==============================
+# 📈 Muestreo de pilas
+# ==============================
+class _Muestreador(threading.Thread):
+    """Cuenta las pilas de llamadas de un hilo tomadas a intervalos regulares."""
+
+    def __init__(self, hilo_id, intervalo):
+        super().__init__(daemon=True)
+        self.hilo_id = hilo_id
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self._fin = threading.Event()
+
+    def run(self):
+        while not self._fin.wait(self.intervalo):
+            marco = sys._current_frames().get(self.hilo_id)
+            pila = []
+            while marco is not None:
+                pila.append(_etiqueta(marco.f_code))
+                marco = marco.f_back
+            if pila:
+                self.pilas[";".join(reversed(pila))] += 1
+
+    def detener(self):
+        self._fin.set()
+        self.join()
+
+def top_muestras(pilas, top=TOP_FUNCIONES):
+    """Funciones con más muestras: propias (en la cima de la pila) y totales (en cualquier nivel)."""
+    propias, totales = Counter(), Counter()
+    for pila, muestras in pilas.items():
+        marcos = pila.split(";")
+        propias[marcos[-1]] += muestras
+        for marco in set(marcos):
+            totales[marco] += muestras
+    total = sum(pilas.values()) or 1
+    tabla = pd.DataFrame({'funcion': list(totales), 'propias': [propias[f] for f in totales],
+                          'totales': list(totales.values())})
+    tabla['pct_propias'] = tabla['propias'] / total * 100
+    tabla['pct_totales'] = tabla['totales'] / total * 100
+    return tabla.sort_values(['propias', 'totales'], ascending=False).head(top).reset_index(drop=True)
+
+def flamegraph_svg(pilas, titulo="", ancho=1200, alto_fila=16):
+    """Flamegraph SVG de las pilas colapsadas (el ancho de cada caja es su número de muestras)."""
+    arbol = {}
+    for pila, muestras in pilas.items():
+        nodo = arbol
+        for marco in pila.split(";"):
+            hijo = nodo.setdefault(marco, {'muestras': 0, 'hijos': {}})
+            hijo['muestras'] += muestras
+            nodo = hijo['hijos']
+    total = sum(pilas.values()) or 1
+
+    cajas = []
+    def recorrer(nodos, x, nivel):
+        for marco, datos in sorted(nodos.items()):
+            w = datos['muestras'] / total * ancho
+            cajas.append((x, nivel, w, marco, datos['muestras']))
+            recorrer(datos['hijos'], x, nivel + 1)
+            x += w
+    recorrer(arbol, 0.0, 0)
+
+    niveles = max((c[1] for c in cajas), default=0) + 1
+    alto = (niveles + 2) * alto_fila
+    partes = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{ancho}" height="{alto}" font-family="monospace" font-size="11">',
+              f'<text x="4" y="{alto_fila - 4}">{escape(titulo)} ({total} muestras)</text>']
+    for x, nivel, w, marco, muestras in cajas:
+        if w < 0.5:
+            continue
+        y = alto - (nivel + 1) * alto_fila
+        # Tonos cálidos estables por función, como en los flamegraph clásicos
+        tono = zlib.crc32(marco.encode()) % 60
+        partes.append(f'<g><title>{escape(marco)}: {muestras} muestras ({muestras / total:.1%})</title>'
+                      f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{alto_fila - 1}" fill="hsl({tono},85%,60%)"/>')
+        if w > 40:
+            texto = marco[:int(w / 7)]
+            partes.append(f'<text x="{x + 2:.1f}" y="{y + alto_fila - 4}">{escape(texto)}</text>')
+        partes.append('</g>')
+    partes.append('</svg>')
+    return "\n".join(partes)
+
+# ==============================
+# ⏱️ cProfile
+# ==============================
+def top_cprofile(estadisticas, top=TOP_FUNCIONES):
+    """Funciones con más tiempo propio según un pstats.Stats."""
+    total = estadisticas.total_tt or 1
+    filas = [{'funcion': f"{funcion} ({os.path.basename(archivo)}:{linea})", 'llamadas': nc,
+              'propio_s': tt, 'acumulado_s': ct, 'pct_propio': tt / total * 100}
+             for (archivo, linea, funcion), (cc, nc, tt, ct, _) in estadisticas.stats.items()]
+    tabla = pd.DataFrame(filas, columns=['funcion', 'llamadas', 'propio_s', 'acumulado_s', 'pct_propio'])
+    return tabla.sort_values('propio_s', ascending=False).head(top).reset_index(drop=True)
+
+# ==============================
+# 🩺 Perfilado de una acción
+# ==============================
+class Perfil:
+    """Perfila lo que ocurre entre `iniciar` y `detener` en el hilo que llama a `iniciar`.
+
+    Al detener guarda en reportes/perfiles/ los artefactos de la acción:
+      · muestreo: pilas colapsadas (.folded, para flamegraph.pl o speedscope),
+        un flamegraph .svg y el resumen .txt;
+      · deterministico: estadísticas de cProfile (.prof, para snakeviz) y el resumen .txt.
+    Los resultados quedan en `archivos`, `top` (DataFrame) y `segundos`.
+    """
+
+    def __init__(self, nombre, modo=None, intervalo=INTERVALO_MUESTREO, top=TOP_FUNCIONES):
+        modo = modo or MODO
+        if modo not in MODOS:
+            raise ValueError(f"Modo de perfilado desconocido: '{modo}'. Opciones: {', '.join(MODOS)}")
+        self.nombre = nombre
+        self.modo = modo
+        self.intervalo = intervalo
+        self.numero_top = top
+        self.archivos = {}
+        self.top = None
+        self.segundos = None
+        self._inicio = None
+        self._perfilador = None
+        self._muestreador = None
+
+    def iniciar(self):
+        self._inicio = time.perf_counter()
+        if self.modo == "deterministico":
+            self._perfilador = cProfile.Profile()
+            self._perfilador.enable()
+        else:
+            self._muestreador = _Muestreador(threading.get_ident(), self.intervalo)
+            self._muestreador.start()
+        return self
+
+    def detener(self):
+        if self._inicio is None:
+            return self
+        if self._perfilador is not None:
+            self._perfilador.disable()
+        else:
+            self._muestreador.detener()
+        self.segundos = time.perf_counter() - self._inicio
+        self._inicio = None
+        self._guardar()
+        print(self.resumen())
+        return self
+
+    def _guardar(self):
+        base = _base_archivo(self.nombre)
+        encabezado = f"Acción: {self.nombre}\nModo: {self.modo}\nDuración: {self.segundos:.2f} s\n\n"
+        if self._perfilador is not None:
+            self.archivos['prof'] = f"{base}.prof"
+            self._perfilador.dump_stats(self.archivos['prof'])
+            salida = io.StringIO()
+            estadisticas = pstats.Stats(self._perfilador, stream=salida)
+            self.top = top_cprofile(estadisticas, self.numero_top)
+            estadisticas.sort_stats('cumulative').print_stats(40)
+            detalle = salida.getvalue()
+        else:
+            pilas = self._muestreador.pilas
+            self.archivos['folded'] = f"{base}.folded"
+            with open(self.archivos['folded'], "w", encoding="utf-8") as f:
+                f.writelines(f"{pila} {muestras}\n" for pila, muestras in pilas.most_common())
+            self.archivos['svg'] = f"{base}.svg"
+            with open(self.archivos['svg'], "w", encoding="utf-8") as f:
+                f.write(flamegraph_svg(pilas, f"{self.nombre} · {self.segundos:.2f} s"))
+            self.top = top_muestras(pilas, self.numero_top)
+            detalle = f"Muestras: {sum(pilas.values())} cada {self.intervalo * 1000:.0f} ms\n"
+        self.archivos['txt'] = f"{base}.txt"
+        with open(self.archivos['txt'], "w", encoding="utf-8") as f:
+            f.write(encabezado + "Funciones más costosas:\n" + self.top.to_string(index=False) + "\n\n" + detalle)
+
+    def resumen(self):
+        """Texto corto con las funciones más costosas y los archivos guardados."""
+        columna = 'pct_propio' if self.modo == "deterministico" else 'pct_propias'
+        lineas = [f"\n🩺 Perfil de '{self.nombre}' ({self.modo}): {self.segundos:.2f} s"]
+        for _, fila in self.top.head(5).iterrows():
+            lineas.append(f"   {fila[columna]:5.1f} %  {fila['funcion']}")
+        lineas += [f"   📁 {ruta}" for ruta in self.archivos.values()]
+        return "\n".join(lineas)
+
+@contextlib.contextmanager
+def perfilar(nombre, modo=None, **opciones):
+    """Perfila el bloque `with`; entrega el `Perfil`, con resultados al salir."""
+    perfil = Perfil(nombre, modo, **opciones).iniciar()
+    try:
+        yield perfil
+    finally:
+        perfil.detener()
+
+def perfilar_opcion(menu, opcion, omitir=()):
+    """Perfila una opción de un menú de consola si el perfilado está activo (PERFILAR o --perfilar)."""
+    if not ACTIVO or not opcion.strip() or opcion.strip() in omitir:
+        return contextlib.nullcontext()
+    return perfilar(f"{menu}_opcion_{opcion.strip()}", ACTIVO)
+
+def activar_desde_argumentos(argumentos=None):
+    """Lee `--perfilar [modo]` de la línea de comandos de los menús."""
+    global ACTIVO
+    argumentos = sys.argv[1:] if argumentos is None else argumentos
+    if "--perfilar" in argumentos:
+        posicion = argumentos.index("--perfilar")
+        siguiente = argumentos[posicion + 1] if posicion + 1 < len(argumentos) else ""
+        ACTIVO = siguiente if siguiente in MODOS else MODO
+    if ACTIVO and ACTIVO not in MODOS:
+        raise ValueError(f"Modo de perfilado desconocido: '{ACTIVO}'. Opciones: {', '.join(MODOS)}")
+    if ACTIVO:
+        print(f"🩺 Perfilado activo ({ACTIVO}): cada opción deja su perfil en reportes/perfiles/")
+    return ACTIVO
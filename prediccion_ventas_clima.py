@@ -1,11 +1,26 @@
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from prophet import Prophet
 import requests
 import datetime
 import os
 import json
-from utilidades import timestamp, crear_carpeta_reportes
+from utilidades import timestamp, crear_carpeta_reportes, leer_hoja_ventas, COLUMNAS_VENTAS
+import correlacion_clima
+import escenarios_clima
+import variables_clima
+import climatologia
+import ajuste_hiperparametros
+import servicio_pronostico
+import registro_modelos
+import carga_multiple
+import reportes_pdf
+import perfilado
+import anomalias_ventas
+import sqlite3
+import threading
+import time
 from meteostat import Point, Daily
 from fpdf import FPDF
 
@@ -17,20 +32,32 @@ except FileNotFoundError:
     config = {
         "api_key": os.environ.get("API_KEY", ""),
         "latitude": float(os.environ.get("LATITUDE", "0.0")),
-        "longitude": float(os.environ.get("LONGITUDE", "0.0"))
+        "longitude": float(os.environ.get("LONGITUDE", "0.0")),
+        "tienda": os.environ.get("TIENDA", "principal"),
+        "variables_derivadas": os.environ.get("VARIABLES_DERIVADAS", "0") == "1"
     }
 
 # Coordenadas de Iquitos
 LAT = config["latitude"]
 LON = config["longitude"]
 API_KEY = config["api_key"]
+TIENDA = config.get("tienda", "principal")
+# Rezagos, acumulados y rachas de clima como regresores extra (variables_clima.py); por defecto solo temp y lluvia
+VARIABLES_DERIVADAS = bool(config.get("variables_derivadas", False))
 
 ventas_diarias = None
 clima_df = None
 modelo = None
 forecast = None
 grafico_correlacion = None
+grafico_desfases = None
+correlaciones = None
+futuro_regresores = None
+escenarios = None
 grafico_prediccion = None
+# El dashboard atiende cada sesión en un hilo del mismo proceso y todas comparten las variables
+# de arriba: quien las fija y luego entrena, simula o exporta con ellas tiene el candado mientras tanto
+candado_estado = threading.RLock()
 
 # ==============================
 # 🧹 Función de limpieza de figuras
@@ -39,31 +66,39 @@ def limpiar_figuras():
     """Limpia todas las figuras de matplotlib para liberar memoria"""
     plt.close('all')
 
+def olvidar_correlaciones():
+    """Descarta las correlaciones y sus gráficos al cambiar las ventas o el clima: el PDF las recalcula."""
+    global correlaciones, grafico_correlacion, grafico_desfases
+    correlaciones = grafico_correlacion = grafico_desfases = None
+
 # ==============================
 # 1️⃣ Cargar ventas desde Excel
 # ==============================
 def cargar_datos_excel(path):
-    excel_data = pd.ExcelFile(path)
-    df = pd.read_excel(path, sheet_name='Compras', skiprows=7)
-    df.columns = df.iloc[0]
-    df = df[1:]
-
-    df = df.rename(columns={
-        'Cliente': 'cliente',
-        'Descuento': 'descuento',
-        'Productos': 'productos',
-        'Total': 'total',
-        'Fecha Emisión': 'fecha'
-    })
-    df['fecha'] = pd.to_datetime(df['fecha'])
-    df['total'] = pd.to_numeric(df['total'], errors='coerce')
-    df = df[df['cliente'].notna() & ~df['cliente'].astype(str).str.contains("Totales", case=False, na=False)]
+    if carga_multiple.es_multiple(path):
+        # Carpeta o patrón: los libros se leen en paralelo y sin operaciones repetidas
+        df, _ = carga_multiple.cargar_varios(path)
+    else:
+        # Para la serie diaria bastan cliente, total y fecha
+        df = leer_hoja_ventas(path, ['Cliente', 'Total', 'Fecha Emisión'])
+        df = df.rename(columns=COLUMNAS_VENTAS)
+        df['fecha'] = pd.to_datetime(df['fecha'])
+        df['total'] = pd.to_numeric(df['total'], errors='coerce')
+        df = df[df['cliente'].notna() & ~df['cliente'].astype(str).str.contains("Totales", case=False, na=False)]
 
     ventas = df.groupby(df['fecha'].dt.date)['total'].sum().reset_index()
     ventas.columns = ['ds', 'y']
     ventas['ds'] = pd.to_datetime(ventas['ds'])
     return ventas
 
+def cargar_datos_historial():
+    """Serie diaria desde el historial acumulado, sin volver a leer los Excel."""
+    import historial_ventas
+    ventas = historial_ventas.ventas_diarias().copy()
+    ventas['ds'] = pd.to_datetime(ventas['ds'])
+    ventas['y'] = ventas['y'].astype('float64')
+    return ventas
+
 # ==============================
 # 2️⃣ Clima histórico (Meteostat)
 # ==============================
@@ -118,70 +153,225 @@ def obtener_clima_pronostico(dias=7):
 # ==============================
 # 4️⃣ Entrenar modelo con clima
 # ==============================
-def entrenar_modelo(ventas, clima):
-    global modelo, forecast
+# Configuración del modelo: se guarda junto al modelo para saber si un ajuste previo es reutilizable
+CONFIGURACION_MODELO = {
+    "daily_seasonality": True,
+    "changepoint_prior_scale": 0.05,
+    "seasonality_prior_scale": 10.0,
+    "seasonality_mode": "additive",
+    "modo_regresores": "additive",
+    "regresores": ["temp", "lluvia"] + (variables_clima.VARIABLES if VARIABLES_DERIVADAS else []),
+}
+# Días a pronosticar; los que no cubre OpenWeatherMap (~5) toman el clima típico de la climatología
+DIAS_FUTUROS = 14
+
+def cargar_hiperparametros():
+    """Pasa a CONFIGURACION_MODELO los hiperparámetros de la última búsqueda de la tienda (ajuste_hiperparametros.py)."""
+    CONFIGURACION_MODELO.update(ajuste_hiperparametros.cargar_mejor(TIENDA))
+
+def preparar_datos_entrenamiento(ventas, clima):
     # Asegurar que ambas columnas 'ds' sean del mismo tipo (datetime)
     ventas = ventas.copy()
-    clima = clima.copy()
     ventas['ds'] = pd.to_datetime(ventas['ds'])
-    clima['ds'] = pd.to_datetime(clima['ds'])
-    
-    df = ventas.merge(clima, on="ds", how="left")
-
-    # Convertir columnas numéricas de manera más robusta
-    df['temp'] = pd.to_numeric(df['temp'], errors='coerce').astype('float64')
-    df['lluvia'] = pd.to_numeric(df['lluvia'], errors='coerce').astype('float64')
+    ventas['y'] = ventas['y'].astype('float64')
 
-    if df['temp'].isnull().sum() > 0 or df['lluvia'].isnull().sum() > 0:
+    fechas_clima = pd.to_datetime(clima['ds'])[pd.to_numeric(clima['temp'], errors='coerce').notna()
+                                               & pd.to_numeric(clima['lluvia'], errors='coerce').notna()]
+    if not ventas['ds'].isin(fechas_clima).all():
         print(f"⚠ Se encontraron datos climáticos faltantes. Serán rellenados con la media.")
-    df['temp'] = df['temp'].fillna(df['temp'].mean())
-    df['lluvia'] = df['lluvia'].fillna(df['lluvia'].mean())
 
-    # Asegurar que las columnas sean float64
-    df['temp'] = df['temp'].astype('float64')
-    df['lluvia'] = df['lluvia'].astype('float64')
-    df['y'] = df['y'].astype('float64')
+    # Clima diario con las variables derivadas (rezagos, acumulados, calor, rachas), cacheado por rango
+    variables = variables_clima.variables_clima(clima, LAT, LON, ventas['ds'].min(), ventas['ds'].max())
+    return ventas.merge(variables[['ds'] + CONFIGURACION_MODELO["regresores"]], on="ds", how="left")
+
+def crear_modelo(configuracion=None, changepoints=None):
+    configuracion = configuracion or CONFIGURACION_MODELO
+    modelo = Prophet(changepoints=changepoints,
+                     daily_seasonality=configuracion["daily_seasonality"],
+                     changepoint_prior_scale=configuracion["changepoint_prior_scale"],
+                     seasonality_prior_scale=configuracion["seasonality_prior_scale"],
+                     seasonality_mode=configuracion["seasonality_mode"])
+    for regresor in configuracion["regresores"]:
+        modelo.add_regressor(regresor, mode=configuracion["modo_regresores"])
+    return modelo
+
+def ajustar_modelo(df, incremental=False):
+    """Ajusta Prophet sobre `df`; con `incremental` arranca desde los parámetros del último modelo registrado.
+
+    El arranque en caliente conserva los changepoints y las escalas del ajuste anterior,
+    así los parámetros guardados siguen siendo válidos y Stan parte del óptimo previo.
+    Si los datos cambiaron demasiado respecto al último ajuste se reentrena desde cero.
+    Devuelve (modelo, metadatos del registro).
+    """
+    modo, motivo = 'frio', "reentrenamiento completo solicitado"
+    init = None
+    nuevo = crear_modelo()
+    if incremental:
+        meta = registro_modelos.cargar_meta(TIENDA)
+        modo, motivo = registro_modelos.decidir_modo(meta, df, CONFIGURACION_MODELO)
+        if modo == 'tibio':
+            init = registro_modelos.parametros_stan(meta['parametros'])
+            nuevo = registro_modelos.fijar_escalas(crear_modelo(changepoints=meta['changepoints']), meta['escalas'])
+    print(f"🔁 Ajuste {'incremental (arranque en caliente)' if modo == 'tibio' else 'completo'}: {motivo}.")
+
+    inicio = time.perf_counter()
+    try:
+        if init:
+            nuevo.fit(df, init=init)
+            if not registro_modelos.escalas_respetadas(nuevo, meta['escalas']):
+                raise RuntimeError("Prophet recalculó las escalas del ajuste anterior")
+        else:
+            nuevo.fit(df)
+    except Exception as e:
+        if init is None:
+            raise
+        print(f"⚠ Falló el arranque en caliente ({e}). Reentrenando desde cero.")
+        modo = 'frio'
+        nuevo = crear_modelo()
+        inicio = time.perf_counter()
+        nuevo.fit(df)
+    segundos = time.perf_counter() - inicio
+
+    meta = registro_modelos.guardar(TIENDA, nuevo, df, CONFIGURACION_MODELO, modo, segundos)
+    return nuevo, meta
+
+def entrenar_modelo(ventas, clima, incremental=False):
+    global modelo, forecast, futuro_regresores
+    cargar_hiperparametros()
+    df = preparar_datos_entrenamiento(ventas, clima)
+    clima = clima.copy()
 
-    modelo = Prophet(daily_seasonality=True)
-    modelo.add_regressor('temp')
-    modelo.add_regressor('lluvia')
-    modelo.fit(df)
+    modelo, _ = ajustar_modelo(df, incremental)
 
     # Preparar datos futuros
-    dias_futuros = 14
-    futuro_fechas = modelo.make_future_dataframe(periods=dias_futuros)
+    futuro_fechas = modelo.make_future_dataframe(periods=DIAS_FUTUROS)
     futuro_fechas['ds'] = pd.to_datetime(futuro_fechas['ds'])
 
     clima['ds'] = pd.to_datetime(clima['ds'])
-    clima_futuro = obtener_clima_pronostico(dias_futuros)
+    try:
+        clima_futuro = obtener_clima_pronostico(DIAS_FUTUROS)
+    except (requests.RequestException, KeyError) as e:
+        print(f"⚠ No se pudo obtener el pronóstico de OpenWeatherMap ({e}).")
+        clima_futuro = pd.DataFrame(columns=["ds", "temp", "lluvia"])
     clima_futuro['ds'] = pd.to_datetime(clima_futuro['ds'])
-
-    futuro = futuro_fechas.merge(pd.concat([clima, clima_futuro]), on="ds", how="left")
+    clima_conocido = pd.concat([clima, clima_futuro])
+
+    # Los días futuros sin pronóstico toman la media de ese día del año en el histórico de la ubicación.
+    # Si la tabla falta o está vencida se descarga en segundo plano: este entrenamiento usa la que haya
+    # (o ninguna) y los siguientes la encuentran lista.
+    climatologia.preparar(LAT, LON, obtener_clima_historico)
+    tabla = climatologia.disponible(LAT, LON)
+    if tabla is not None:
+        ultimo_dia = futuro_fechas['ds'].max()
+        clima_conocido, completados = climatologia.completar(clima_conocido, [df['ds'].max(), ultimo_dia], tabla)
+        if completados:
+            print(f"📚 {completados} día(s) futuros sin pronóstico completados con la climatología.")
+
+    # Las variables derivadas se calculan sobre histórico + pronóstico: los rezagos del
+    # primer día futuro usan los días reales previos. Los días que sigan sin dato toman la media.
+    variables = variables_clima.variables_clima(clima_conocido, LAT, LON,
+                                                futuro_fechas['ds'].min(), futuro_fechas['ds'].max())
 
     # ✅ Mantener solo las columnas necesarias para Prophet
-    futuro = futuro[['ds', 'temp', 'lluvia']].copy()
+    futuro = futuro_fechas.merge(variables[['ds'] + CONFIGURACION_MODELO["regresores"]], on="ds", how="left")
 
-    # Convertir todas las columnas numéricas y rellenar NaN con tipo explícito
-    for col in ['temp', 'lluvia']:
-        futuro[col] = pd.to_numeric(futuro[col], errors='coerce').astype('float64')
-    
-    # Rellenar valores faltantes con la media de cada columna
-    futuro['temp'] = futuro['temp'].fillna(futuro['temp'].mean())
-    futuro['lluvia'] = futuro['lluvia'].fillna(futuro['lluvia'].mean())
-    
     # Asegurar que no hay valores infinitos o NaN
     futuro = futuro.replace([float('inf'), float('-inf')], float('nan'))
     futuro = futuro.ffill().bfill().fillna(0)
 
     forecast = modelo.predict(futuro)
+    futuro_regresores = futuro
     print("\n✅ Modelo entrenado con clima histórico y pronóstico.")
+
+    # Publicar el pronóstico para las consultas de otros sistemas (servicio_pronostico.py)
+    try:
+        filas = servicio_pronostico.guardar_pronostico(forecast, TIENDA)
+        print(f"📡 Pronóstico publicado para la tienda '{TIENDA}' ({filas} días).")
+    except sqlite3.Error as e:
+        print(f"⚠ No se pudo publicar el pronóstico: {e}")
     return forecast
 
+# ==============================
+# 4.1️⃣ Ajuste de hiperparámetros
+# ==============================
+def ajustar_hiperparametros(ventas, clima, n=ajuste_hiperparametros.N_CANDIDATOS, procesos=None, semilla=0):
+    """Busca los hiperparámetros de Prophet con validación cruzada y los deja en CONFIGURACION_MODELO.
+
+    La elección queda guardada por tienda: los próximos `entrenar_modelo` la
+    cargan antes de ajustar. Devuelve la tabla de resultados.
+    """
+    cargar_hiperparametros()
+    df = preparar_datos_entrenamiento(ventas, clima)
+    mejor, tabla = ajuste_hiperparametros.buscar(df, CONFIGURACION_MODELO, crear_modelo, tienda=TIENDA,
+                                                 n=n, procesos=procesos, semilla=semilla)
+    CONFIGURACION_MODELO.update(mejor)
+    print("✅ Configuración guardada: el próximo entrenamiento la usará.")
+    return tabla
+
+# ==============================
+# 4.2️⃣ Escenarios climáticos (what-if)
+# ==============================
+def simular_escenarios(modo="predefinidos", n_muestras=500):
+    """Evalúa escenarios de clima futuro contra el modelo ya entrenado, sin reentrenar ni volver a predecir.
+
+    modo: 'predefinidos' (caluroso/seco, lluvioso, pronóstico ± error), 'rejilla'
+    (combinaciones de temperatura y lluvia) o 'muestras' (trayectorias aleatorias).
+    """
+    global escenarios
+    if modelo is None or forecast is None or futuro_regresores is None:
+        print("⚠ Genera predicciones primero.")
+        return None
+
+    ultima_fecha = modelo.history['ds'].max()
+    forecast_futuro = forecast[forecast['ds'] > ultima_fecha]
+    clima_base = futuro_regresores[futuro_regresores['ds'] > ultima_fecha]
+
+    if modo == "muestras":
+        nombres, X = escenarios_clima.muestrear_escenarios(clima_base, clima_df, n=n_muestras)
+    elif modo == "rejilla":
+        nombres, X = escenarios_clima.rejilla_escenarios(clima_base)
+    else:
+        nombres, X = escenarios_clima.apilar(escenarios_clima.escenarios_predefinidos(clima_base, clima_df))
+
+    contexto = futuro_regresores[futuro_regresores['ds'] <= ultima_fecha]
+    escenarios = escenarios_clima.evaluar_escenarios(modelo, forecast_futuro, nombres, X, contexto)
+    print(f"✅ {len(nombres)} escenarios evaluados para {len(clima_base)} días.")
+    return escenarios
+
+def graficar_escenarios():
+    if escenarios is None:
+        print("⚠ Simula escenarios primero.")
+        return None
+    carpeta = crear_carpeta_reportes()
+    archivo = os.path.join(carpeta, f"escenarios_clima_{timestamp()}.png")
+    historico = ventas_diarias.tail(30) if ventas_diarias is not None else None
+    return escenarios_clima.graficar_abanico(escenarios, archivo, historico)
+
 # ==============================
 # 5️⃣ Correlación clima-ventas
 # ==============================
-def analizar_correlacion(ventas, clima):
-    global grafico_correlacion
+def _grafico_dispersion(df, archivo, dpi=150):
+    """Ventas frente a temperatura y lluvia (columnas y, temp, lluvia de `df`)."""
+    # Figure sin pyplot: no depende de la "figura actual", que comparten todos los hilos
+    fig = Figure(figsize=(10, 4))
+    ax_temp, ax_lluvia = fig.subplots(1, 2)
+    ax_temp.scatter(df['temp'], df['y'], color='orange')
+    ax_temp.set_xlabel("Temperatura (°C)")
+    ax_temp.set_ylabel("Ventas (S/.)")
+    ax_temp.set_title("Ventas vs Temperatura")
+
+    ax_lluvia.scatter(df['lluvia'], df['y'], color='blue')
+    ax_lluvia.set_xlabel("Lluvia (mm)")
+    ax_lluvia.set_ylabel("Ventas (S/.)")
+    ax_lluvia.set_title("Ventas vs Lluvia")
+
+    fig.tight_layout()
+    fig.savefig(archivo, dpi=dpi, bbox_inches='tight')
+    return archivo
+
+def analizar_correlacion(ventas, clima, desfase_max=7, ventana=30, operaciones=None, con_graficos=True):
+    """Correlaciones clima-ventas; con `con_graficos` guarda además sus gráficos PNG en reportes."""
+    global grafico_correlacion, grafico_desfases, correlaciones
     # Asegurar que ambas columnas 'ds' sean del mismo tipo (datetime)
     ventas = ventas.copy()
     clima = clima.copy()
@@ -196,82 +386,56 @@ def analizar_correlacion(ventas, clima):
     print(f"- Correlación Ventas vs Temperatura: {corr_temp:.3f} {'(Positiva)' if corr_temp > 0 else '(Negativa)'}")
     print(f"- Correlación Ventas vs Lluvia: {corr_lluvia:.3f} {'(Positiva)' if corr_lluvia > 0 else '(Negativa)'}")
 
+    # Correlaciones con desfase, en ventana móvil y (opcional) por cliente
+    correlaciones = correlacion_clima.calcular_correlaciones(ventas, clima, desfase_max=desfase_max,
+                                                           ventana=ventana, operaciones=operaciones)
+    print("\n⏱ Desfase con mayor correlación (clima de días previos):")
+    for _, fila in correlacion_clima.mejor_desfase(correlaciones['desfases']).iterrows():
+        print(f"- {fila['variable']}: {fila['correlacion']:.3f} con {fila['desfase']} día(s) de desfase")
+    if not con_graficos:
+        return correlaciones
+
     carpeta = crear_carpeta_reportes()
     ts = timestamp()
 
-    plt.figure(figsize=(10, 4))
-    plt.subplot(1, 2, 1)
-    plt.scatter(df['temp'], df['y'], color='orange')
-    plt.xlabel("Temperatura (°C)")
-    plt.ylabel("Ventas (S/.)")
-    plt.title("Ventas vs Temperatura")
+    grafico_correlacion = _grafico_dispersion(df, os.path.join(carpeta, f"correlacion_clima_ventas_{ts}.png"))
 
-    plt.subplot(1, 2, 2)
-    plt.scatter(df['lluvia'], df['y'], color='blue')
-    plt.xlabel("Lluvia (mm)")
-    plt.ylabel("Ventas (S/.)")
-    plt.title("Ventas vs Lluvia")
-
-    plt.tight_layout()
-    grafico_correlacion = os.path.join(carpeta, f"correlacion_clima_ventas_{ts}.png")
-    plt.savefig(grafico_correlacion, dpi=150, bbox_inches='tight')
-    plt.close()  # Cerrar la figura para liberar memoria y evitar problemas en Streamlit
+    grafico_desfases = os.path.join(carpeta, f"correlacion_desfases_{ts}.png")
+    correlacion_clima.graficar_mapa_calor(correlaciones['desfases'].T, "Correlación ventas vs clima por desfase", grafico_desfases)
+    return correlaciones
 
 # ==============================
 # 6️⃣ Graficar predicción
 # ==============================
+def _grafico_prediccion(archivo, dpi=150):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot(111)
+    modelo.plot(forecast, ax=ax)
+    ax.set_title("Pronóstico de ventas ajustado al clima")
+    ax.set_xlabel("Fecha")
+    ax.set_ylabel("Ventas (S/.)")
+    fig.tight_layout()
+    fig.savefig(archivo, dpi=dpi, bbox_inches='tight')
+    return archivo
+
+def _grafico_componentes(archivo, dpi=150):
+    # Prophet arma esta figura con pyplot: se guarda y se cierra esa figura, no la "actual"
+    fig = modelo.plot_components(forecast)
+    fig.savefig(archivo, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)  # Cerrar la figura para liberar memoria
+    return archivo
+
 def graficar_prediccion():
     global modelo, forecast, grafico_prediccion
     carpeta = crear_carpeta_reportes()
     ts = timestamp()
 
-    # Crear el gráfico principal de predicción
-    fig1 = modelo.plot(forecast)
-    plt.title("Pronóstico de ventas ajustado al clima")
-    plt.xlabel("Fecha")
-    plt.ylabel("Ventas (S/.)")
-    grafico_prediccion = os.path.join(carpeta, f"prediccion_ventas_{ts}.png")
-    plt.savefig(grafico_prediccion, dpi=150, bbox_inches='tight')
-    plt.close()  # Cerrar la figura para liberar memoria
-
-    # Crear el gráfico de componentes
-    fig2 = modelo.plot_components(forecast)
-    grafico_componentes = os.path.join(carpeta, f"componentes_prediccion_{ts}.png")
-    plt.savefig(grafico_componentes, dpi=150, bbox_inches='tight')
-    plt.close()  # Cerrar la figura para liberar memoria
+    # Gráfico principal de predicción y gráfico de componentes
+    grafico_prediccion = _grafico_prediccion(os.path.join(carpeta, f"prediccion_ventas_{ts}.png"))
+    grafico_componentes = _grafico_componentes(os.path.join(carpeta, f"componentes_prediccion_{ts}.png"))
     
     return grafico_prediccion, grafico_componentes
 
-# ==============================
-# 6.1️⃣ Graficar predicción para Streamlit
-# ==============================
-def graficar_prediccion_streamlit():
-    global modelo, forecast, grafico_prediccion
-    if modelo is None or forecast is None:
-        return None, None
-    
-    # Limpiar figuras existentes
-    plt.close('all')
-    
-    # Crear el gráfico principal de predicción
-    fig1 = modelo.plot(forecast)
-    plt.title("Pronóstico de ventas ajustado al clima")
-    plt.xlabel("Fecha")
-    plt.ylabel("Ventas (S/.)")
-    
-    # Guardar la figura principal para el PDF
-    carpeta = crear_carpeta_reportes()
-    ts = timestamp()
-    grafico_prediccion = os.path.join(carpeta, f"prediccion_ventas_{ts}.png")
-    plt.savefig(grafico_prediccion, dpi=150, bbox_inches='tight')
-    
-    # Crear el gráfico de componentes en una nueva figura
-    fig2 = modelo.plot_components(forecast)
-    componentes_prediccion = os.path.join(carpeta, f"componentes_prediccion_{ts}.png")
-    plt.savefig(componentes_prediccion, dpi=150, bbox_inches='tight')
-    
-    return fig1, fig2
-
 # ==============================
 # 7️⃣ Exportar Excel
 # ==============================
@@ -312,41 +476,19 @@ def exportar_predicciones_excel():
 # ==============================
 # 8️⃣ Generar PDF
 # ==============================
-def generar_pdf():
-    global grafico_correlacion, grafico_prediccion, ventas_diarias, clima_df, modelo, forecast
+def generar_pdf(perfil=None):
+    """Informe PDF de clima y pronóstico. `perfil` elige la salida de los gráficos (ver reportes_pdf.PERFILES_PDF)."""
+    global ventas_diarias, clima_df, modelo, forecast, correlaciones
     
     # Verificar que tenemos todos los datos necesarios
     if ventas_diarias is None or clima_df is None:
         print("⚠ Faltan datos de ventas o clima. Carga los datos primero.")
         return
-    
-    # Generar gráfico de correlación si no existe
-    if not grafico_correlacion:
-        print("📊 Generando gráfico de correlación...")
-        analizar_correlacion(ventas_diarias, clima_df)
-    
-    # Generar gráfico de predicción si no existe y tenemos modelo
-    grafico_componentes = None
-    if not grafico_prediccion and modelo is not None and forecast is not None:
-        print("📈 Generando gráficos de predicción...")
-        grafico_prediccion, grafico_componentes = graficar_prediccion()
-    elif modelo is not None and forecast is not None:
-        # Si ya existe el gráfico principal, generar también el de componentes
-        carpeta = crear_carpeta_reportes()
-        ts = timestamp()
-        # Generar gráfico de componentes
-        fig2 = modelo.plot_components(forecast)
-        grafico_componentes = os.path.join(carpeta, f"componentes_prediccion_{ts}.png")
-        plt.savefig(grafico_componentes, dpi=150, bbox_inches='tight')
-        plt.close()
-    
-    if not grafico_correlacion:
-        print("⚠ No se pudo generar el gráfico de correlación.")
-        return
-        
-    if not grafico_prediccion and modelo is not None:
-        print("⚠ No se pudo generar el gráfico de predicción.")
-        return
+
+    inicio = time.perf_counter()
+    ajustes = reportes_pdf.ajustes_pdf(perfil)
+    if correlaciones is None:
+        analizar_correlacion(ventas_diarias, clima_df, con_graficos=False)
 
     carpeta = crear_carpeta_reportes()
     ts = timestamp()
@@ -368,6 +510,19 @@ def generar_pdf():
     prom_secos = dias_secos['y'].mean() if not dias_secos.empty else 0
     prom_lluviosos = dias_lluviosos['y'].mean() if not dias_lluviosos.empty else 0
 
+    # Gráficos dibujados una vez por conjunto de datos y reutilizados en los informes siguientes
+    grafico_correlacion = reportes_pdf.grafico_cacheado(
+        "correlacion", clima_ventas[['ds', 'y', 'temp', 'lluvia']],
+        lambda archivo, dpi: _grafico_dispersion(clima_ventas, archivo, dpi), ajustes)
+    grafico_desfases = reportes_pdf.grafico_cacheado(
+        "desfases", correlaciones['desfases'],
+        lambda archivo, dpi: correlacion_clima.graficar_mapa_calor(
+            correlaciones['desfases'].T, "Correlación ventas vs clima por desfase", archivo, dpi=dpi), ajustes)
+    grafico_prediccion = grafico_componentes = None
+    if modelo is not None and forecast is not None:
+        grafico_prediccion = reportes_pdf.grafico_cacheado("prediccion", [forecast, ventas_diarias], _grafico_prediccion, ajustes)
+        grafico_componentes = reportes_pdf.grafico_cacheado("componentes", forecast, _grafico_componentes, ajustes)
+
     pdf = FPDF()
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
@@ -381,9 +536,20 @@ def generar_pdf():
 
     pdf.set_font("Arial", "B", 14)
     pdf.cell(0, 10, "Gráfico de Correlación Clima-Ventas", ln=True)
-    pdf.image(grafico_correlacion, x=10, w=180)
+    reportes_pdf.insertar_imagen(pdf, grafico_correlacion, ajustes)
     pdf.ln(10)
 
+    # Correlaciones con desfase: efecto del clima de días anteriores
+    if correlaciones is not None:
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 10, "Correlación con desfase (clima de días previos)", ln=True)
+        reportes_pdf.insertar_imagen(pdf, grafico_desfases, ajustes)
+        pdf.ln(3)
+        pdf.set_font("Arial", "", 12)
+        for _, fila in correlacion_clima.mejor_desfase(correlaciones['desfases']).iterrows():
+            pdf.cell(0, 8, f"{fila['variable']}: mayor correlación {fila['correlacion']:.3f} con {fila['desfase']} día(s) de desfase", ln=True)
+        pdf.ln(5)
+
     pdf.set_font("Arial", "B", 14)
     pdf.cell(0, 10, "Top 5 días más cálidos y sus ventas", ln=True)
     pdf.set_font("Arial", "", 12)
@@ -407,12 +573,12 @@ def generar_pdf():
     pdf.ln(10)
     pdf.set_font("Arial", "B", 14)
     pdf.cell(0, 10, "Pronóstico de Ventas Ajustado al Clima", ln=True)
-    if grafico_prediccion and os.path.exists(grafico_prediccion):
-        pdf.image(grafico_prediccion, x=10, w=180)
+    if grafico_prediccion:
+        reportes_pdf.insertar_imagen(pdf, grafico_prediccion, ajustes)
         pdf.ln(5)
     
     # Agregar gráfico de componentes del modelo si existe
-    if grafico_componentes and os.path.exists(grafico_componentes):
+    if grafico_componentes:
         pdf.add_page()  # Nueva página para el gráfico de componentes
         pdf.set_font("Arial", "B", 14)
         pdf.cell(0, 10, "Componentes del Modelo de Predicción", ln=True)
@@ -420,7 +586,7 @@ def generar_pdf():
         pdf.set_font("Arial", "", 10)
         pdf.multi_cell(0, 8, "Los componentes del modelo muestran las tendencias estacionales, semanales y la influencia de los factores climáticos en las ventas.")
         pdf.ln(5)
-        pdf.image(grafico_componentes, x=10, w=180)
+        reportes_pdf.insertar_imagen(pdf, grafico_componentes, ajustes)
     
     # Agregar sección de predicciones numéricas si tenemos forecast
     if forecast is not None:
@@ -445,8 +611,12 @@ def generar_pdf():
             pdf.cell(45, 8, f"{fila['yhat_lower']:.2f}", 1, 0, "C")
             pdf.cell(45, 8, f"{fila['yhat_upper']:.2f}", 1, 1, "C")
 
+    # Días reales fuera del intervalo del pronóstico o de la línea base de los días previos
+    anomalias_ventas.agregar_anomalias_pdf(pdf, anomalias_ventas.detector_para(TIENDA, ventas_diarias, forecast).anomalias())
+
     pdf.output(pdf_file)
     print(f"✅ Informe PDF generado: {pdf_file}")
+    reportes_pdf.registrar_informe(pdf_file, inicio, ajustes)
     return pdf_file  # Retornar la ruta del archivo generado
 
 # ==============================
@@ -463,41 +633,70 @@ def menu():
         print("5. Ver gráficos de predicción")
         print("6. Exportar predicciones a Excel")
         print("7. Generar informe PDF")
-        print("8. Salir")
+        print("8. Cargar ventas desde historial acumulado")
+        print("9. Actualizar modelo con días nuevos (incremental)")
+        print("10. Ajustar hiperparámetros del modelo (validación cruzada)")
+        print("11. Salir")
         opcion = input("Selecciona una opción: ")
 
-        if opcion == "1":
-            ruta = input("\n📂 Ruta Excel: ")
-            ventas_diarias = cargar_datos_excel(ruta)
-            print(f"✅ Ventas cargadas: {len(ventas_diarias)} días.")
-        elif opcion == "2":
-            if ventas_diarias is None:
-                print("⚠ Primero carga ventas.")
+        with perfilado.perfilar_opcion("prediccion", opcion, omitir=("11",)):
+            if opcion == "1":
+                ruta = input("\n📂 Ruta Excel (archivo, carpeta o patrón *.xlsx): ")
+                try:
+                    ventas_diarias = cargar_datos_excel(ruta)
+                    olvidar_correlaciones()
+                    print(f"✅ Ventas cargadas: {len(ventas_diarias)} días.")
+                except ValueError as e:
+                    print(f"❌ Formato de archivo no reconocido: {e}")
+            elif opcion == "2":
+                if ventas_diarias is None:
+                    print("⚠ Primero carga ventas.")
+                else:
+                    inicio = ventas_diarias['ds'].min()
+                    fin = ventas_diarias['ds'].max()
+                    clima_df = obtener_clima_historico(inicio, fin)
+                    olvidar_correlaciones()
+                    # La climatología se descarga mientras tanto, antes de entrenar
+                    climatologia.preparar(LAT, LON, obtener_clima_historico)
+            elif opcion == "3":
+                if ventas_diarias is not None and clima_df is not None:
+                    analizar_correlacion(ventas_diarias, clima_df)
+                else:
+                    print("⚠ Carga ventas y clima histórico primero.")
+            elif opcion == "4":
+                if ventas_diarias is not None and clima_df is not None:
+                    entrenar_modelo(ventas_diarias, clima_df)
+                else:
+                    print("⚠ Carga ventas y clima histórico primero.")
+            elif opcion == "5":
+                graficar_prediccion()
+            elif opcion == "6":
+                exportar_predicciones_excel()
+            elif opcion == "7":
+                generar_pdf()
+            elif opcion == "8":
+                ventas_diarias = cargar_datos_historial()
+                olvidar_correlaciones()
+                print(f"✅ Ventas cargadas: {len(ventas_diarias)} días.")
+            elif opcion == "9":
+                if ventas_diarias is not None and clima_df is not None:
+                    entrenar_modelo(ventas_diarias, clima_df, incremental=True)
+                else:
+                    print("⚠ Carga ventas y clima histórico primero.")
+            elif opcion == "10":
+                if ventas_diarias is not None and clima_df is not None:
+                    try:
+                        ajustar_hiperparametros(ventas_diarias, clima_df)
+                    except ValueError as e:
+                        print(f"❌ {e}")
+                else:
+                    print("⚠ Carga ventas y clima histórico primero.")
+            elif opcion == "11":
+                print("👋 Saliendo...")
+                break
             else:
-                inicio = ventas_diarias['ds'].min()
-                fin = ventas_diarias['ds'].max()
-                clima_df = obtener_clima_historico(inicio, fin)
-        elif opcion == "3":
-            if ventas_diarias is not None and clima_df is not None:
-                analizar_correlacion(ventas_diarias, clima_df)
-            else:
-                print("⚠ Carga ventas y clima histórico primero.")
-        elif opcion == "4":
-            if ventas_diarias is not None and clima_df is not None:
-                entrenar_modelo(ventas_diarias, clima_df)
-            else:
-                print("⚠ Carga ventas y clima histórico primero.")
-        elif opcion == "5":
-            graficar_prediccion()
-        elif opcion == "6":
-            exportar_predicciones_excel()
-        elif opcion == "7":
-            generar_pdf()
-        elif opcion == "8":
-            print("👋 Saliendo...")
-            break
-        else:
-            print("⚠ Opción inválida.")
+                print("⚠ Opción inválida.")
 
 if __name__ == "__main__":
+    perfilado.activar_desde_argumentos()
     menu()
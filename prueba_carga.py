@@ -0,0 +1,308 @@
+import argparse
+import contextlib
+import datetime
+import gc
+import json
+import logging
+import os
+import platform
+import threading
+import time
+
+import numpy as np
+
+import benchmark
+import registro_modelos
+from utilidades import timestamp
+
+# Niveles de concurrencia por defecto (sesiones simultáneas)
+SESIONES_DEFECTO = [1, 2, 4]
+TAMANO_DEFECTO = (5_000, 200, 90)
+PERCENTILES = (50, 90, 99)
+# runtime_compartido reemplaza piezas internas de AppTest: solo se probó con esta versión de Streamlit
+STREAMLIT_PROBADO = "1.66"
+
+# ==============================
+# 🧪 Varias sesiones de AppTest en un mismo proceso
+# ==============================
+def verificar_streamlit():
+    """Falla antes de medir si la versión de Streamlit no es la que `runtime_compartido` sabe parchear."""
+    import streamlit
+    version = ".".join(streamlit.__version__.split(".")[:2])
+    if version != STREAMLIT_PROBADO:
+        raise RuntimeError(f"La prueba de carga requiere Streamlit {STREAMLIT_PROBADO}.x "
+                           f"(instalado: {streamlit.__version__}): runtime_compartido usa internos de AppTest")
+
+@contextlib.contextmanager
+def runtime_compartido():
+    """Permite varias AppTest a la vez en el mismo proceso, como las sesiones de un servidor.
+
+    Cada `AppTest.run` instala su Runtime simulado y al terminar lo borra
+    (`Runtime._instance = None`), lo que rompe a las demás sesiones que siguen
+    ejecutándose. Mientras dura el bloque, AppTest solo puede reemplazarlo.
+    Además todas las sesiones comparten la caché del script compilado, como en
+    el servidor (compilar el mismo script en varios hilos a la vez falla en Python 3.11),
+    y la opción `global.appTest` queda activa todo el bloque en lugar de que
+    cada recarga la active y la restaure en medio de las recargas de las demás.
+    """
+    import streamlit.testing.v1.app_test as app_test
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    class _SinBorrar(type):
+        def __setattr__(cls, nombre, valor):
+            if nombre == "_instance":
+                if valor is not None:
+                    Runtime._instance = valor
+                return
+            super().__setattr__(nombre, valor)
+
+    class RuntimeCompartido(Runtime, metaclass=_SinBorrar):
+        pass
+
+    # Las sesiones se abren fuera del hilo del script: el aviso de contexto faltante no aplica.
+    # Las excepciones de la app ya se cuentan por opción en el reporte.
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+    logging.getLogger("streamlit.runtime.scriptrunner.exec_code").setLevel(logging.CRITICAL)
+    originales = app_test.Runtime, app_test.ScriptCache, app_test.patch_config_options
+    cache = ScriptCache()
+    app_test.Runtime = RuntimeCompartido
+    app_test.ScriptCache = lambda: cache
+    app_test.patch_config_options = lambda opciones: contextlib.nullcontext()
+    try:
+        with originales[2]({"global.appTest": True}):
+            yield
+    finally:
+        app_test.Runtime, app_test.ScriptCache, app_test.patch_config_options = originales
+        Runtime._instance = None
+
+def memoria_mb():
+    """Memoria residente actual del proceso en MB (None si el sistema no la expone en /proc)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class MonitorMemoria(threading.Thread):
+    """Registra el pico de memoria residente mientras corre una prueba."""
+
+    def __init__(self, intervalo=0.2):
+        super().__init__(daemon=True)
+        self.intervalo = intervalo
+        self.pico = memoria_mb()
+        self._fin = threading.Event()
+
+    def run(self):
+        while not self._fin.wait(self.intervalo):
+            actual = memoria_mb()
+            if actual is not None and (self.pico is None or actual > self.pico):
+                self.pico = actual
+
+    def detener(self):
+        self._fin.set()
+        self.join()
+        return self.pico
+
+# ==============================
+# 👥 Sesión simulada
+# ==============================
+def simular_sesion(contenido, nombre, inicio, rondas, pausa, timeout, tiempos, errores):
+    """Una analista: abre el dashboard, sube su libro y recorre las opciones del menú lateral.
+
+    Anota en `tiempos[opcion]` cada recarga y en `errores` las excepciones que muestra la app.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    try:
+        at = AppTest.from_file("dashboard.py", default_timeout=timeout)
+        at.run()
+    except BaseException:
+        inicio.abort()  # Sin esta sesión la prueba no puede arrancar: libera a las demás
+        raise
+    inicio.wait()
+
+    pasos = [("subir_excel", None)] + [(opcion, opcion) for _ in range(rondas) for opcion in benchmark.OPCIONES_DASHBOARD]
+    for paso, opcion in pasos:
+        if opcion is None:
+            at.sidebar.file_uploader[0].upload(nombre, contenido, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        elif at.sidebar.selectbox:
+            at.sidebar.selectbox[0].set_value(opcion)
+        else:
+            # La recarga anterior no llegó a dibujar la página: se recarga y se pasa a la siguiente opción
+            errores.append({'opcion': paso, 'error': "La recarga anterior no dibujó el menú lateral"})
+            at.run()
+            continue
+        t0 = time.perf_counter()
+        try:
+            at.run()
+        except Exception as e:  # Timeout u otro fallo del runner: cuenta como error de la opción
+            errores.append({'opcion': paso, 'error': f"{type(e).__name__}: {e}"})
+            continue
+        tiempos.setdefault(paso, []).append(time.perf_counter() - t0)
+        errores.extend({'opcion': paso, 'error': e.message.splitlines()[0][:200]} for e in at.exception)
+        if pausa:
+            time.sleep(pausa)
+    return at
+
+def _percentiles(valores):
+    datos = {f"p{p}_ms": float(np.percentile(valores, p)) * 1000 for p in PERCENTILES}
+    datos.update(max_ms=max(valores) * 1000, recargas=len(valores))
+    return datos
+
+def medir_concurrencia(libros, rondas=1, pausa=0.0, timeout=300):
+    """Lanza una sesión por libro, todas a la vez, y resume latencias, rendimiento y memoria."""
+    contenidos = []
+    for path in libros:
+        with open(path, "rb") as f:
+            contenidos.append((os.path.basename(path), f.read()))
+
+    tiempos = [{} for _ in libros]
+    errores = [[] for _ in libros]
+    inicio = threading.Barrier(len(libros) + 1)
+    sesiones = [None] * len(libros)
+
+    def correr(i):
+        sesiones[i] = simular_sesion(contenidos[i][1], contenidos[i][0], inicio, rondas, pausa, timeout, tiempos[i], errores[i])
+
+    hilos = [threading.Thread(target=correr, args=(i,), name=f"sesion-{i + 1}") for i in range(len(libros))]
+    gc.collect()
+    memoria_inicial = memoria_mb()
+    for hilo in hilos:
+        hilo.start()
+    try:
+        inicio.wait()  # Todas las sesiones abiertas: desde aquí corren a la vez
+    except threading.BrokenBarrierError:
+        for hilo in hilos:
+            hilo.join()
+        raise RuntimeError("Alguna sesión no pudo abrir el dashboard; revisa el error de su hilo.") from None
+    monitor = MonitorMemoria()
+    monitor.start()
+    t0 = time.perf_counter()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - t0
+    pico = monitor.detener()
+    memoria_final = memoria_mb()
+
+    por_opcion = {}
+    for tiempos_sesion in tiempos:
+        for opcion, valores in tiempos_sesion.items():
+            por_opcion.setdefault(opcion, []).extend(valores)
+    todos = [v for valores in por_opcion.values() for v in valores]
+    errores = [dict(e, sesion=i + 1) for i, lista in enumerate(errores) for e in lista]
+    resultado = {
+        'sesiones': len(libros),
+        'segundos': segundos,
+        'recargas': len(todos),
+        'recargas_por_s': len(todos) / segundos if segundos else None,
+        'latencia': _percentiles(todos) if todos else {},
+        'opciones': {opcion: dict(_percentiles(valores), errores=sum(e['opcion'] == opcion for e in errores))
+                     for opcion, valores in por_opcion.items()},
+        'memoria_mb': {'inicial': memoria_inicial, 'pico': pico, 'final': memoria_final,
+                       'por_sesion': (pico - memoria_inicial) / len(libros) if pico and memoria_inicial else None},
+        'errores': errores,
+    }
+    # Las sesiones se descartan como cuando se cierran las pestañas
+    del sesiones[:]
+    gc.collect()
+    return resultado
+
+# ==============================
+# 📋 Reporte
+# ==============================
+def imprimir_resultado(resultado):
+    memoria = resultado['memoria_mb']
+    print(f"\n👥 {resultado['sesiones']} sesión(es): {resultado['recargas']} recargas en {resultado['segundos']:.1f} s "
+          f"→ {resultado['recargas_por_s']:.2f} recargas/s")
+    if memoria['pico'] is not None:
+        print(f"   🧠 Memoria: {memoria['inicial']:.0f} MB al inicio, pico {memoria['pico']:.0f} MB "
+              f"(+{memoria['por_sesion']:.0f} MB por sesión)")
+    print(f"   {'Opción':<34} {'p50':>8} {'p90':>8} {'p99':>8} {'máx':>8}  errores")
+    for opcion, datos in resultado['opciones'].items():
+        print(f"   {opcion:<34} {datos['p50_ms']:>7.0f}ms {datos['p90_ms']:>6.0f}ms {datos['p99_ms']:>6.0f}ms "
+              f"{datos['max_ms']:>6.0f}ms  {datos['errores'] or ''}")
+    for error in resultado['errores'][:5]:
+        print(f"   ⚠ sesión {error['sesion']} · {error['opcion']}: {error['error']}")
+    if len(resultado['errores']) > 5:
+        print(f"   ⚠ ... y {len(resultado['errores']) - 5} error(es) más")
+
+def imprimir_resumen(resultados):
+    print("\n📈 Escalamiento")
+    print(f"   {'Sesiones':>8} {'recargas/s':>11} {'p50':>8} {'p90':>8} {'p99':>8} {'pico MB':>8} {'errores':>8}")
+    for r in resultados:
+        latencia = r['latencia']
+        pico = r['memoria_mb']['pico']
+        print(f"   {r['sesiones']:>8} {r['recargas_por_s']:>11.2f} {latencia.get('p50_ms', 0):>6.0f}ms "
+              f"{latencia.get('p90_ms', 0):>6.0f}ms {latencia.get('p99_ms', 0):>6.0f}ms "
+              f"{pico if pico is not None else float('nan'):>8.0f} {len(r['errores']):>8}")
+
+# ==============================
+# 🚀 Ejecución
+# ==============================
+def preparar_libros(sesiones, filas, clientes, dias, mismo_libro=False):
+    """Un libro sintético por sesión (o uno solo para todas), generado una vez y reutilizado."""
+    carpeta = os.path.join(benchmark.carpeta_benchmarks(), "datos")
+    os.makedirs(carpeta, exist_ok=True)
+    libros = []
+    for i in range(1 if mismo_libro else sesiones):
+        path = os.path.join(carpeta, f"carga_{filas}_{clientes}_{dias}_{i + 1}.xlsx")
+        if not os.path.exists(path):
+            benchmark.generar_excel_sintetico(path, filas, clientes, dias, semilla=100 + i)
+        libros.append(path)
+    return libros * sesiones if mismo_libro else libros
+
+def ejecutar(niveles=SESIONES_DEFECTO, tamano=TAMANO_DEFECTO, rondas=1, pausa=0.0, mismo_libro=False, timeout=300):
+    verificar_streamlit()
+    filas, clientes, dias = tamano
+    print(f"⏳ Preparando libros sintéticos ({filas} filas, {clientes} clientes, {dias} días)...")
+    libros = preparar_libros(max(niveles), filas, clientes, dias, mismo_libro)
+
+    resultados = {
+        "version": benchmark.version_codigo(),
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "tamano": {"filas": filas, "clientes": clientes, "dias": dias},
+        "rondas": rondas,
+        "mismo_libro": mismo_libro,
+        "niveles": [],
+    }
+    # Los modelos que entrenan las sesiones no se mezclan con el registro real
+    carpeta_modelos = registro_modelos.CARPETA_MODELOS
+    registro_modelos.CARPETA_MODELOS = os.path.join(benchmark.carpeta_benchmarks(), "modelos_carga")
+    try:
+        with benchmark.clima_local(), runtime_compartido(), open(os.devnull, "w") as nulo, \
+                contextlib.redirect_stdout(nulo):
+            # Sesión de calentamiento: imports, compilación de Prophet y primeras figuras no cuentan
+            medir_concurrencia(libros[:1], 1, 0.0, timeout)
+        for sesiones in niveles:
+            print(f"⏱ {sesiones} sesión(es) simultánea(s)...")
+            benchmark.reiniciar_estado()
+            with benchmark.clima_local(), runtime_compartido(), open(os.devnull, "w") as nulo, \
+                    contextlib.redirect_stdout(nulo):
+                resultado = medir_concurrencia(libros[:sesiones], rondas, pausa, timeout)
+            imprimir_resultado(resultado)
+            resultados["niveles"].append(resultado)
+    finally:
+        registro_modelos.CARPETA_MODELOS = carpeta_modelos
+
+    imprimir_resumen(resultados["niveles"])
+    archivo = os.path.join(benchmark.carpeta_benchmarks(), f"carga_{timestamp()}_{resultados['version']}.json")
+    with open(archivo, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Resultados guardados: {archivo}")
+    return archivo
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga del dashboard con varias sesiones simultáneas (AppTest).")
+    parser.add_argument("--sesiones", type=int, nargs="+", default=SESIONES_DEFECTO,
+                        help="Niveles de concurrencia a medir. Ej: --sesiones 1 2 4 8")
+    parser.add_argument("--tamano", type=benchmark._parsear_tamano, default=TAMANO_DEFECTO,
+                        help="Libro de cada sesión como FILASxCLIENTESxDIAS. Ej: --tamano 20000x800x365")
+    parser.add_argument("--rondas", type=int, default=1, help="Veces que cada sesión recorre todas las opciones")
+    parser.add_argument("--pausa", type=float, default=0.0, help="Segundos entre recargas de una sesión (tiempo de lectura)")
+    parser.add_argument("--mismo-libro", action="store_true", help="Todas las sesiones suben el mismo libro")
+    parser.add_argument("--timeout", type=int, default=300, help="Segundos máximos por recarga")
+    args = parser.parse_args()
+    ejecutar(sorted(set(args.sesiones)), args.tamano, args.rondas, args.pausa, args.mismo_libro, args.timeout)
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+VENTANAS = (7, 30, 90)
+METRICAS = ('total', 'descuento', 'cantidad')
+
+# Restos de sumar y restar flotantes por debajo de esto se consideran cero
+TOLERANCIA = 1e-9
+
+# ==============================
+# 🏆 Selección parcial del top-k
+# ==============================
+def _seleccionar(valores, k):
+    """Índices de los k mayores valores, ordenados de mayor a menor, sin ordenar todo el arreglo."""
+    k = min(k, len(valores))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    idx = np.argpartition(-valores, k - 1)[:k]
+    return idx[np.argsort(-valores[idx], kind='stable')]
+
+def top_clientes(df, columnas=METRICAS, k=10):
+    """Top-k clientes por cada columna con una sola agrupación.
+
+    Devuelve {columna: DataFrame indexado por cliente con esa columna}, con el
+    mismo formato que `sort_values(...).head(k)`.
+    """
+    agrupado = df.groupby('cliente')[list(columnas)].sum()
+    clientes = agrupado.index.to_numpy()
+    tops = {}
+    for columna in columnas:
+        valores = agrupado[columna].to_numpy(dtype='float64')
+        idx = _seleccionar(valores, k)
+        tops[columna] = pd.DataFrame({columna: agrupado[columna].to_numpy()[idx]},
+                                     index=pd.Index(clientes[idx], name='cliente'))
+    return tops
+
+# ==============================
+# 📅 Ranking sobre ventanas móviles
+# ==============================
+class RankingClientes:
+    """Totales por cliente en ventanas móviles (últimos N días) actualizados de forma incremental.
+
+    Para cada ventana se mantienen dos acumuladores: el periodo actual
+    (fin - N, fin] y el anterior (fin - 2N, fin - N], de modo que avanzar un día
+    solo suma y resta las operaciones de los días que entran y salen.
+    """
+
+    def __init__(self, ventanas=VENTANAS):
+        self.ventanas = tuple(sorted(ventanas))
+        self.clientes = []
+        self._posicion = {}
+        self._dias = {}  # fecha -> (índices de cliente, matriz de valores)
+        self.fin = None
+        capacidad = 64
+        self._actual = {v: np.zeros((capacidad, len(METRICAS))) for v in self.ventanas}
+        self._anterior = {v: np.zeros((capacidad, len(METRICAS))) for v in self.ventanas}
+
+    # ----- Estado interno -----
+    def _indices(self, clientes):
+        nuevos = [c for c in pd.unique(clientes) if c not in self._posicion]
+        for cliente in nuevos:
+            self._posicion[cliente] = len(self.clientes)
+            self.clientes.append(cliente)
+        capacidad = next(iter(self._actual.values())).shape[0]
+        if len(self.clientes) > capacidad:
+            nueva = max(len(self.clientes), capacidad * 2)
+            for acumuladores in (self._actual, self._anterior):
+                for v, matriz in acumuladores.items():
+                    ampliada = np.zeros((nueva, len(METRICAS)))
+                    ampliada[:capacidad] = matriz
+                    acumuladores[v] = ampliada
+        return np.fromiter((self._posicion[c] for c in clientes), dtype=np.int64, count=len(clientes))
+
+    def _aplicar(self, acumulador, fecha, signo):
+        dia = self._dias.get(fecha)
+        if dia is not None:
+            idx, valores = dia
+            np.add.at(acumulador, idx, signo * valores)
+
+    def _avanzar_un_dia(self, fecha):
+        for v in self.ventanas:
+            self._aplicar(self._actual[v], fecha, 1)
+            sale = fecha - pd.Timedelta(days=v)
+            self._aplicar(self._actual[v], sale, -1)
+            self._aplicar(self._anterior[v], sale, 1)
+            self._aplicar(self._anterior[v], fecha - pd.Timedelta(days=2 * v), -1)
+        self.fin = fecha
+        # Ya ningún acumulador necesitará los días más antiguos que la ventana mayor
+        limite = fecha - pd.Timedelta(days=2 * self.ventanas[-1])
+        for antigua in [f for f in self._dias if f <= limite]:
+            del self._dias[antigua]
+
+    # ----- Carga y actualización -----
+    def agregar_dia(self, fecha, operaciones):
+        """Incorpora las operaciones de un día y desplaza las ventanas hasta esa fecha.
+
+        `operaciones` puede traer operaciones sueltas (columna cliente + métricas)
+        o agregados por cliente; las fechas deben llegar en orden.
+        """
+        fecha = pd.Timestamp(fecha).normalize()
+        if self.fin is not None and fecha <= self.fin:
+            raise ValueError(f"La fecha {fecha.date()} no es posterior al último día cargado ({self.fin.date()}).")
+
+        if operaciones is not None and len(operaciones):
+            agrupado = operaciones.groupby('cliente')[list(METRICAS)].sum()
+            idx = self._indices(agrupado.index.to_numpy())
+            self._dias[fecha] = (idx, agrupado.to_numpy(dtype='float64', na_value=0.0))
+
+        dia = fecha if self.fin is None else self.fin + pd.Timedelta(days=1)
+        while dia <= fecha:
+            self._avanzar_un_dia(dia)
+            dia += pd.Timedelta(days=1)
+
+    def cargar(self, df):
+        """Carga un conjunto de operaciones (o agregados por fecha y cliente) día a día."""
+        df = df.reset_index() if 'fecha' not in df.columns else df
+        for fecha, operaciones in df.groupby(df['fecha'].dt.normalize(), sort=True):
+            self.agregar_dia(fecha, operaciones)
+        return self
+
+    # ----- Consultas -----
+    def _valores(self, acumulador, ventana, metrica):
+        return acumulador[ventana][:len(self.clientes), METRICAS.index(metrica)]
+
+    def top(self, ventana, metrica='total', k=10):
+        """Top-k clientes de los últimos `ventana` días por `metrica`."""
+        valores = self._valores(self._actual, ventana, metrica)
+        idx = _seleccionar(np.where(valores > TOLERANCIA, valores, -np.inf), k)
+        idx = idx[valores[idx] > TOLERANCIA]
+        return pd.DataFrame({
+            'puesto': np.arange(1, len(idx) + 1),
+            'cliente': [self.clientes[i] for i in idx],
+            metrica: valores[idx],
+        })
+
+    def movimientos(self, ventana, metrica='total', k=10):
+        """Top-k actual con su puesto en el periodo anterior de igual duración.
+
+        `cambio` positivo indica que el cliente subió posiciones; NaN en
+        `puesto_anterior` marca a los que no compraron en el periodo anterior.
+        """
+        actual = self.top(ventana, metrica, k)
+        anteriores = self._valores(self._anterior, ventana, metrica)
+        idx = np.fromiter((self._posicion[c] for c in actual['cliente']), dtype=np.int64, count=len(actual))
+        # Puesto = clientes con valor estrictamente mayor + 1 (sin ordenar el periodo anterior)
+        puestos = (anteriores[None, :] > anteriores[idx][:, None]).sum(axis=1) + 1 if len(idx) else np.array([])
+        actual['puesto_anterior'] = np.where(anteriores[idx] > TOLERANCIA, puestos, np.nan)
+        actual['cambio'] = actual['puesto_anterior'] - actual['puesto']
+        return actual
@@ -0,0 +1,171 @@
+import datetime
+import inspect
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+import prophet
+from prophet import Prophet
+from prophet.serialize import model_to_json, model_from_json
+
+CARPETA_MODELOS = os.path.join("datos", "modelos")
+
+# Días nuevos a partir de los cuales se reentrena desde cero aunque el resto no cambie
+MAX_DIAS_NUEVOS = 14
+MAX_PROPORCION_NUEVA = 0.10
+
+def _carpeta(tienda):
+    carpeta = os.path.join(CARPETA_MODELOS, tienda)
+    if not os.path.exists(carpeta):
+        os.makedirs(carpeta)
+    return carpeta
+
+# ==============================
+# 🔖 Versión de los datos
+# ==============================
+def version_datos(df):
+    """Huella de la serie de ventas (ds, y) con la que se ajusta el modelo."""
+    base = df[['ds', 'y']].sort_values('ds').reset_index(drop=True)
+    return format(int(pd.util.hash_pandas_object(base, index=False).sum()) & (2**64 - 1), "016x")
+
+def parametros_iniciales(modelo):
+    """Parámetros ajustados de un modelo Prophet en el formato `init` de Stan."""
+    return {
+        'k': float(modelo.params['k'][0][0]),
+        'm': float(modelo.params['m'][0][0]),
+        'sigma_obs': float(modelo.params['sigma_obs'][0][0]),
+        'delta': [float(x) for x in modelo.params['delta'][0]],
+        'beta': [float(x) for x in modelo.params['beta'][0]],
+    }
+
+def escalas(modelo):
+    """Escalas con las que Prophet normalizó y, el tiempo y los regresores en el ajuste de `modelo`."""
+    return {
+        'y_scale': float(modelo.y_scale),
+        'y_min': float(modelo.y_min),
+        't_scale_dias': modelo.t_scale / pd.Timedelta(days=1),
+        'regresores': {nombre: [float(props['mu']), float(props['std'])]
+                       for nombre, props in modelo.extra_regressors.items()},
+    }
+
+# fijar_escalas envuelve Prophet.initialize_scales(initialize_scales, df), un método interno:
+# si otra versión de Prophet cambia su firma, el arranque en caliente pasa a ajuste en frío
+FIRMA_INITIALIZE_SCALES = ['self', 'initialize_scales', 'df']
+
+def escalas_fijables():
+    """True si el Prophet instalado tiene el initialize_scales que `fijar_escalas` sabe envolver."""
+    try:
+        return list(inspect.signature(Prophet.initialize_scales).parameters) == FIRMA_INITIALIZE_SCALES
+    except (AttributeError, TypeError, ValueError):
+        return False
+
+def escalas_respetadas(modelo, escalas_fijadas):
+    """True si el ajuste de `modelo` usó de verdad las escalas fijadas (comprobación después del fit)."""
+    actuales = escalas(modelo)
+    planas = lambda e: [e['y_scale'], e['y_min'], e['t_scale_dias']] + [v for n in sorted(e['regresores']) for v in e['regresores'][n]]
+    return (set(actuales['regresores']) == set(escalas_fijadas['regresores'])
+            and np.allclose(planas(actuales), planas(escalas_fijadas), rtol=1e-9, atol=0))
+
+def fijar_escalas(modelo, escalas):
+    """Hace que `modelo` (sin ajustar) normalice con las `escalas` de un ajuste anterior.
+
+    Prophet recalcula las escalas con cada `fit`: con un día nuevo cambian el máximo
+    de y, la duración de la serie y la media de los regresores, y los parámetros
+    anteriores dejan de estar en las mismas unidades. Con las escalas fijas (y los
+    mismos changepoints) el punto de partida de Stan es el óptimo anterior.
+    """
+    calcular = modelo.initialize_scales
+
+    def initialize_scales(initialize_scales, df):
+        calcular(initialize_scales, df)
+        if initialize_scales:
+            modelo.y_scale = escalas['y_scale']
+            modelo.y_min = escalas['y_min']
+            modelo.t_scale = pd.Timedelta(days=escalas['t_scale_dias'])
+            for nombre, (mu, std) in escalas['regresores'].items():
+                if nombre in modelo.extra_regressors:
+                    modelo.extra_regressors[nombre].update(mu=mu, std=std)
+
+    modelo.initialize_scales = initialize_scales
+    return modelo
+
+def parametros_stan(init):
+    """`init` guardado en el registro (listas) en el formato que recibe Stan."""
+    return {**init, 'delta': np.array(init['delta']), 'beta': np.array(init['beta'])}
+
+# ==============================
+# 💾 Registro: modelo + versión de datos + parámetros
+# ==============================
+def cargar_meta(tienda):
+    """Metadatos del último ajuste (versión de datos y parámetros), sin deserializar el modelo."""
+    archivo_meta = os.path.join(CARPETA_MODELOS, tienda, "meta.json")
+    if not os.path.exists(archivo_meta):
+        return None
+    with open(archivo_meta, encoding="utf-8") as f:
+        return json.load(f)
+
+def cargar(tienda):
+    """Devuelve (modelo, metadatos) del último ajuste registrado, o (None, None)."""
+    carpeta = os.path.join(CARPETA_MODELOS, tienda)
+    archivo_modelo = os.path.join(carpeta, "modelo.json")
+    archivo_meta = os.path.join(carpeta, "meta.json")
+    if not (os.path.exists(archivo_modelo) and os.path.exists(archivo_meta)):
+        return None, None
+    with open(archivo_modelo, encoding="utf-8") as f:
+        modelo = model_from_json(f.read())
+    with open(archivo_meta, encoding="utf-8") as f:
+        meta = json.load(f)
+    return modelo, meta
+
+def guardar(tienda, modelo, df, configuracion, modo, segundos):
+    carpeta = _carpeta(tienda)
+    meta = {
+        'tienda': tienda,
+        'version_datos': version_datos(df),
+        'filas': len(df),
+        'desde': str(df['ds'].min().date()),
+        'hasta': str(df['ds'].max().date()),
+        'configuracion': configuracion,
+        'parametros': parametros_iniciales(modelo),
+        'changepoints': [str(c.date()) for c in modelo.changepoints],
+        'escalas': escalas(modelo),
+        'modo': modo,
+        'segundos_ajuste': round(segundos, 3),
+        'entrenado': datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+    # El modelo se escribe primero: meta.json solo apunta a un modelo completo
+    for nombre, contenido in (("modelo.json", model_to_json(modelo)), ("meta.json", json.dumps(meta, indent=2))):
+        archivo = os.path.join(carpeta, nombre)
+        # Temporal propio de cada hilo: varias sesiones del dashboard pueden guardar a la vez
+        temporal = f"{archivo}.tmp{os.getpid()}-{threading.get_ident()}"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(contenido)
+        os.replace(temporal, archivo)
+    return meta
+
+# ==============================
+# 🔀 ¿Arranque en caliente o reentrenamiento completo?
+# ==============================
+def decidir_modo(meta, df, configuracion):
+    """Devuelve ('tibio' | 'frio', motivo) comparando los datos nuevos con los del último ajuste."""
+    if meta is None:
+        return 'frio', "no hay un modelo registrado"
+    if meta.get('configuracion') != configuracion:
+        return 'frio', "cambió la configuración del modelo"
+    if 'escalas' not in meta:
+        return 'frio', "el modelo registrado no guardó sus escalas"
+    if not escalas_fijables():
+        return 'frio', f"Prophet {prophet.__version__} no permite fijar las escalas del ajuste anterior"
+
+    hasta = pd.Timestamp(meta['hasta'])
+    previos = df[df['ds'] <= hasta]
+    if len(previos) != meta['filas'] or version_datos(previos) != meta['version_datos']:
+        return 'frio', "cambiaron datos ya entrenados"
+
+    nuevos = len(df) - len(previos)
+    if nuevos == 0:
+        return 'tibio', "sin días nuevos"
+    if nuevos > max(MAX_DIAS_NUEVOS, MAX_PROPORCION_NUEVA * meta['filas']):
+        return 'frio', f"{nuevos} días nuevos superan el umbral incremental"
+    return 'tibio', f"{nuevos} día(s) nuevo(s)"
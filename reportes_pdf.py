@@ -0,0 +1,150 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+from PIL import Image
+
+from utilidades import crear_carpeta_reportes
+
+# ==============================
+# ⚙️ Perfiles de salida de los gráficos
+# ==============================
+# "vectorial" incrusta los gráficos como SVG (nítidos a cualquier zoom); los
+# perfiles raster dibujan a `dpi` y reescalan la imagen al ancho impreso.
+PERFILES_PDF = {
+    "compacto": {"modo": "raster", "dpi": 110, "formato": "PNG", "colores": 256},
+    "alta": {"modo": "raster", "dpi": 200, "formato": "PNG"},
+    "fotografico": {"modo": "raster", "dpi": 150, "formato": "JPEG", "calidad": 80},
+    "vectorial": {"modo": "vector"},
+}
+PERFIL_PDF = "compacto"
+
+# Tamaño máximo de la caché de gráficos; al superarlo se borran los más antiguos
+MAX_CACHE_MB = 100
+
+# fpdf2 avisa por cada etiqueta <metadata> que matplotlib escribe en los SVG
+logging.getLogger("fpdf.svg").setLevel(logging.ERROR)
+
+# Tamaño y tiempo de cada PDF generado en esta sesión: {ruta: {...}}
+INFORMES = {}
+
+try:
+    with open("config.json") as f:
+        _config_pdf = json.load(f).get("pdf", {})
+except (FileNotFoundError, json.JSONDecodeError):
+    _config_pdf = {}
+
+def ajustes_pdf(perfil=None):
+    """Ajustes de un perfil; sin perfil, el de config.json ("pdf") con sus valores sobrescritos."""
+    if perfil is None:
+        perfil = _config_pdf.get("perfil", PERFIL_PDF)
+        extra = {k: v for k, v in _config_pdf.items() if k != "perfil"}
+    else:
+        extra = {}
+    if perfil not in PERFILES_PDF:
+        raise ValueError(f"Perfil de PDF desconocido: '{perfil}'. Opciones: {', '.join(PERFILES_PDF)}")
+    return {"perfil": perfil, **PERFILES_PDF[perfil], **extra}
+
+def _carpeta_cache():
+    carpeta = os.path.join(crear_carpeta_reportes(), "cache_pdf")
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+def huella(*partes):
+    """Hash del contenido de DataFrames, Series, bytes, listas de ellos u otros valores simples."""
+    h = hashlib.sha1()
+    for parte in partes:
+        if isinstance(parte, (list, tuple)):
+            h.update(huella(*parte).encode())
+        elif isinstance(parte, (pd.DataFrame, pd.Series)):
+            h.update(repr(list(parte.columns) if isinstance(parte, pd.DataFrame) else parte.name).encode())
+            h.update(pd.util.hash_pandas_object(parte).to_numpy().tobytes())
+        elif isinstance(parte, bytes):
+            h.update(parte)
+        else:
+            h.update(repr(parte).encode())
+    return h.hexdigest()[:16]
+
+# ==============================
+# 🖼️ Gráficos e imágenes reutilizables
+# ==============================
+def grafico_cacheado(nombre, datos, dibujar, ajustes):
+    """Ruta del gráfico `nombre` para `datos`; `dibujar(archivo, dpi)` solo se llama si no existe ya.
+
+    Los informes generados con los mismos datos reutilizan el mismo archivo en lugar
+    de volver a dibujar el gráfico con matplotlib.
+    """
+    extension = "svg" if ajustes["modo"] == "vector" else "png"
+    dpi = ajustes.get("dpi", 150)
+    archivo = os.path.join(_carpeta_cache(), f"{nombre}_{huella(datos, dpi)}.{extension}")
+    if not os.path.exists(archivo):
+        # Se escribe aparte y se renombra: otra sesión puede estar leyendo el mismo gráfico
+        temporal = f"{archivo[:-len(extension) - 1]}.tmp{os.getpid()}-{threading.get_ident()}.{extension}"
+        dibujar(temporal, dpi)
+        os.replace(temporal, archivo)
+    return archivo
+
+def imagen_comprimida(archivo, ajustes, ancho_mm=180):
+    """Versión reducida al ancho impreso y comprimida de una imagen raster (cacheada por contenido)."""
+    with open(archivo, "rb") as f:
+        contenido = f.read()
+    formato = ajustes.get("formato", "PNG").upper()
+    dpi = ajustes.get("dpi", 150)
+    extension = "jpg" if formato == "JPEG" else "png"
+    destino = os.path.join(_carpeta_cache(), f"img_{huella(contenido, dpi, formato, ajustes.get('calidad'), ajustes.get('colores'), ancho_mm)}.{extension}")
+    if os.path.exists(destino):
+        return destino
+
+    with Image.open(io.BytesIO(contenido)) as original:
+        imagen = original.convert("RGB")
+    ancho_px = round(ancho_mm / 25.4 * dpi)
+    if imagen.width > ancho_px:
+        imagen = imagen.resize((ancho_px, round(imagen.height * ancho_px / imagen.width)), Image.LANCZOS)
+    temporal = f"{destino}.tmp{os.getpid()}-{threading.get_ident()}"
+    if formato == "JPEG":
+        imagen.save(temporal, "JPEG", quality=ajustes.get("calidad", 80), optimize=True)
+    else:
+        if ajustes.get("colores"):
+            # Los gráficos usan pocos colores: una paleta reduce mucho el PNG
+            imagen = imagen.quantize(ajustes["colores"])
+        imagen.save(temporal, "PNG", optimize=True)
+    os.replace(temporal, destino)
+    return destino
+
+def podar_cache(max_mb=MAX_CACHE_MB):
+    """Borra los archivos más antiguos de la caché hasta dejarla por debajo de `max_mb`."""
+    carpeta = _carpeta_cache()
+    archivos = sorted((os.path.join(carpeta, a) for a in os.listdir(carpeta)), key=os.path.getmtime)
+    total = sum(os.path.getsize(a) for a in archivos)
+    for archivo in archivos:
+        if total <= max_mb * 1024 * 1024:
+            break
+        total -= os.path.getsize(archivo)
+        os.remove(archivo)
+
+def insertar_imagen(pdf, archivo, ajustes, x=10, w=180):
+    """Agrega un gráfico al PDF según el perfil. La misma imagen se incrusta una sola vez por documento."""
+    if not archivo.endswith(".svg"):
+        archivo = imagen_comprimida(archivo, ajustes, w)
+    pdf.image(archivo, x=x, w=w)
+
+# ==============================
+# 📏 Tamaño y tiempo de generación
+# ==============================
+def registrar_informe(archivo, inicio, ajustes):
+    """Imprime y guarda el tamaño y el tiempo de generación de un PDF ya escrito."""
+    datos = {
+        'archivo': archivo,
+        'perfil': ajustes['perfil'],
+        'kb': round(os.path.getsize(archivo) / 1024, 1),
+        'segundos': round(time.perf_counter() - inicio, 2),
+    }
+    INFORMES[archivo] = datos
+    podar_cache()
+    print(f"📏 {os.path.basename(archivo)}: {datos['kb']:.1f} KB en {datos['segundos']:.2f} s (perfil {datos['perfil']})")
+    return datos
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+# Número de niveles de cada puntaje (quintiles: 1 = peor, 5 = mejor)
+NIVELES = 5
+
+# Segmentos en orden de prioridad: un cliente queda en el primero cuya condición cumple.
+# Cada condición recibe los puntajes R, F y M y la frecuencia real como arreglos. "Nuevos"
+# usa la frecuencia real: con muchos clientes de una sola compra los empates suben su
+# puntaje F por encima de 1. Los que no cumplen ninguna (recientes o medios con monto
+# bajo) quedan en SIN_SEGMENTO.
+SEGMENTOS = [
+    ("Campeones", lambda r, f, m, n: (r >= 4) & (f >= 4) & (m >= 4)),
+    ("Leales", lambda r, f, m, n: (r >= 3) & (f >= 4)),
+    ("No se pueden perder", lambda r, f, m, n: (r <= 2) & (f >= 4) & (m >= 4)),
+    ("En riesgo", lambda r, f, m, n: (r <= 2) & (f >= 3)),
+    ("Nuevos", lambda r, f, m, n: (r >= 4) & (n == 1)),
+    ("Potenciales", lambda r, f, m, n: (r >= 3) & (f <= 3) & (m >= 3)),
+    ("Hibernando", lambda r, f, m, n: (r <= 2) & (f <= 2)),
+]
+SIN_SEGMENTO = "Requieren atención"
+ORDEN_SEGMENTOS = [nombre for nombre, _ in SEGMENTOS] + [SIN_SEGMENTO]
+
+# ==============================
+# 🎯 Puntajes por cuantiles
+# ==============================
+def _puntaje(valores, niveles=NIVELES):
+    """Nivel 1..niveles según el percentil de cada valor; valores iguales reciben el mismo nivel."""
+    if len(valores) == 0:
+        return np.array([], dtype=np.int8)
+    percentil = pd.Series(valores).rank(method='average', pct=True).to_numpy()
+    return np.clip(np.ceil(percentil * niveles), 1, niveles).astype(np.int8)
+
+def calcular_rfm(df, fecha_referencia=None, niveles=NIVELES):
+    """Recencia, frecuencia y monto por cliente con su puntaje RFM y segmento.
+
+    Recencia = días desde la última compra hasta `fecha_referencia` (por defecto
+    el último día de `df`), frecuencia = número de operaciones y monto = suma de
+    `total`. Devuelve un DataFrame indexado por cliente, de mayor a menor monto.
+    """
+    columnas = ['ultima_compra', 'recencia', 'frecuencia', 'monto', 'descuento', 'R', 'F', 'M', 'rfm', 'segmento']
+    if df is None or df.empty:
+        return pd.DataFrame(columns=columnas).rename_axis('cliente')
+
+    # Una sola agrupación para las cuatro métricas
+    agrupado = df.groupby('cliente', sort=False).agg(
+        ultima_compra=('fecha', 'max'), frecuencia=('total', 'size'),
+        monto=('total', 'sum'), descuento=('descuento', 'sum'))
+
+    if fecha_referencia is None:
+        fecha_referencia = df['fecha'].max()
+    fecha_referencia = pd.Timestamp(fecha_referencia).normalize()
+    recencia = (fecha_referencia - agrupado['ultima_compra'].dt.normalize()).dt.days.to_numpy()
+
+    r = _puntaje(-recencia, niveles)  # Menos días desde la última compra = mejor
+    f = _puntaje(agrupado['frecuencia'].to_numpy(), niveles)
+    m = _puntaje(agrupado['monto'].to_numpy(dtype='float64'), niveles)
+
+    frecuencia = agrupado['frecuencia'].to_numpy()
+    condiciones = [condicion(r, f, m, frecuencia) for _, condicion in SEGMENTOS]
+    segmento = np.select(condiciones, [nombre for nombre, _ in SEGMENTOS], default=SIN_SEGMENTO)
+
+    rfm = agrupado.assign(
+        recencia=recencia, R=r, F=f, M=m,
+        rfm=r.astype(np.int16) * 100 + f.astype(np.int16) * 10 + m,
+        segmento=pd.Categorical(segmento, categories=ORDEN_SEGMENTOS),
+    )[columnas]
+    return rfm.sort_values('monto', ascending=False)
+
+# ==============================
+# 📋 Resumen por segmento
+# ==============================
+def resumen_segmentos(rfm):
+    """Clientes, ventas y promedios RFM de cada segmento, en orden de prioridad."""
+    resumen = rfm.groupby('segmento', observed=False).agg(
+        clientes=('monto', 'size'), ventas=('monto', 'sum'), descuento=('descuento', 'sum'),
+        recencia_media=('recencia', 'mean'), frecuencia_media=('frecuencia', 'mean'), monto_medio=('monto', 'mean'))
+    total_clientes = resumen['clientes'].sum()
+    total_ventas = resumen['ventas'].sum()
+    resumen.insert(1, 'pct_clientes', resumen['clientes'] / total_clientes * 100 if total_clientes else 0.0)
+    resumen.insert(3, 'pct_ventas', resumen['ventas'] / total_ventas * 100 if total_ventas else 0.0)
+    return resumen[resumen['clientes'] > 0]
@@ -0,0 +1,177 @@
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+CARPETA_DATOS = "datos"
+ARCHIVO_DB = os.path.join(CARPETA_DATOS, "pronosticos.sqlite")
+PUERTO = 8502
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS pronosticos (
+    tienda TEXT NOT NULL,
+    ds TEXT NOT NULL,
+    yhat REAL NOT NULL,
+    yhat_lower REAL NOT NULL,
+    yhat_upper REAL NOT NULL,
+    PRIMARY KEY (tienda, ds)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versiones (
+    tienda TEXT PRIMARY KEY,
+    generado TEXT NOT NULL,
+    desde TEXT NOT NULL,
+    hasta TEXT NOT NULL,
+    filas INTEGER NOT NULL
+);
+"""
+
+# ==============================
+# 💾 Escritura (la hace entrenar_modelo)
+# ==============================
+def guardar_pronostico(forecast, tienda, archivo_db=ARCHIVO_DB):
+    """Reemplaza el pronóstico publicado de `tienda` por el frame `forecast` de Prophet."""
+    carpeta = os.path.dirname(archivo_db)
+    if carpeta and not os.path.exists(carpeta):
+        os.makedirs(carpeta)
+
+    filas = [
+        (tienda, ds.strftime("%Y-%m-%d"), float(yhat), float(inferior), float(superior))
+        for ds, yhat, inferior, superior in forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].itertuples(index=False)
+    ]
+    con = sqlite3.connect(archivo_db)
+    try:
+        con.executescript(ESQUEMA)
+        with con:
+            con.execute("DELETE FROM pronosticos WHERE tienda = ?", (tienda,))
+            con.executemany("INSERT INTO pronosticos VALUES (?, ?, ?, ?, ?)", filas)
+            con.execute("INSERT OR REPLACE INTO versiones VALUES (?, ?, ?, ?, ?)",
+                        (tienda, datetime.datetime.now().isoformat(timespec="seconds"),
+                         filas[0][1], filas[-1][1], len(filas)))
+    finally:
+        con.close()
+    return len(filas)
+
+# ==============================
+# 🔎 Consultas (solo lectura)
+# ==============================
+class ConsultaPronosticos:
+    """Consultas puntuales y por rango sobre la tabla indexada.
+
+    Todos los hilos del servidor comparten una sola conexión de solo lectura,
+    serializada con un lock (cada consulta tarda microsegundos); `cerrar` la
+    libera al detener el servicio.
+    """
+
+    def __init__(self, archivo_db=ARCHIVO_DB):
+        self.archivo_db = archivo_db
+        self._con = None
+        self._lock = threading.Lock()
+
+    def _consultar(self, sql, parametros=()):
+        with self._lock:
+            if self._con is None:
+                con = sqlite3.connect(f"file:{self.archivo_db}?mode=ro", uri=True, check_same_thread=False)
+                con.row_factory = sqlite3.Row
+                self._con = con
+            return [dict(f) for f in self._con.execute(sql, parametros).fetchall()]
+
+    def punto(self, tienda, fecha):
+        filas = self._consultar(
+            "SELECT ds, yhat, yhat_lower, yhat_upper FROM pronosticos WHERE tienda = ? AND ds = ?",
+            (tienda, _normalizar_fecha(fecha)))
+        return filas[0] if filas else None
+
+    def rango(self, tienda, desde, hasta):
+        return self._consultar(
+            "SELECT ds, yhat, yhat_lower, yhat_upper FROM pronosticos WHERE tienda = ? AND ds BETWEEN ? AND ? ORDER BY ds",
+            (tienda, _normalizar_fecha(desde), _normalizar_fecha(hasta)))
+
+    def tiendas(self):
+        return self._consultar("SELECT tienda, generado, desde, hasta, filas FROM versiones ORDER BY tienda")
+
+    def cerrar(self):
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+
+def _normalizar_fecha(fecha):
+    if isinstance(fecha, (datetime.date, datetime.datetime)):
+        return fecha.strftime("%Y-%m-%d")
+    return datetime.date.fromisoformat(str(fecha)[:10]).isoformat()
+
+# ==============================
+# 🌐 Endpoint HTTP/JSON
+# ==============================
+class ManejadorPronosticos(BaseHTTPRequestHandler):
+    """GET /pronostico?tienda=X&fecha=D  |  GET /pronostico?tienda=X&desde=D1&hasta=D2  |  GET /tiendas"""
+
+    def _responder(self, codigo, cuerpo):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parametros = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            if url.path == "/tiendas":
+                return self._responder(200, self.server.consultas.tiendas())
+            if url.path != "/pronostico":
+                return self._responder(404, {"error": "Ruta no encontrada"})
+            if "tienda" not in parametros:
+                return self._responder(400, {"error": "Falta el parámetro 'tienda'"})
+
+            tienda = parametros["tienda"]
+            if "fecha" in parametros:
+                fila = self.server.consultas.punto(tienda, parametros["fecha"])
+                if fila is None:
+                    return self._responder(404, {"error": f"Sin pronóstico para {tienda} en {parametros['fecha']}"})
+                return self._responder(200, {"tienda": tienda, **fila})
+            if "desde" in parametros and "hasta" in parametros:
+                filas = self.server.consultas.rango(tienda, parametros["desde"], parametros["hasta"])
+                return self._responder(200, {"tienda": tienda, "pronosticos": filas})
+            return self._responder(400, {"error": "Indica 'fecha' o 'desde' y 'hasta'"})
+        except ValueError as e:
+            return self._responder(400, {"error": f"Fecha inválida: {e}"})
+        except sqlite3.Error as e:
+            return self._responder(503, {"error": f"Pronósticos no disponibles: {e}"})
+
+    def log_message(self, formato, *args):
+        pass  # Sin log por petición: el servicio responde en microsegundos
+
+class ServidorPronosticos(ThreadingHTTPServer):
+    """Servidor HTTP con las consultas compartidas por sus hilos; las cierra junto con el socket."""
+
+    def __init__(self, direccion, archivo_db=ARCHIVO_DB):
+        self.consultas = ConsultaPronosticos(archivo_db)
+        super().__init__(direccion, ManejadorPronosticos)
+
+    def server_close(self):
+        super().server_close()
+        self.consultas.cerrar()
+
+def servir(puerto=PUERTO, host="127.0.0.1", archivo_db=ARCHIVO_DB):
+    servidor = ServidorPronosticos((host, puerto), archivo_db)
+    print(f"✅ Servicio de pronósticos en http://{host}:{puerto} (base: {archivo_db})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Deteniendo servicio...")
+    finally:
+        servidor.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consulta de pronósticos publicados por entrenar_modelo.")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--db", default=ARCHIVO_DB)
+    args = parser.parse_args()
+    servir(args.puerto, args.host, args.db)
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import openpyxl
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+CABECERA = ["Comprobante", "Cliente", "Descuento", "Productos", "Total", "Fecha Emisión"]
+
+@pytest.fixture(autouse=True)
+def carpeta_trabajo(tmp_path, monkeypatch):
+    """Cada prueba corre en su propia carpeta: reportes/, datos/ e historial/ no tocan el repo."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def escribir_libro(path, filas, preambulo=7, cabecera=CABECERA, hoja="Compras"):
+    """Libro "Compras" como el export del sistema: preámbulo, fila vacía, cabecera, operaciones y totales.
+
+    `filas` son tuplas (comprobante, cliente, descuento, productos, total, fecha).
+    """
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = hoja
+    for i in range(preambulo):
+        ws.append([f"Preámbulo {i}"])
+    ws.append([])
+    ws.append(list(cabecera))
+    for fila in filas:
+        ws.append(list(fila))
+    ws.append([None, "Totales", sum(f[2] for f in filas), None, sum(f[4] for f in filas), None])
+    wb.save(path)
+    return str(path)
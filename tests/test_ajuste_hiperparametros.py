@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import ajuste_hiperparametros
+import datos_compartidos
+
+class _Media:
+    """Modelo mínimo con la interfaz de Prophet usada en la validación: predice la media escalada."""
+
+    def __init__(self, configuracion):
+        self.escala = configuracion['changepoint_prior_scale']
+
+    def fit(self, df):
+        self.media = df['y'].mean() * (1 + self.escala)
+
+    def predict(self, df):
+        return pd.DataFrame({'yhat': np.full(len(df), self.media)})
+
+def _crear(configuracion):
+    return _Media(configuracion)
+
+def _ventas(dias=80):
+    ds = pd.date_range("2024-01-01", periods=dias, freq="D")
+    return pd.DataFrame({'ds': ds, 'y': 100 + 10 * np.sin(np.arange(dias) / 5), 'temp': np.linspace(25, 30, dias)})
+
+def test_procesos_abren_los_datos_publicados(tmp_path):
+    base = {'changepoint_prior_scale': 0.05, 'seasonality_prior_scale': 1.0, 'seasonality_mode': "additive",
+            'modo_regresores': "additive", 'daily_seasonality': False}
+    espacio = {'changepoint_prior_scale': [0.01, 0.5]}
+    _, en_serie = ajuste_hiperparametros.buscar(_ventas(), base, _crear, espacio=espacio, n=None, procesos=1,
+                                                carpeta=str(tmp_path / "serie"))
+    _, en_paralelo = ajuste_hiperparametros.buscar(_ventas(), base, _crear, espacio=espacio, n=None, procesos=2,
+                                                   carpeta=str(tmp_path / "paralelo"))
+
+    pd.testing.assert_frame_equal(en_serie.drop(columns='segundos'), en_paralelo.drop(columns='segundos'))
+    assert en_paralelo['error'].isna().all()
+    # El conjunto publicado para los procesos se borra al terminar la búsqueda
+    assert not os.path.exists(datos_compartidos.CARPETA_COMPARTIDOS) or not os.listdir(datos_compartidos.CARPETA_COMPARTIDOS)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+import anomalias_ventas
+
+def _serie(dias=60, picos=(40,), semilla=0):
+    rng = np.random.default_rng(semilla)
+    y = 1000 + rng.normal(0, 20, dias)
+    for p in picos:
+        y[p] = 3000
+    return pd.DataFrame({'ds': pd.date_range("2024-01-01", periods=dias, freq="D"), 'y': y})
+
+def _lineas(registro):
+    with open(registro, encoding="utf-8") as f:
+        return [l.rstrip("\n").split("\t") for l in f]
+
+def test_solo_se_puntuan_los_dias_nuevos():
+    serie = _serie()
+    detector = anomalias_ventas.actualizar_detector(None, serie.iloc[:50])
+    puntuados = detector.filas[:]
+    mismo = anomalias_ventas.actualizar_detector(detector, serie)
+    assert mismo is detector and len(mismo.filas) == 60
+    assert mismo.filas[:50] == puntuados
+    # Mismo resultado que puntuar todo de nuevo
+    pd.testing.assert_frame_equal(mismo.tabla(), anomalias_ventas.detectar_anomalias(serie).tabla())
+
+def test_datos_cambiados_vuelven_a_puntuar():
+    serie = _serie()
+    detector = anomalias_ventas.actualizar_detector(None, serie)
+    corregida = serie.copy()
+    corregida.loc[10, 'y'] += 500
+    assert anomalias_ventas.actualizar_detector(detector, corregida) is not detector
+    assert anomalias_ventas.actualizar_detector(detector, serie.iloc[5:]) is not detector
+    assert anomalias_ventas.actualizar_detector(detector, serie, umbral=5.0) is not detector
+
+def test_registro_por_conjunto(tmp_path):
+    registro = str(tmp_path / "anomalias.log")
+    serie = _serie(picos=(40,))
+    anomalias_ventas.detectar_anomalias(serie, registro=registro, conjunto="norte")
+    # Otra tienda con su anomalía en una fecha anterior también se anota
+    anomalias_ventas.detectar_anomalias(_serie(picos=(20,)), registro=registro, conjunto="sur")
+    assert [(l[1], l[2]) for l in _lineas(registro)] == [("norte", "2024-02-10"), ("sur", "2024-01-21")]
+    # Volver a puntuar no repite alertas
+    anomalias_ventas.detectar_anomalias(serie, registro=registro, conjunto="norte")
+    assert len(_lineas(registro)) == 2
+
+def test_activar_registro_despues(tmp_path):
+    registro = str(tmp_path / "anomalias.log")
+    serie = _serie(picos=(40,))
+    detector = anomalias_ventas.actualizar_detector(None, serie, conjunto="norte")
+    assert anomalias_ventas.actualizar_detector(detector, serie, registro=registro, conjunto="norte") is detector
+    assert [l[2] for l in _lineas(registro)] == ["2024-02-10"]
+
+def test_detector_persistente_por_conjunto():
+    anomalias_ventas._detectores.clear()
+    serie = _serie()
+    norte = anomalias_ventas.detector_para("norte", serie.iloc[:50])
+    sur = anomalias_ventas.detector_para("sur", serie.iloc[:30])
+    assert anomalias_ventas.detector_para("norte", serie) is norte and len(norte.filas) == 60
+    assert anomalias_ventas.detector_para("sur", serie.iloc[:30]) is sur and len(sur.filas) == 30
@@ -0,0 +1,76 @@
+import pandas as pd
+
+import carga_multiple
+from conftest import escribir_libro
+
+def _venta(numero, cliente, total, fecha, productos="Producto 001 - Cantidad: 2"):
+    return (numero, cliente, 0.0, productos, total, fecha)
+
+def test_origen_por_nombre():
+    assert carga_multiple.origen_archivo("norte_2024-03.xlsx") == "norte"
+    assert carga_multiple.origen_archivo("Norte marzo.xlsx") == "norte"
+    assert carga_multiple.origen_archivo("tienda-centro_abril2024.xlsx") == "tienda centro"
+    assert carga_multiple.origen_archivo("2024-03.xlsx") == ""
+
+def test_misma_venta_en_dos_tiendas_se_conserva(tmp_path):
+    # Ambas tiendas numeran desde F001-1: mismo comprobante, cliente, día e importe
+    norte = escribir_libro(tmp_path / "norte_2024-03.xlsx", [
+        _venta("F001-1", "Ana", 3.0, "2024-03-05 10:00:00"),
+        _venta("F001-2", "Luis", 8.0, "2024-03-06 11:00:00")])
+    sur = escribir_libro(tmp_path / "sur_2024-03.xlsx", [
+        _venta("F001-1", "Ana", 3.0, "2024-03-05 10:00:00")])
+
+    operaciones, informe = carga_multiple.cargar_varios([norte, sur], procesos=1)
+
+    assert len(operaciones) == 3
+    assert operaciones['total'].sum() == 14.0
+    assert informe['duplicadas'].sum() == 0
+    assert informe.set_index('archivo')['sospechosas'].to_dict() == {"norte_2024-03.xlsx": 0, "sur_2024-03.xlsx": 1}
+    # Tiendas distintas en el mismo mes no son exports solapados
+    assert carga_multiple._solapes(informe) == []
+
+def test_exports_solapados_de_la_misma_tienda(tmp_path):
+    primero = escribir_libro(tmp_path / "norte_2024-03-01.xlsx", [
+        _venta("F001-1", "Ana", 3.0, "2024-03-05 10:00:00"),
+        _venta("F001-2", "Luis", 8.0, "2024-03-06 11:00:00")])
+    segundo = escribir_libro(tmp_path / "norte_2024-03-06.xlsx", [
+        _venta("F001-2", "Luis", 8.0, "2024-03-06 11:00:00"),
+        _venta("F001-3", "Ana", 3.0, "2024-03-07 09:00:00")])
+
+    operaciones, informe = carga_multiple.cargar_varios([primero, segundo], procesos=1)
+
+    assert sorted(operaciones['comprobante']) == ["F001-1", "F001-2", "F001-3"]
+    assert informe.set_index('archivo')['duplicadas'].to_dict() == {"norte_2024-03-01.xlsx": 0, "norte_2024-03-06.xlsx": 1}
+    assert carga_multiple._solapes(informe) == [("norte_2024-03-01.xlsx", "norte_2024-03-06.xlsx")]
+
+def test_comprobante_repetido_en_un_mismo_archivo_se_conserva(tmp_path):
+    # Dentro de un libro no hay solape entre exports: la repetición se informa, no se borra
+    primero = escribir_libro(tmp_path / "norte_2024-03-01.xlsx", [
+        _venta("F001-1", "Ana", 3.0, "2024-03-05 10:00:00"),
+        _venta("F001-1", "Ana", 5.0, "2024-03-05 12:00:00")])
+    segundo = escribir_libro(tmp_path / "norte_2024-03-05.xlsx", [
+        _venta("F001-1", "Ana", 3.0, "2024-03-05 10:00:00")])
+
+    operaciones, informe = carga_multiple.cargar_varios([primero, segundo], procesos=1)
+
+    assert operaciones['total'].tolist() == [3.0, 5.0]
+    por_archivo = informe.set_index('archivo')
+    assert por_archivo['duplicadas'].to_dict() == {"norte_2024-03-01.xlsx": 0, "norte_2024-03-05.xlsx": 1}
+    assert por_archivo['sospechosas'].to_dict() == {"norte_2024-03-01.xlsx": 1, "norte_2024-03-05.xlsx": 0}
+
+def test_sin_comprobante_solo_se_informa(tmp_path):
+    cabecera = ["Cliente", "Descuento", "Productos", "Total", "Fecha Emisión"]
+    filas = [("Ana", 0.0, "Producto 001 - Cantidad: 2", 3.0, "2024-03-05 10:00:00")]
+    a = escribir_libro(tmp_path / "norte_marzo.xlsx", [("",) + f for f in filas], cabecera=["Comprobante"] + cabecera)
+    b = escribir_libro(tmp_path / "norte_abril.xlsx", [("",) + f for f in filas], cabecera=["Comprobante"] + cabecera)
+
+    operaciones, informe = carga_multiple.cargar_varios([a, b], procesos=1)
+
+    assert len(operaciones) == 2
+    assert informe['duplicadas'].sum() == 0
+    assert informe['sospechosas'].sum() == 1
+
+def test_fechas_en_dias(tmp_path):
+    libro = escribir_libro(tmp_path / "norte_2024-03.xlsx", [_venta("F001-1", "Ana", 3.0, "2024-03-05 10:00:00")])
+    operaciones, _ = carga_multiple.cargar_varios([libro], procesos=1)
+    assert operaciones['fecha'].iloc[0] == pd.Timestamp("2024-03-05 10:00:00")
@@ -0,0 +1,102 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import climatologia
+
+def _historico(anios=4):
+    ds = pd.date_range("2019-01-01", f"{2019 + anios - 1}-12-31", freq="D")
+    dia = climatologia.dia_del_anio(ds)
+    # Temperatura fija por día del año y lluvia solo en el primer trimestre
+    return pd.DataFrame({'ds': ds, 'temp': 20 + 10 * np.sin(2 * np.pi * dia / 365),
+                         'lluvia': np.where(dia <= 90, 5.0, 0.0)})
+
+def test_dia_del_anio_29_de_febrero():
+    dias = climatologia.dia_del_anio(["2024-02-28", "2024-02-29", "2024-03-01", "2023-03-01", "2024-12-31"])
+    assert list(dias) == [59, 59, 60, 60, 365]
+
+def test_construir_y_consultar():
+    historico = _historico()
+    tabla = climatologia.construir(historico)
+    assert list(tabla.index) == list(range(1, 366)) and list(tabla.columns) == climatologia.COLUMNAS[1:]
+    fechas = pd.to_datetime(["2030-01-15", "2030-06-30", "2028-02-29"])
+    tipico = climatologia.consultar(tabla, fechas)
+    esperado = historico.groupby(climatologia.dia_del_anio(historico['ds']))['temp'].mean()
+    # Media de ±7 días alrededor de cada día del año (la curva es casi lineal en 15 días)
+    for fecha, valor in zip(fechas, tipico['temp']):
+        dia = climatologia.dia_del_anio([fecha])[0]
+        assert valor == pytest.approx(esperado.loc[dia], abs=0.2)
+    assert tipico['lluvia'].tolist()[0] == 5.0 and tipico['lluvia'].tolist()[1] == 0.0
+    assert (tabla['temp_p10'] <= tabla['temp_p50']).all() and (tabla['temp_p50'] <= tabla['temp_p90']).all()
+
+def test_completar_solo_rellena_faltantes():
+    tabla = climatologia.construir(_historico())
+    conocido = pd.DataFrame({'ds': pd.date_range("2030-03-01", periods=5, freq="D"),
+                             'temp': [30.0, np.nan, 31.0, 32.0, 33.0], 'lluvia': [1.0, 2.0, np.nan, 0.0, 0.0]})
+    clima, completados = climatologia.completar(conocido, ["2030-03-01", "2030-03-10"], tabla)
+
+    assert completados == 7  # Dos días con NaN y cinco sin dato
+    assert clima['ds'].tolist() == list(pd.date_range("2030-03-01", "2030-03-10", freq="D"))
+    assert clima['temp'].iloc[[0, 2, 3, 4]].tolist() == [30.0, 31.0, 32.0, 33.0]
+    assert clima['lluvia'].iloc[1] == 2.0
+    tipico = climatologia.consultar(tabla, clima['ds'].iloc[5:])
+    np.testing.assert_allclose(clima['temp'].iloc[5:], tipico['temp'])
+    assert clima['temp'].iloc[1] == pytest.approx(climatologia.consultar(tabla, ["2030-03-02"])['temp'].iloc[0])
+    assert clima[['temp', 'lluvia']].notna().all().all()
+
+def test_historico_corto_sin_nan():
+    tabla = climatologia.construir(_historico().iloc[:40])
+    assert tabla.notna().all().all()
+
+@pytest.fixture
+def sin_tablas(monkeypatch):
+    monkeypatch.setattr(climatologia, "_tablas", {})
+    monkeypatch.setattr(climatologia, "_construyendo", {})
+    monkeypatch.setattr(climatologia, "_fallos", {})
+
+def test_preparar_descarga_en_segundo_plano(sin_tablas):
+    liberar = threading.Event()
+    llamadas = []
+
+    def descargar(inicio, fin):
+        llamadas.append((inicio, fin))
+        liberar.wait(5)
+        return _historico()
+
+    hilo = climatologia.preparar(1.0, 2.0, descargar)
+    # Mientras descarga no hay tabla, no se lanza otra descarga y otra ubicación no espera
+    assert climatologia.disponible(1.0, 2.0) is None
+    assert climatologia.preparar(1.0, 2.0, descargar) is hilo
+    assert climatologia.disponible(3.0, 4.0) is None
+    liberar.set()
+    hilo.join(5)
+
+    assert len(llamadas) == 1
+    assert climatologia.disponible(1.0, 2.0) is not None
+    assert climatologia.preparar(1.0, 2.0, descargar) is None  # Vigente: no vuelve a descargar
+
+def test_descarga_fallida_no_se_reintenta_enseguida(sin_tablas, monkeypatch):
+    llamadas = []
+
+    def descargar(inicio, fin):
+        llamadas.append(inicio)
+        raise ConnectionError("sin red")
+
+    assert climatologia.obtener(1.0, 2.0, descargar) is None
+    assert climatologia.obtener(1.0, 2.0, descargar) is None
+    assert len(llamadas) == 1
+
+    monkeypatch.setattr(climatologia, "REINTENTO_FALLO", 0)
+    assert climatologia.obtener(1.0, 2.0, descargar) is None
+    assert len(llamadas) == 2
+
+def test_tabla_vencida_se_sigue_usando_si_falla_la_renovacion(sin_tablas, monkeypatch):
+    assert climatologia.obtener(1.0, 2.0, lambda inicio, fin: _historico()) is not None
+    monkeypatch.setattr(climatologia, "VIGENCIA_DIAS", 0)
+
+    def sin_red(inicio, fin):
+        raise ConnectionError("sin red")
+
+    assert climatologia.obtener(1.0, 2.0, sin_red) is not None
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+import consultas_sql
+import informe_ventas
+import ranking_clientes
+
+def _ventas(semilla=0, n=2000):
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        'cliente': [f"Cliente {c:02d}" for c in rng.integers(0, 40, n)],
+        'fecha': pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 90 * 86400, n), unit='s'),
+        'total': rng.integers(1, 500, n) + 0.5,
+        'descuento': rng.integers(0, 20, n).astype('float64'),
+        'cantidad': rng.integers(1, 10, n),
+    })
+
+def test_resumen_igual_a_pandas():
+    df = _ventas()
+    resumen = consultas_sql.resumen(df)
+    assert resumen["Total ventas (S/.)"] == pytest.approx(df['total'].sum())
+    assert resumen["Total descuentos (S/.)"] == pytest.approx(df['descuento'].sum())
+    assert resumen["Total unidades vendidas"] == df['cantidad'].sum()
+    assert resumen["Total operaciones"] == len(df)
+
+def test_ventas_diarias_igual_a_pandas():
+    df = _ventas()
+    esperado = df.groupby(df['fecha'].dt.normalize())['total'].sum()
+    diarias = consultas_sql.ventas_diarias(df)
+    assert diarias['ds'].tolist() == esperado.index.tolist()
+    np.testing.assert_allclose(diarias['y'], esperado.to_numpy())
+
+def test_top_clientes_igual_a_pandas():
+    df = _ventas()
+    sql = consultas_sql.top_clientes(df, k=10)
+    pandas = ranking_clientes.top_clientes(df, k=10)
+    for columna in ranking_clientes.METRICAS:
+        np.testing.assert_allclose(sql[columna][columna].to_numpy(dtype='float64'),
+                                   pandas[columna][columna].to_numpy(dtype='float64'))
+
+def test_sin_acceso_a_archivos(tmp_path):
+    (tmp_path / "secreto.csv").write_text("a\n1\n")
+    with pytest.raises(ValueError):
+        consultas_sql.consultar({'ventas': _ventas()}, f"SELECT * FROM read_csv('{tmp_path / 'secreto.csv'}')")
+
+def test_consulta_invalida():
+    with pytest.raises(ValueError):
+        consultas_sql.consultar({'ventas': _ventas()}, "SELECT columna_inexistente FROM ventas")
+
+def test_resumen_sin_filas_igual_a_pandas():
+    vacio = _ventas().iloc[:0]
+    resumen = consultas_sql.resumen(vacio)
+    assert resumen == informe_ventas.calcular_resumen(vacio)
+    assert all(valor == 0 and not pd.isna(valor) for valor in resumen.values())
@@ -0,0 +1,74 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+
+import correlacion_clima
+
+def _alineado(dias=120, semilla=0, huecos=True):
+    rng = np.random.default_rng(semilla)
+    ds = pd.date_range("2024-01-01", periods=dias, freq="D")
+    temp = 27 + 3 * np.sin(np.arange(dias) / 7) + rng.normal(0, 0.5, dias)
+    lluvia = rng.gamma(0.6, 6.0, dias)
+    # Las ventas responden a la temperatura de hace 2 días y a la lluvia del día
+    y = 1000 + 60 * np.roll(temp, 2) - 8 * lluvia + rng.normal(0, 40, dias)
+    ventas = pd.DataFrame({'ds': ds, 'y': y})
+    clima = pd.DataFrame({'ds': ds, 'temp': temp, 'lluvia': lluvia})
+    if huecos:
+        ventas = ventas.drop(index=[10, 11, 50])  # Días sin ventas
+        clima.loc[[30, 31, 32], 'temp'] = np.nan
+    return correlacion_clima.alinear(ventas, clima)
+
+@pytest.mark.parametrize("huecos", [False, True])
+def test_desfases_igual_a_pandas(huecos):
+    alineado = _alineado(huecos=huecos)
+    tabla = correlacion_clima.correlaciones_desfasadas(alineado, 0, 7)
+    for desfase in range(8):
+        for variable in correlacion_clima.VARIABLES:
+            esperado = alineado['y'].corr(alineado[variable].shift(desfase))
+            assert tabla.loc[desfase, variable] == pytest.approx(esperado, abs=1e-9)
+    assert tabla['temp'].idxmax() == 2
+
+def test_desfases_negativos():
+    alineado = _alineado(huecos=False)
+    tabla = correlacion_clima.correlaciones_desfasadas(alineado, -3, 0)
+    for desfase in range(-3, 1):
+        assert tabla.loc[desfase, 'lluvia'] == pytest.approx(alineado['y'].corr(alineado['lluvia'].shift(desfase)), abs=1e-9)
+
+@pytest.mark.parametrize("desfase", [0, 3])
+def test_ventana_movil_igual_a_pandas(desfase):
+    alineado = _alineado()
+    ventana = 30
+    tabla = correlacion_clima.correlaciones_moviles(alineado, ventana, desfase)
+    for variable in correlacion_clima.VARIABLES:
+        x = alineado[variable].shift(desfase)
+        validos = (x.notna() & alineado['y'].notna()).astype(float).rolling(ventana, min_periods=1).sum()
+        esperado = alineado['y'].rolling(ventana, min_periods=max(3, ventana // 2)).corr(x)
+        esperado[np.arange(len(x)) < ventana - 1] = np.nan
+        esperado[validos < max(3, ventana // 2)] = np.nan
+        np.testing.assert_allclose(tabla[variable].to_numpy(), esperado.to_numpy(), atol=1e-8, equal_nan=True)
+
+def test_por_cliente_igual_a_pandas():
+    alineado = _alineado(huecos=False)
+    rng = np.random.default_rng(1)
+    operaciones = pd.DataFrame({
+        'cliente': rng.choice(["Ana", "Luis", "Eva"], 600),
+        'fecha': alineado.index[rng.integers(0, len(alineado), 600)],
+        'total': rng.integers(1, 100, 600).astype('float64'),
+    })
+    tablas = correlacion_clima.correlaciones_por_cliente(operaciones, alineado, 0, 3)
+    diario = operaciones.groupby(['cliente', 'fecha'])['total'].sum().unstack(fill_value=0.0).reindex(
+        columns=alineado.index, fill_value=0.0)
+    for cliente in diario.index:
+        serie = diario.loc[cliente]
+        for desfase in range(4):
+            esperado = serie.corr(alineado['temp'].shift(desfase))
+            assert tablas['temp'].loc[cliente, desfase] == pytest.approx(esperado, abs=1e-9)
+
+def test_mapa_de_calor_sin_estado_de_pyplot(tmp_path):
+    # Las sesiones del dashboard dibujan en hilos a la vez: el gráfico no pasa por las figuras de pyplot
+    figuras = plt.get_fignums()
+    tabla = pd.DataFrame(np.random.default_rng(0).uniform(-1, 1, (2, 5)), index=['temp', 'lluvia'])
+    archivo = correlacion_clima.graficar_mapa_calor(tabla, "Prueba", str(tmp_path / "mapa.png"))
+    assert (tmp_path / "mapa.png").stat().st_size > 0 and archivo.endswith("mapa.png")
+    assert plt.get_fignums() == figuras
@@ -0,0 +1,63 @@
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+import datos_compartidos
+
+def _ventas():
+    return pd.DataFrame({'cliente': ["Ana", "Luis", "Eva"], 'total': [10.0, 20.0, 30.0],
+                         'fecha': pd.to_datetime(["2024-03-01", "2024-03-02", "2024-03-03"])})
+
+def test_cada_sesion_recibe_su_propio_dataframe(tmp_path):
+    carpeta = str(tmp_path)
+    a = datos_compartidos.adjuntar("clave", "sesion-a", _ventas, carpeta)
+    b = datos_compartidos.adjuntar("clave", "sesion-b", carpeta=carpeta)
+    assert a is not b
+    # Las columnas siguen apuntando al mismo archivo
+    assert np.shares_memory(a['total'].to_numpy(), b['total'].to_numpy())
+
+    a['extra'] = 1
+    a.loc[0, 'total'] = -1.0
+    a.drop(columns='cliente', inplace=True)
+    assert list(b.columns) == ['cliente', 'total', 'fecha']
+    assert b['total'].tolist() == [10.0, 20.0, 30.0]
+    c = datos_compartidos.adjuntar("clave", "sesion-c", carpeta=carpeta)
+    pd.testing.assert_frame_equal(c, _ventas())
+
+def test_el_archivo_se_borra_con_la_ultima_referencia(tmp_path):
+    carpeta = str(tmp_path)
+    datos_compartidos.adjuntar("clave", "a", _ventas, carpeta)
+    datos_compartidos.adjuntar("clave", "b", carpeta=carpeta)
+    datos_compartidos.soltar("clave", "a", carpeta)
+    assert (tmp_path / "clave.arrow").exists()
+    datos_compartidos.soltar("clave", "b", carpeta)
+    assert not (tmp_path / "clave.arrow").exists()
+
+def test_sesiones_que_adjuntan_y_sueltan_a_la_vez(tmp_path):
+    carpeta = str(tmp_path)
+    # Cambios de hilo muy frecuentes para que las sesiones se intercalen dentro de adjuntar/soltar
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    errores = []
+
+    def sesion(i):
+        try:
+            for _ in range(30):
+                df = datos_compartidos.adjuntar("clave", f"sesion-{i}", _ventas, carpeta)
+                assert df['total'].sum() == 60.0
+                datos_compartidos.soltar("clave", f"sesion-{i}", carpeta)
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=sesion, args=(i,)) for i in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    try:
+        for hilo in hilos:
+            hilo.join()
+    finally:
+        sys.setswitchinterval(intervalo)
+    assert errores == []
+    assert not (tmp_path / "clave.arrow").exists()
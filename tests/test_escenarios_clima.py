@@ -0,0 +1,50 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+from prophet import Prophet
+
+import escenarios_clima
+import variables_clima
+
+logging.getLogger("cmdstanpy").disabled = True
+
+DIAS = 90
+FUTUROS = 10
+
+def _clima(dias, semilla=0):
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({'ds': pd.date_range("2024-01-01", periods=dias, freq="D"),
+                         'temp': 27 + 3 * np.sin(np.arange(dias) / 6) + rng.normal(0, 0.5, dias),
+                         'lluvia': rng.gamma(0.6, 6.0, dias)})
+
+def _ajustar(regresores, modo):
+    clima = variables_clima.variables_clima(_clima(DIAS + FUTUROS))
+    rng = np.random.default_rng(1)
+    df = clima.iloc[:DIAS].assign(y=lambda d: 2000 + 50 * d['temp'] - 10 * d['lluvia'] + rng.normal(0, 30, DIAS))
+    modelo = Prophet(daily_seasonality=False, yearly_seasonality=False, seasonality_mode=modo)
+    for regresor in regresores:
+        modelo.add_regressor(regresor, mode=modo)
+    modelo.fit(df[['ds', 'y'] + regresores])
+    return modelo, clima
+
+@pytest.mark.parametrize("modo", ["additive", "multiplicative"])
+@pytest.mark.parametrize("derivadas", [False, True])
+def test_escenarios_igual_a_predict(modo, derivadas):
+    regresores = escenarios_clima.REGRESORES + (variables_clima.VARIABLES if derivadas else [])
+    modelo, clima = _ajustar(regresores, modo)
+    futuro = clima.iloc[DIAS:].reset_index(drop=True)
+    contexto = clima.iloc[:DIAS]
+    base = modelo.predict(futuro[['ds'] + regresores])
+
+    nombres, X = escenarios_clima.rejilla_escenarios(futuro, deltas_temp=(-2, 0, 3), factores_lluvia=(0, 2))
+    resultado = escenarios_clima.evaluar_escenarios(modelo, base, nombres, X, contexto)
+
+    for nombre, x in zip(nombres, X):
+        # Clima del escenario empalmado con el histórico y sus variables derivadas recalculadas
+        escenario = pd.concat([contexto[['ds', 'temp', 'lluvia']],
+                               futuro[['ds']].assign(temp=x[:, 0], lluvia=x[:, 1])], ignore_index=True)
+        variables = variables_clima.variables_clima(escenario).iloc[DIAS:]
+        esperado = modelo.predict(variables[['ds'] + regresores])
+        np.testing.assert_allclose(resultado['tabla'][nombre].to_numpy(), esperado['yhat'].to_numpy(), rtol=1e-9, atol=1e-6)
@@ -0,0 +1,48 @@
+import pandas as pd
+
+import historial_ventas
+from conftest import escribir_libro
+
+def _venta(numero, cliente, total, fecha):
+    return (numero, cliente, 1.0, "Producto 001 - Cantidad: 2", total, fecha)
+
+PRIMERO = [_venta("F001-1", "Ana", 10.0, "2024-03-01 09:00:00"),
+           _venta("F001-2", "Luis", 20.0, "2024-03-01 10:00:00"),
+           _venta("F001-3", "Ana", 30.0, "2024-03-02 11:00:00")]
+# Export acumulado del día siguiente: repite F001-2 y F001-3
+SEGUNDO = PRIMERO[1:] + [_venta("F001-4", "Eva", 40.0, "2024-03-02 12:00:00"),
+                         _venta("F001-5", "Luis", 50.0, "2024-03-03 09:00:00")]
+
+def _diario(operaciones):
+    return operaciones.groupby(operaciones['fecha'].dt.normalize())['total'].sum()
+
+def test_exports_solapados(tmp_path):
+    carpeta = str(tmp_path / "historial")
+    r1 = historial_ventas.agregar_excel(escribir_libro(tmp_path / "dia1.xlsx", PRIMERO), carpeta)
+    r2 = historial_ventas.agregar_excel(escribir_libro(tmp_path / "dia2.xlsx", SEGUNDO), carpeta)
+    r3 = historial_ventas.agregar_excel(escribir_libro(tmp_path / "dia2_bis.xlsx", SEGUNDO), carpeta)
+
+    assert (r1['nuevas'], r2['nuevas'], r2['duplicadas'], r3['nuevas']) == (3, 2, 2, 0)
+    operaciones = historial_ventas.cargar_historial(carpeta)
+    assert sorted(zip(operaciones["cliente"], operaciones["total"])) == \
+        [("Ana", 10), ("Ana", 30), ("Eva", 40), ("Luis", 20), ("Luis", 50)]
+
+    serie = historial_ventas.ventas_diarias(carpeta).set_index('ds')['y']
+    pd.testing.assert_series_equal(serie, _diario(operaciones), check_names=False, check_index_type=False,
+                                   check_dtype=False)
+    por_cliente = historial_ventas.agregados_diarios(carpeta, por_cliente=True)
+    assert por_cliente.loc[(pd.Timestamp("2024-03-02"), "Ana"), 'total'] == 30.0
+    assert por_cliente['operaciones'].sum() == 5
+
+def test_otro_proceso_ve_los_cambios(tmp_path):
+    carpeta = str(tmp_path / "historial")
+    historial_ventas.agregar_excel(escribir_libro(tmp_path / "dia1.xlsx", PRIMERO), carpeta)
+    version = historial_ventas.version_historial(carpeta)
+    assert len(historial_ventas.cargar_historial(carpeta)) == 3
+
+    # Otro proceso escribe: la caché de este se descarta por versión y solo lee el bloque nuevo
+    historial_ventas._cache.clear()
+    historial_ventas.agregar_excel(escribir_libro(tmp_path / "dia2.xlsx", SEGUNDO), carpeta)
+    assert historial_ventas.version_historial(carpeta) == version + 1
+    assert len(historial_ventas.cargar_historial(carpeta)) == 5
+    assert historial_ventas.ventas_diarias(carpeta)['y'].sum() == 150.0
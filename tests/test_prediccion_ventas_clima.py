@@ -0,0 +1,36 @@
+import json
+import os
+
+import pandas as pd
+
+import prediccion_ventas_clima
+
+def test_cargar_otras_ventas_descarta_las_correlaciones(monkeypatch):
+    # El PDF recalcula las correlaciones solo si están vacías: al cambiar de datos no deben sobrevivir
+    ventas = pd.DataFrame({'ds': pd.date_range("2024-03-01", periods=3, freq="D"), 'y': [1.0, 2.0, 3.0]})
+    monkeypatch.setattr(prediccion_ventas_clima, "cargar_datos_historial", lambda: ventas)
+    monkeypatch.setattr(prediccion_ventas_clima, "correlaciones", {'desfases': "del libro anterior"})
+    monkeypatch.setattr(prediccion_ventas_clima, "grafico_correlacion", "anterior.png")
+    monkeypatch.setattr(prediccion_ventas_clima, "grafico_desfases", "anterior_desfases.png")
+    monkeypatch.setattr(prediccion_ventas_clima, "ventas_diarias", None)
+    opciones = iter(["8", "11"])
+    monkeypatch.setattr("builtins.input", lambda mensaje="": next(opciones))
+
+    prediccion_ventas_clima.menu()
+
+    assert prediccion_ventas_clima.ventas_diarias is ventas
+    assert prediccion_ventas_clima.correlaciones is None
+    assert prediccion_ventas_clima.grafico_correlacion is None and prediccion_ventas_clima.grafico_desfases is None
+
+def test_hiperparametros_ajustados_se_cargan_al_entrenar(monkeypatch):
+    # Se leen al entrenar, no al importar: una búsqueda posterior al arranque también cuenta
+    configuracion = dict(prediccion_ventas_clima.CONFIGURACION_MODELO, changepoint_prior_scale=0.05)
+    monkeypatch.setattr(prediccion_ventas_clima, "CONFIGURACION_MODELO", configuracion)
+    carpeta = os.path.join("datos", "hiperparametros", prediccion_ventas_clima.TIENDA)
+    os.makedirs(carpeta)
+    with open(os.path.join(carpeta, "mejor.json"), "w", encoding="utf-8") as f:
+        json.dump({'hiperparametros': {'changepoint_prior_scale': 0.5}}, f)
+
+    prediccion_ventas_clima.cargar_hiperparametros()
+
+    assert configuracion['changepoint_prior_scale'] == 0.5
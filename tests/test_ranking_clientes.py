@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ranking_clientes
+
+def _operaciones(semilla=0, n=3000, clientes=60, dias=200):
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        'cliente': [f"Cliente {c:02d}" for c in rng.integers(0, clientes, n)],
+        'fecha': pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, dias, n), unit='D')
+                 + pd.to_timedelta(rng.integers(0, 86400, n), unit='s'),
+        # Importes enteros: sin empates de flotantes ambiguos en el orden
+        'total': rng.integers(1, 500, n).astype('float64'),
+        'descuento': rng.integers(0, 50, n).astype('float64'),
+        'cantidad': rng.integers(1, 10, n),
+    })
+
+def _top_fuerza_bruta(df, columna, k):
+    return df.groupby('cliente')[columna].sum().sort_values(ascending=False, kind='stable').head(k)
+
+@pytest.mark.parametrize("columna", ranking_clientes.METRICAS)
+def test_top_clientes_igual_a_groupby(columna):
+    df = _operaciones()
+    top = ranking_clientes.top_clientes(df, k=10)[columna][columna]
+    esperado = _top_fuerza_bruta(df, columna, 10)
+    assert top.tolist() == esperado.tolist()
+    # Mismos clientes salvo empates en el último puesto
+    assert set(top.index[top > top.iloc[-1]]) == set(esperado.index[esperado > esperado.iloc[-1]])
+
+@pytest.mark.parametrize("ventana", ranking_clientes.VENTANAS)
+def test_ranking_movil_igual_a_recalcular(ventana):
+    df = _operaciones()
+    ranking = ranking_clientes.RankingClientes().cargar(df)
+    fin = df['fecha'].dt.normalize().max()
+    dias = df['fecha'].dt.normalize()
+
+    actual = df[dias > fin - pd.Timedelta(days=ventana)]
+    esperado = _top_fuerza_bruta(actual, 'total', 10)
+    top = ranking.top(ventana, 'total', 10)
+    np.testing.assert_allclose(top['total'], esperado.to_numpy())
+
+    anterior = df[(dias > fin - pd.Timedelta(days=2 * ventana)) & (dias <= fin - pd.Timedelta(days=ventana))]
+    totales_anteriores = anterior.groupby('cliente')['total'].sum()
+    movimientos = ranking.movimientos(ventana, 'total', 10)
+    for fila in movimientos.itertuples():
+        if fila.cliente in totales_anteriores.index:
+            assert fila.puesto_anterior == (totales_anteriores > totales_anteriores[fila.cliente]).sum() + 1
+        else:
+            assert np.isnan(fila.puesto_anterior)
+
+def test_ranking_incremental_igual_a_cargar_todo():
+    df = _operaciones()
+    dias = df['fecha'].dt.normalize()
+    corte = dias.max() - pd.Timedelta(days=5)
+    incremental = ranking_clientes.RankingClientes().cargar(df[dias <= corte])
+    for fecha, operaciones in df[dias > corte].groupby(dias[dias > corte]):
+        incremental.agregar_dia(fecha, operaciones)
+    completo = ranking_clientes.RankingClientes().cargar(df)
+    pd.testing.assert_frame_equal(incremental.top(30), completo.top(30))
+
+def test_fechas_fuera_de_orden():
+    ranking = ranking_clientes.RankingClientes().cargar(_operaciones())
+    with pytest.raises(ValueError):
+        ranking.agregar_dia("2024-01-01", None)
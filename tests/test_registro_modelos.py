@@ -0,0 +1,57 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from prophet import Prophet
+
+import registro_modelos
+
+logging.getLogger("cmdstanpy").disabled = True
+
+def _serie(dias=90, semilla=0):
+    rng = np.random.default_rng(semilla)
+    ds = pd.date_range("2024-01-01", periods=dias, freq="D")
+    temp = 27 + 2 * np.sin(np.arange(dias) / 9) + rng.normal(0, 0.5, dias)
+    y = 1000 + 5 * np.arange(dias) + 40 * temp + 150 * (ds.dayofweek >= 5) + rng.normal(0, 30, dias)
+    return pd.DataFrame({'ds': ds, 'y': y, 'temp': temp})
+
+def _modelo(changepoints=None):
+    modelo = Prophet(changepoints=changepoints, daily_seasonality=False, yearly_seasonality=False)
+    modelo.add_regressor('temp')
+    return modelo
+
+def test_arranque_en_caliente_conserva_escalas_y_changepoints():
+    df = _serie()
+    anterior = _modelo().fit(df.iloc[:-5])
+    escalas = registro_modelos.escalas(anterior)
+    changepoints = [str(c.date()) for c in anterior.changepoints]
+
+    nuevo = registro_modelos.fijar_escalas(_modelo(changepoints), escalas)
+    nuevo.fit(df, init=registro_modelos.parametros_stan(registro_modelos.parametros_iniciales(anterior)))
+
+    assert registro_modelos.escalas(nuevo) == escalas
+    assert registro_modelos.escalas_respetadas(nuevo, escalas)
+    assert list(nuevo.changepoints.dt.strftime("%Y-%m-%d")) == changepoints
+    # Las escalas de un ajuste en frío sí cambian con los días nuevos
+    frio = _modelo().fit(df)
+    assert registro_modelos.escalas(frio) != escalas
+    assert not registro_modelos.escalas_respetadas(frio, escalas)
+
+def test_decidir_modo():
+    df = _serie()
+    meta = {'configuracion': {}, 'escalas': {}, 'hasta': str(df['ds'].iloc[-3].date()),
+            'filas': len(df) - 2, 'version_datos': registro_modelos.version_datos(df.iloc[:-2])}
+    assert registro_modelos.decidir_modo(meta, df, {})[0] == 'tibio'
+    assert registro_modelos.decidir_modo({k: v for k, v in meta.items() if k != 'escalas'}, df, {})[0] == 'frio'
+    cambiado = df.copy()
+    cambiado.loc[0, 'y'] += 1
+    assert registro_modelos.decidir_modo(meta, cambiado, {})[0] == 'frio'
+
+def test_otra_firma_de_prophet_ajusta_en_frio(monkeypatch):
+    df = _serie()
+    meta = {'configuracion': {}, 'escalas': {}, 'hasta': str(df['ds'].iloc[-3].date()),
+            'filas': len(df) - 2, 'version_datos': registro_modelos.version_datos(df.iloc[:-2])}
+    assert registro_modelos.escalas_fijables()
+    monkeypatch.setattr(Prophet, "initialize_scales", lambda self, df, inicializar=True: None)
+    assert not registro_modelos.escalas_fijables()
+    assert registro_modelos.decidir_modo(meta, df, {})[0] == 'frio'
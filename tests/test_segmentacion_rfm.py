@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+import segmentacion_rfm
+
+def _operaciones(semilla=0, clientes=400, dias=120):
+    """Ventas con la forma habitual: la mayoría de clientes compra una sola vez."""
+    rng = np.random.default_rng(semilla)
+    compras = rng.geometric(0.55, clientes)
+    filas = []
+    for c, n in enumerate(compras):
+        for fecha in rng.integers(0, dias, n):
+            filas.append({'cliente': f"Cliente {c:03d}", 'fecha': pd.Timestamp("2024-01-01") + pd.Timedelta(days=int(fecha)),
+                          'total': float(rng.gamma(2.0, 20.0)), 'descuento': 0.0})
+    return pd.DataFrame(filas)
+
+def test_todos_los_segmentos_son_alcanzables():
+    rfm = segmentacion_rfm.calcular_rfm(_operaciones())
+    assert set(rfm['segmento']) == set(segmentacion_rfm.ORDEN_SEGMENTOS)
+
+def test_nuevos_son_recientes_de_una_compra():
+    rfm = segmentacion_rfm.calcular_rfm(_operaciones())
+    nuevos = rfm[rfm['segmento'] == "Nuevos"]
+    assert len(nuevos) and (nuevos['frecuencia'] == 1).all() and (nuevos['R'] >= 4).all()
+
+def test_empates_reciben_el_mismo_puntaje():
+    puntajes = segmentacion_rfm._puntaje(np.array([1, 1, 1, 1, 2, 3]))
+    assert len(set(puntajes[:4])) == 1
+    assert list(segmentacion_rfm._puntaje(np.arange(10))) == [1, 1, 2, 2, 3, 3, 4, 4, 5, 5]
+
+def test_vacio():
+    assert segmentacion_rfm.calcular_rfm(pd.DataFrame()).empty
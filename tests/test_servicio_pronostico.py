@@ -0,0 +1,73 @@
+import json
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+
+import pandas as pd
+import pytest
+
+from servicio_pronostico import ConsultaPronosticos, ServidorPronosticos, guardar_pronostico
+
+def _forecast(dias=10):
+    ds = pd.date_range("2024-03-01", periods=dias, freq="D")
+    yhat = [100.0 + i for i in range(dias)]
+    return pd.DataFrame({'ds': ds, 'yhat': yhat,
+                         'yhat_lower': [y - 10 for y in yhat], 'yhat_upper': [y + 10 for y in yhat]})
+
+@pytest.fixture
+def archivo_db(tmp_path):
+    ruta = str(tmp_path / "pronosticos.sqlite")
+    guardar_pronostico(_forecast(), "Centro", ruta)
+    return ruta
+
+def test_consultas_desde_varios_hilos_usan_una_sola_conexion(archivo_db):
+    consultas = ConsultaPronosticos(archivo_db)
+    resultados, errores = [], []
+
+    def consultar():
+        try:
+            for _ in range(50):
+                resultados.append(consultas.punto("Centro", "2024-03-05")['yhat'])
+                assert len(consultas.rango("Centro", "2024-03-01", "2024-03-10")) == 10
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=consultar) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert errores == []
+    assert resultados == [104.0] * 400
+    conexion = consultas._con
+    assert conexion is not None
+    consultas.cerrar()
+    assert consultas._con is None
+    with pytest.raises(sqlite3.Error):
+        conexion.execute("SELECT 1")
+
+def test_sin_base_falla_sin_dejar_conexion_abierta(tmp_path):
+    consultas = ConsultaPronosticos(str(tmp_path / "no_existe.sqlite"))
+    with pytest.raises(sqlite3.Error):
+        consultas.tiendas()
+    assert consultas._con is None
+
+def test_servidor_responde_y_cierra_la_conexion(archivo_db):
+    servidor = ServidorPronosticos(("127.0.0.1", 0), archivo_db)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    base = f"http://127.0.0.1:{servidor.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{base}/pronostico?tienda=Centro&fecha=2024-03-02") as respuesta:
+            assert json.loads(respuesta.read())['yhat'] == 101.0
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{base}/pronostico?tienda=Centro&fecha=2025-01-01")
+        assert error.value.code == 404
+        assert servidor.consultas._con is not None
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+        hilo.join()
+    assert servidor.consultas._con is None
@@ -0,0 +1,90 @@
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import utilidades
+from conftest import escribir_libro, CABECERA
+
+REQUERIDAS = list(utilidades.COLUMNAS_VENTAS)
+FILAS = [("F001-1", "Ana", 1.0, "Producto 001 - Cantidad: 2", 10.0, "2024-03-01 09:00:00"),
+         ("F001-2", "Luis", 0.0, "Producto 002 - Cantidad: 1", 20.0, "2024-03-02 10:00:00")]
+
+@pytest.mark.parametrize("preambulo", [0, 3, 7, 30])
+def test_cabecera_con_desplazamiento(tmp_path, preambulo):
+    libro = escribir_libro(tmp_path / "ventas.xlsx", FILAS, preambulo=preambulo)
+    formato = utilidades.detectar_formato(libro, REQUERIDAS, ["Comprobante"])
+    # Preámbulo + fila vacía antes de la cabecera
+    assert formato['header'] == preambulo + 1
+    assert formato['nombres'] == ["Comprobante"] + REQUERIDAS
+    assert formato['usecols'] == [0, 1, 2, 3, 4, 5]
+
+    df = utilidades.leer_hoja_ventas(libro, REQUERIDAS, ["Comprobante"])
+    assert list(df.columns) == formato['nombres']
+    assert df['Cliente'].tolist()[:2] == ["Ana", "Luis"]
+
+def test_cabecera_igual_a_openpyxl(tmp_path):
+    libro = escribir_libro(tmp_path / "ventas.xlsx", FILAS, preambulo=7)
+    formato = utilidades.detectar_formato(libro, REQUERIDAS)
+    esperado = pd.read_excel(libro, sheet_name="Compras", header=None)
+    fila = esperado.index[esperado.iloc[:, 1].eq("Cliente")][0]
+    assert formato['header'] == fila
+
+def test_columnas_desordenadas_y_textos_en_linea(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Compras"
+    ws["A1"] = "Reporte"
+    # Cabecera en la fila 5, corrida una columna y en otro orden
+    for columna, nombre in zip("CDEFG", ["Total", " fecha emisión ", "CLIENTE", "Productos", "Descuento"]):
+        ws[f"{columna}5"] = nombre
+    ws.append([None, None, 10.0, "2024-03-01", "Ana", "Producto 001 - Cantidad: 1", 0.0])
+    wb.save(tmp_path / "ventas.xlsx")
+
+    formato = utilidades.detectar_formato(str(tmp_path / "ventas.xlsx"), REQUERIDAS)
+    assert formato['header'] == 4
+    assert formato['usecols'] == [2, 3, 4, 5, 6]
+    assert formato['nombres'] == ["Total", "Fecha Emisión", "Cliente", "Productos", "Descuento"]
+
+def test_libro_sin_dimensiones(tmp_path):
+    # Los libros de openpyxl en modo write_only (como los sintéticos del benchmark) no declaran <dimension>
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Compras")
+    ws.append(["Reporte"])
+    ws.append([])
+    ws.append(CABECERA)
+    for fila in FILAS:
+        ws.append(fila)
+    wb.save(tmp_path / "ventas.xlsx")
+
+    formato = utilidades.detectar_formato(str(tmp_path / "ventas.xlsx"), REQUERIDAS, ["Comprobante"])
+    assert formato['header'] == 2
+    assert formato['nombres'] == ["Comprobante"] + REQUERIDAS
+
+def test_archivo_subido(tmp_path):
+    contenido = open(escribir_libro(tmp_path / "ventas.xlsx", FILAS), "rb").read()
+    subido = io.BytesIO(contenido)
+    subido.read(10)
+    df = utilidades.leer_hoja_ventas(subido, REQUERIDAS)
+    assert len(df) == 3  # Dos operaciones y la fila de totales
+
+def test_falta_una_columna(tmp_path):
+    libro = escribir_libro(tmp_path / "ventas.xlsx", FILAS, cabecera=[c if c != "Total" else "Importe" for c in CABECERA])
+    with pytest.raises(ValueError, match="No se encontró la cabecera"):
+        utilidades.detectar_formato(libro, REQUERIDAS)
+
+def test_cabecera_fuera_de_la_exploracion(tmp_path):
+    libro = escribir_libro(tmp_path / "ventas.xlsx", FILAS, preambulo=50)
+    with pytest.raises(ValueError, match="primeras 40 filas"):
+        utilidades.detectar_formato(libro, REQUERIDAS)
+
+def test_hoja_inexistente(tmp_path):
+    libro = escribir_libro(tmp_path / "ventas.xlsx", FILAS, hoja="Ventas")
+    with pytest.raises(ValueError, match="no tiene la hoja 'Compras'.*Ventas"):
+        utilidades.detectar_formato(libro, REQUERIDAS)
+
+def test_no_es_xlsx(tmp_path):
+    (tmp_path / "ventas.xlsx").write_text("cliente,total\n")
+    with pytest.raises(ValueError, match="no es un libro .xlsx"):
+        utilidades.detectar_formato(str(tmp_path / "ventas.xlsx"), REQUERIDAS)
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+import variables_clima
+
+def _clima(dias=20):
+    ds = pd.date_range("2024-01-01", periods=dias, freq="D")
+    return pd.DataFrame({'ds': ds, 'temp': np.linspace(20, 32, dias), 'lluvia': np.arange(dias) % 3 * 1.5})
+
+def test_mismo_clima_reutiliza_el_resultado():
+    clima = _clima()
+    primero = variables_clima.variables_clima(clima, lat=1.0, lon=2.0)
+    assert variables_clima.variables_clima(clima.copy(), lat=1.0, lon=2.0) is primero
+
+def test_dias_repetidos_en_otro_orden_no_reusan_la_cache():
+    # Con días repetidos gana la última fila: el mismo contenido reordenado es otra serie
+    clima = _clima()
+    repetido = clima.iloc[[5]].assign(temp=99.0)
+    antes = pd.concat([repetido, clima], ignore_index=True)
+    despues = pd.concat([clima, repetido], ignore_index=True)
+
+    serie_antes = variables_clima.variables_clima(antes, lat=3.0, lon=4.0)
+    serie_despues = variables_clima.variables_clima(despues, lat=3.0, lon=4.0)
+
+    assert serie_antes.loc[5, 'temp'] == clima.loc[5, 'temp']
+    assert serie_despues.loc[5, 'temp'] == 99.0
@@ -1,5 +1,9 @@
 import os
 import datetime
+import zipfile
+import openpyxl
+import pandas as pd
+from openpyxl.utils.exceptions import InvalidFileException
 
 def timestamp():
     """Genera un timestamp único para nombres de archivo."""
@@ -11,3 +15,72 @@ def crear_carpeta_reportes():
     if not os.path.exists(carpeta):
         os.makedirs(carpeta)
     return carpeta
+
+# ==============================
+# 🔎 Detección del formato del Excel de ventas
+# ==============================
+HOJA_VENTAS = "Compras"
+
+# Columnas del export: nombre en el Excel → nombre interno
+COLUMNAS_VENTAS = {
+    'Cliente': 'cliente',
+    'Descuento': 'descuento',
+    'Productos': 'productos',
+    'Total': 'total',
+    'Fecha Emisión': 'fecha',
+}
+
+# Columnas que identifican un comprobante cuando el export las incluye
+COLUMNAS_COMPROBANTE = ['comprobante', 'nro comprobante', 'n° comprobante', 'número', 'numero', 'factura', 'serie-número']
+
+# Filas que se revisan buscando la cabecera
+FILAS_EXPLORACION = 40
+
+def _normalizar(valor):
+    return str(valor).strip().lower() if valor is not None else ""
+
+def detectar_formato(path, requeridas, opcionales=(), hoja=HOJA_VENTAS, max_filas=FILAS_EXPLORACION):
+    """Ubica la fila de cabecera leyendo solo las primeras filas de la hoja.
+
+    Devuelve {'hoja', 'header', 'usecols', 'nombres'} listo para `pd.read_excel`:
+    `header` es la fila (desde 0) de la cabecera, `usecols` las posiciones de las
+    columnas requeridas y opcionales encontradas y `nombres` cómo se llaman en el
+    archivo. Lanza ValueError si la hoja o alguna columna requerida no existe.
+    """
+    try:
+        libro = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            if hoja not in libro.sheetnames:
+                raise ValueError(f"El archivo no tiene la hoja '{hoja}' (hojas: {', '.join(libro.sheetnames)}).")
+            # Solo lectura: la hoja se recorre en streaming y se deja de leer al pasar `max_filas`
+            filas = list(libro[hoja].iter_rows(max_row=max_filas, values_only=True))
+        finally:
+            libro.close()
+    except (zipfile.BadZipFile, KeyError, InvalidFileException) as e:
+        raise ValueError(f"El archivo no es un libro .xlsx válido ({e}).") from e
+    finally:
+        if hasattr(path, "seek"):
+            path.seek(0)  # Archivos subidos: la lectura completa vuelve a empezar desde el inicio
+
+    buscadas = {_normalizar(c): c for c in list(requeridas) + list(opcionales)}
+    for fila, valores in enumerate(filas):
+        posiciones = {}
+        for columna, valor in enumerate(valores):
+            nombre = buscadas.get(_normalizar(valor))
+            if nombre is not None and nombre not in posiciones:
+                posiciones[nombre] = columna
+        faltantes = [c for c in requeridas if c not in posiciones]
+        if not faltantes:
+            usecols = sorted(posiciones.values())
+            nombres = {columna: nombre for nombre, columna in posiciones.items()}
+            return {'hoja': hoja, 'header': fila, 'usecols': usecols, 'nombres': [nombres[c] for c in usecols]}
+
+    raise ValueError(f"No se encontró la cabecera ({', '.join(requeridas)}) en las primeras "
+                     f"{max_filas} filas de la hoja '{hoja}'.")
+
+def leer_hoja_ventas(path, requeridas, opcionales=()):
+    """Lee de la hoja de ventas solo las columnas pedidas, con los nombres tal como se listan en `requeridas`/`opcionales`."""
+    formato = detectar_formato(path, requeridas, opcionales)
+    df = pd.read_excel(path, sheet_name=formato['hoja'], header=formato['header'], usecols=formato['usecols'])
+    df.columns = formato['nombres']
+    return df
@@ -0,0 +1,107 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ==============================
+# ⚙️ Variables derivadas del clima
+# ==============================
+# Se calculan sobre la serie diaria completa (histórico + pronóstico) para que
+# los rezagos y acumulados del primer día futuro usen los días reales previos.
+VARIABLES = ['lluvia_ayer', 'lluvia_3d', 'lluvia_7d', 'calor', 'calor_3d', 'racha_lluvia', 'racha_seca']
+BASE_CALOR = 28.0  # °C a partir de los cuales se acumulan grados de calor
+UMBRAL_LLUVIA = 1.0  # mm desde los que un día cuenta como lluvioso
+DIAS_CONTEXTO = 30  # Días previos que se anteponen a los escenarios para rezagos y rachas
+
+# Conjuntos ya derivados: {(lat, lon, desde, hasta, huella): DataFrame}
+MAX_CACHE = 16
+_cache = OrderedDict()
+
+def _suma_movil(x, dias):
+    """Suma de los últimos `dias` valores (incluido el actual) a lo largo del último eje."""
+    acumulado = np.cumsum(x, axis=-1)
+    suma = acumulado.copy()
+    suma[..., dias:] -= acumulado[..., :-dias]
+    return suma
+
+def _racha(condicion):
+    """Días consecutivos que cumplen `condicion` hasta cada día (0 si ese día no la cumple)."""
+    indices = np.arange(condicion.shape[-1])
+    ultimo_corte = np.maximum.accumulate(np.where(condicion, -1, indices), axis=-1)
+    return np.where(condicion, indices - ultimo_corte, 0)
+
+def calcular(temp, lluvia):
+    """Variables derivadas de arreglos de temperatura y lluvia diarios (días en el último eje).
+
+    Acepta una serie (días) o un lote de escenarios (escenarios × días).
+    """
+    temp = np.asarray(temp, dtype='float64')
+    lluvia = np.asarray(lluvia, dtype='float64')
+    calor = np.maximum(temp - BASE_CALOR, 0.0)
+    mojado = lluvia >= UMBRAL_LLUVIA
+    return {
+        # El primer día no tiene día previo: se toma su propia lluvia
+        'lluvia_ayer': np.concatenate([lluvia[..., :1], lluvia[..., :-1]], axis=-1),
+        'lluvia_3d': _suma_movil(lluvia, 3),
+        'lluvia_7d': _suma_movil(lluvia, 7),
+        'calor': calor,
+        'calor_3d': _suma_movil(calor, 3),
+        'racha_lluvia': _racha(mojado).astype('float64'),
+        'racha_seca': _racha(~mojado).astype('float64'),
+    }
+
+# ==============================
+# 📅 Serie diaria con variables (cacheada)
+# ==============================
+def _serie_continua(clima, desde=None, hasta=None):
+    """Clima diario sin huecos entre `desde` y `hasta`; los días faltantes toman la media de cada columna."""
+    clima = clima[['ds', 'temp', 'lluvia']].copy()
+    clima['ds'] = pd.to_datetime(clima['ds']).dt.normalize()
+    for columna in ('temp', 'lluvia'):
+        clima[columna] = pd.to_numeric(clima[columna], errors='coerce').astype('float64')
+    clima = clima.drop_duplicates('ds', keep='last').set_index('ds').sort_index()
+    inicio = min(clima.index.min(), pd.Timestamp(desde)) if desde is not None else clima.index.min()
+    fin = max(clima.index.max(), pd.Timestamp(hasta)) if hasta is not None else clima.index.max()
+    clima = clima.reindex(pd.date_range(inicio, fin, freq='D'))
+    return clima.fillna(clima.mean()).fillna(0.0).rename_axis('ds')
+
+def variables_clima(clima, lat=None, lon=None, desde=None, hasta=None):
+    """DataFrame diario (ds, temp, lluvia y VARIABLES) que cubre el clima dado y el rango `desde`–`hasta`.
+
+    El resultado se guarda por ubicación, rango y contenido: los entrenamientos,
+    validaciones y escenarios con el mismo clima lo reutilizan sin recalcular.
+    No modificar el DataFrame devuelto.
+    """
+    # Huella sensible al orden de las filas: con días repetidos gana el último, así que
+    # el mismo contenido reordenado puede dar otra serie. Cuesta ~0,5 ms en 10 años diarios.
+    filas = pd.util.hash_pandas_object(clima[['ds', 'temp', 'lluvia']], index=False).to_numpy()
+    huella = hashlib.sha1(filas.tobytes()).hexdigest()
+    clave = (lat, lon, None if desde is None else pd.Timestamp(desde), None if hasta is None else pd.Timestamp(hasta), huella)
+    if clave in _cache:
+        _cache.move_to_end(clave)
+        return _cache[clave]
+
+    serie = _serie_continua(clima, desde, hasta)
+    derivadas = calcular(serie['temp'].to_numpy(), serie['lluvia'].to_numpy())
+    resultado = serie.assign(**derivadas).reset_index()
+    _cache[clave] = resultado
+    if len(_cache) > MAX_CACHE:
+        _cache.popitem(last=False)
+    return resultado
+
+# ==============================
+# 🌦️ Lotes de escenarios
+# ==============================
+def tensor_variables(X, contexto, regresores):
+    """Amplía un lote de escenarios (escenarios × días × [temp, lluvia]) a todos los `regresores` del modelo.
+
+    `contexto` (ds, temp, lluvia) son los días reales previos al primer día
+    simulado: así los rezagos, acumulados y rachas empalman con el histórico.
+    """
+    X = np.asarray(X, dtype='float64')
+    previos = np.empty((0, 2)) if contexto is None else contexto[['temp', 'lluvia']].to_numpy(dtype='float64')[-DIAS_CONTEXTO:]
+    k = len(previos)
+    completo = np.concatenate([np.broadcast_to(previos, (X.shape[0], k, 2)), X], axis=1)
+    columnas = {'temp': completo[..., 0], 'lluvia': completo[..., 1], **calcular(completo[..., 0], completo[..., 1])}
+    return np.stack([columnas[r][:, k:] for r in regresores], axis=-1)